@@ -2,51 +2,27 @@
 # -*- coding: utf-8 -*-
 """
 AI摘要生成器
-使用Gemini API生成邮件摘要
+使用Gemini API（或其他LLM后端）生成邮件摘要
 """
 
-import google.generativeai as genai
-from datetime import datetime
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 
+from email_record import PREVIEW_CHARS, body_prefix, body_preview
+from keyword_classifier import KeywordClassifier
+from llm_backends import GeminiBackend, LLMScheduler
+from metrics import metrics
+from prompt_budget import BudgetAllocator, estimate_tokens, truncate_to_tokens
+from report_renderer import append_routed_section, render_digest, render_fallback, render_no_email, render_range_digest
+from summary_cache import content_key
 
-class GeminiSummarizer:
-    """Gemini AI摘要生成器"""
 
-    def __init__(self, api_key):
-        """初始化Gemini API"""
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+logger = logging.getLogger(__name__)
 
-    def summarize_emails(self, emails):
-        """使用Gemini总结邮件"""
-        if not emails:
-            return self._generate_no_email_report()
 
-        print(f"\n正在使用Gemini AI分析 {len(emails)} 封邮件...")
-
-        # 构建提示词 - 提供更完整的邮件内容
-        email_texts = []
-        for i, email_info in enumerate(emails, 1):
-            # 提取更多正文内容，最多2000字符
-            body_content = email_info['body'][:2000] if email_info['body'] else "（无正文内容）"
-
-            email_text = f"""
-========== 邮件 {i} ==========
-主题: {email_info['subject']}
-发件人: {email_info['from']}
-接收时间: {email_info['parsed_date']}
-正文内容:
-{body_content}
-===============================
-"""
-            email_texts.append(email_text)
-
-        prompt = f"""你是一位专业的邮件管理助手。请仔细分析以下 {len(emails)} 封今日收到的邮件，并生成一份实用的摘要报告。
-
-今日邮件详情:
-{''.join(email_texts)}
-
-请按照以下要求生成HTML格式的报告：
+# 最终报告的格式要求，单次提示词和map-reduce的合并步骤共用
+REPORT_REQUIREMENTS = """请按照以下要求生成HTML格式的报告：
 
 1. **今日概览** - 统计邮件数量，简述主要类别
 
@@ -88,40 +64,500 @@ HTML格式要求：
 
 请直接输出HTML代码，不要有任何解释性文字。"""
 
+# 周报、月报的格式要求，由每日摘要合并生成
+RANGE_REPORT_REQUIREMENTS = """请按照以下要求生成HTML格式的报告：
+
+1. **期间概览** - 邮件总量和每天的数量变化，简述主要类别
+
+2. **重要事项** - 按优先级（🔴 高 / 🟡 中 / 🟢 低）列出期间内的重要邮件和进展：
+   - 同一事项的多封邮件合并说明，注明日期
+   - 每项包含主题、发件人和核心内容
+
+3. **待办事项** - 仍需处理的具体事项（回复、缴费、查看链接/附件等），注明日期
+
+4. **趋势与建议** - 邮件来源、类别或事项的变化，以及处理建议
+
+HTML格式要求：
+- 使用现代化的CSS样式，美观专业
+- 使用emoji图标增加可读性
+- 重要信息使用醒目的颜色标注
+- 保持简洁，不要逐日罗列所有邮件
+
+请直接输出HTML代码，不要有任何解释性文字。"""
+
+
+class GeminiSummarizer:
+    """Gemini AI摘要生成器"""
+
+    # 修改单封邮件摘要的提示词、字段或缓存键的计算方式时递增，使旧的缓存条目失效
+    PROMPT_VERSION = 2
+    # 每次AI调用最多分析的新邮件数
+    SUMMARY_BATCH_SIZE = 20
+    # map-reduce模式下每个批次的提示词token预算
+    DEFAULT_BATCH_TOKENS = 8000
+    # 无法预先分配预算时（流式流水线）单封邮件正文的token上限
+    DEFAULT_BODY_TOKENS = 2000
+    # 每个邮件片段中主题、发件人等固定部分的token估算
+    BLOCK_OVERHEAD_TOKENS = 100
+
+    # 修改每日摘要的提示词或字段时递增，使已保存的每日摘要失效
+    DAY_PROMPT_VERSION = 1
+    # 每日摘要最多保留的重点邮件数
+    DAY_HIGHLIGHTS = 8
+
+    PRIORITIES = ('high', 'medium', 'low')
+    CATEGORIES = ('工作邮件', '账单/财务', '系统通知', '营销推广', '新闻资讯', '其他')
+
+    def __init__(self, api_key=None, summary_cache=None, map_reduce=False, batch_tokens=None, max_concurrency=4,
+                 allocator=None, router=None, route_min_hits=2, backend=None):
+        """
+        初始化LLM后端
+        api_key: Gemini API Key，未指定backend时使用
+        summary_cache: SummaryCache实例，启用后按邮件缓存结构化摘要，报告在本地组装
+        map_reduce: True/False，或 'auto'（提示词超出预算时启用）；启用后按token预算分批并发摘要，再合并为报告
+        batch_tokens: 每个批次的提示词token预算
+        max_concurrency: 同时进行的AI调用数
+        allocator: BudgetAllocator实例，把提示词预算按重要性分给各封邮件
+        router: KeywordClassifier实例，有把握的营销邮件不经过AI，直接列入低优先级
+        route_min_hits: 至少命中多少个不同的营销关键词才直接路由
+        backend: 提供 generate(prompt) 和 model_name 的后端（通常是LLMScheduler），默认为带重试的Gemini
+        """
+        if backend is None:
+            backend = LLMScheduler(GeminiBackend(api_key), max_concurrency=max_concurrency)
+        self.backend = backend
+        self.summary_cache = summary_cache
+        self.map_reduce = map_reduce
+        self.batch_tokens = batch_tokens or self.DEFAULT_BATCH_TOKENS
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.allocator = allocator or BudgetAllocator()
+        self.router = router
+        self.route_min_hits = route_min_hits
+        self.classifier = router or KeywordClassifier()
+
+    def summary_key(self, email_info):
+        """单封邮件摘要的缓存键"""
+        return content_key(email_info, self.backend.model_name, self.PROMPT_VERSION)
+
+    def prompt_body_chars(self):
+        """构建提示词、路由判断和备用报告最多读取的正文字符数"""
+        return max(self.allocator.max_tokens * 4, self.classifier.body_chars, PREVIEW_CHARS)
+
+    @metrics.timed('prompt_build')
+    def build_email_block(self, index, email_info, body_tokens=None):
+        """构建单封邮件的提示词片段，正文在句子或段落边界截断到body_tokens以内"""
+        body_tokens = self.DEFAULT_BODY_TOKENS if body_tokens is None else body_tokens
+        # 每个token至少对应1/4个字符，只需要解压正文的前 4*body_tokens 个字符
+        body_content = truncate_to_tokens(body_prefix(email_info, max(body_tokens, 0) * 4), body_tokens)
+        body_content = body_content or "（无正文内容）"
+
+        return f"""
+========== 邮件 {index} ==========
+主题: {email_info['subject']}
+发件人: {email_info['from']}
+接收时间: {self._received(email_info)}
+正文内容:
+{body_content}
+===============================
+"""
+
+    def _received(self, email_info):
+        """接收时间；相似邮件合并后的代表邮件显示数量和时间范围"""
+        count = email_info.get('cluster_size', 1)
+        if count <= 1:
+            return email_info['parsed_date']
+        return f"{email_info['cluster_first']} ~ {email_info['cluster_last']}（相似邮件共 {count} 封，只列出第一封）"
+
+    def summarize_emails(self, emails):
+        """使用Gemini总结邮件"""
+        # 按重要性分配正文预算：邮件少时多给上下文，邮件多时压缩次要邮件
+        # 路由掉的营销邮件不进入提示词，不参与预算分配
+        routed = self._routed_indices(emails)
+        selected = [i for i in range(len(emails)) if i not in routed]
+        with metrics.timer('prompt_build'):
+            budgets = dict(zip(selected, self.allocator.allocate([emails[i] for i in selected])))
+        self.allocator.print_report()
+        email_texts = [self.build_email_block(i + 1, email_info, budgets.get(i, 0))
+                       for i, email_info in enumerate(emails)]
+        return self.summarize_blocks(email_texts, emails)
+
+    @metrics.timed('prompt_build')
+    def build_prompt(self, email_texts, count):
+        """把邮件片段组装为完整提示词"""
+        return f"""你是一位专业的邮件管理助手。请仔细分析以下 {count} 封今日收到的邮件，并生成一份实用的摘要报告。
+
+今日邮件详情:
+{''.join(email_texts)}
+
+{REPORT_REQUIREMENTS}"""
+
+    def summarize_blocks(self, email_texts, emails):
+        """根据已构建的邮件片段生成摘要，emails用于AI失败时的备用报告"""
+        if not emails:
+            return self._generate_no_email_report()
+
+        routed = self._routed_indices(emails)
+        if routed:
+            logger.info(f"  关键词路由: {len(routed)} 封营销邮件不经过AI，直接列入低优先级")
+        selected = [i for i in range(len(emails)) if i not in routed]
+        use_map_reduce = self._use_map_reduce([email_texts[i] for i in selected])
+        if self.summary_cache is not None or use_map_reduce:
+            return self._summarize_structured(email_texts, emails, use_map_reduce, routed)
+        if not selected:
+            return self._generate_digest_report([(email_info, self._keyword_summary(email_info))
+                                                 for email_info in emails])
+
+        logger.info(f"\n正在使用Gemini AI分析 {len(selected)} 封邮件...")
+        # 合并后的相似邮件按实际封数计入
+        count = sum(emails[i].get('cluster_size', 1) for i in selected)
+        prompt = self.build_prompt([email_texts[i] for i in selected], count)
+
         try:
-            response = self.model.generate_content(prompt)
-            print("✓ AI摘要生成成功")
-            return response.text
+            response = self.backend.generate(prompt)
+            logger.info("✓ AI摘要生成成功")
+            return self._append_routed_section(response, [emails[i] for i in sorted(routed)])
         except Exception as e:
-            print(f"✗ AI摘要生成失败: {str(e)}")
+            logger.error(f"✗ AI摘要生成失败: {str(e)}")
             return self._generate_fallback_report(emails)
 
+    def _routed_indices(self, emails):
+        """返回可以跳过AI的营销邮件下标"""
+        if self.router is None:
+            return set()
+        return {i for i, email_info in enumerate(emails)
+                if self.router.is_bulk_marketing(email_info, self.route_min_hits)}
+
+    @metrics.timed('render')
+    def _append_routed_section(self, report, routed_emails):
+        """把路由掉的营销邮件作为紧凑的低优先级列表附加到AI报告末尾"""
+        return append_routed_section(report, routed_emails)
+
+    def _use_map_reduce(self, email_texts):
+        """根据配置和提示词大小决定是否使用map-reduce"""
+        if self.map_reduce == 'auto':
+            # 每封邮件的保底预算加起来超过总预算时，单个提示词装不下
+            limit = self.allocator.total_tokens + len(email_texts) * self.BLOCK_OVERHEAD_TOKENS
+            return sum(estimate_tokens(text) for text in email_texts) > limit
+        return bool(self.map_reduce)
+
+    def _summarize_structured(self, email_texts, emails, use_map_reduce, routed=()):
+        """逐封生成结构化摘要后组装报告；map-reduce模式下由AI合并摘要生成最终报告"""
+        items = self.summarize_items(email_texts, emails, routed)
+        if use_map_reduce:
+            return self._reduce_report(items)
+        return self._generate_digest_report(items)
+
+    def summarize_items(self, email_texts, emails, routed=None):
+        """
+        逐封生成结构化摘要，返回 [(邮件信息, 摘要字典)]
+        启用缓存时只为缓存中没有的邮件调用AI；routed为None时按router重新判断
+        """
+        if routed is None:
+            routed = self._routed_indices(emails)
+        keys = [email_info.get('summary_key') or self.summary_key(email_info) for email_info in emails]
+        summaries = {}
+        if self.summary_cache is not None:
+            self.summary_cache.reset_stats()
+            summaries = self.summary_cache.get_many(keys)
+            self.summary_cache.print_stats()
+
+        # 内容完全相同的邮件只分析一次
+        pending = {}
+        for index, key in enumerate(keys):
+            if index not in routed and key not in summaries and key not in pending:
+                pending[key] = index
+        pending = list(pending.values())
+
+        new_summaries = {}
+        if pending:
+            logger.info(f"\n正在使用Gemini AI分析 {len(pending)} 封新邮件...")
+            results = self._map_summaries(email_texts, pending)
+            new_summaries = {keys[index]: results[index] for index in pending if index in results}
+            logger.info(f"✓ AI分析完成 {len(new_summaries)}/{len(pending)} 封")
+        if self.summary_cache is not None:
+            self.summary_cache.put_many(new_summaries)
+        summaries.update(new_summaries)
+
+        # 路由掉的和AI未能分析的邮件使用关键词分类，不写入缓存
+        return [(email_info, summaries.get(key) or self._keyword_summary(email_info))
+                for email_info, key in zip(emails, keys)]
+
+    def assemble_report(self, items):
+        """把已生成的 [(邮件信息, 摘要字典)] 在本地组装为报告，不调用AI"""
+        if not items:
+            return self._generate_no_email_report()
+        return self._generate_digest_report(items)
+
+    def _token_batches(self, email_texts, indices):
+        """把邮件按token预算分批，单批不超过SUMMARY_BATCH_SIZE封"""
+        batches = []
+        batch = []
+        tokens = 0
+        for index in indices:
+            cost = estimate_tokens(email_texts[index])
+            if batch and (tokens + cost > self.batch_tokens or len(batch) >= self.SUMMARY_BATCH_SIZE):
+                batches.append(batch)
+                batch = []
+                tokens = 0
+            batch.append(index)
+            tokens += cost
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _summarize_batch(self, email_texts, batch):
+        """map步骤：为一批邮件生成结构化摘要，返回 {邮件下标: 摘要字典}"""
+        prompt = self.build_item_prompt([email_texts[index] for index in batch])
+        results = self._parse_item_summaries(self.backend.generate(prompt))
+        # 邮件片段里的编号从1开始
+        return {index: results[index + 1] for index in batch if index + 1 in results}
+
+    def _map_summaries(self, email_texts, indices):
+        """并发执行map步骤，失败的批次只影响本批邮件"""
+        batches = self._token_batches(email_texts, indices)
+        if len(batches) > 1:
+            logger.info(f"  分为 {len(batches)} 批，最多 {self.max_concurrency} 个并发请求")
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as executor:
+            futures = [executor.submit(self._summarize_batch, email_texts, batch) for batch in batches]
+            for number, future in enumerate(futures, 1):
+                try:
+                    results.update(future.result())
+                except Exception as e:
+                    logger.error(f"✗ 第 {number} 批摘要失败（{len(batches[number - 1])} 封），这些邮件将使用关键词分类: {str(e)}")
+        return results
+
+    @metrics.timed('prompt_build')
+    def build_reduce_prompt(self, items):
+        """reduce步骤：把每封邮件的结构化摘要合并为最终报告的提示词"""
+        lines = []
+        for index, (email_info, summary) in enumerate(items, 1):
+            action = f" | 建议操作: {summary['action']}" if summary['action'] else ""
+            count = email_info.get('cluster_size', 1)
+            similar = f"（相似邮件 {count} 封）" if count > 1 else ""
+            lines.append(
+                f"{index}. [{summary['priority']}] [{summary['category']}] 主题: {email_info['subject']}{similar} | "
+                f"发件人: {email_info['from']} | 摘要: {summary['gist']}{action}"
+            )
+        summary_lines = '\n'.join(lines)
+        return f"""你是一位专业的邮件管理助手。以下是今日收到的 {len(items)} 封邮件的逐封摘要（已标注优先级 high/medium/low 和分类），请据此生成一份实用的摘要报告。
+
+今日邮件摘要:
+{summary_lines}
+
+{REPORT_REQUIREMENTS}"""
+
+    def _reduce_report(self, items):
+        """reduce步骤：由AI合并逐封摘要生成报告，失败时在本地组装"""
+        logger.info(f"正在合并 {len(items)} 封邮件的摘要...")
+        try:
+            response = self.backend.generate(self.build_reduce_prompt(items))
+            logger.info("✓ AI摘要生成成功")
+            return response
+        except Exception as e:
+            logger.error(f"✗ 合并摘要失败，使用本地报告: {str(e)}")
+            return self._generate_digest_report(items)
+
+    @metrics.timed('prompt_build')
+    def build_item_prompt(self, email_texts):
+        """构建逐封分析邮件、输出JSON的提示词"""
+        return f"""你是一位专业的邮件管理助手。请逐封分析以下 {len(email_texts)} 封邮件，为每封邮件生成一条结构化摘要。
+
+{''.join(email_texts)}
+
+请只输出一个JSON数组，不要有任何解释性文字或代码块标记。每封邮件对应一个元素，格式如下：
+{{"index": 邮件编号, "priority": "high|medium|low", "category": "{'|'.join(self.CATEGORIES)}", "gist": "核心内容摘要（30-50字）", "action": "建议操作，没有则为空字符串"}}
+
+优先级说明：
+- high：需要立即处理的重要邮件（账单、系统通知、工作邮件等）
+- medium：需要关注但不紧急的邮件
+- low：营销邮件、推广信息等
+
+摘要要包含正文的关键信息，不要只写标题。"""
+
+    def _parse_item_summaries(self, text):
+        """解析AI返回的JSON数组，返回 {邮件编号: 摘要字典}"""
+        start = text.find('[')
+        end = text.rfind(']')
+        if start == -1 or end < start:
+            raise ValueError("AI返回内容中没有JSON数组")
+
+        results = {}
+        for item in json.loads(text[start:end + 1]):
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get('index'))
+            except (TypeError, ValueError):
+                continue
+            results[index] = self._normalize_summary(item)
+        return results
+
+    def _normalize_summary(self, item):
+        """把AI返回的一条摘要规范为 {priority, category, gist, action}，无效的优先级和分类使用默认值"""
+        priority = str(item.get('priority', '')).lower()
+        category = str(item.get('category', ''))
+        return {
+            'priority': priority if priority in self.PRIORITIES else 'medium',
+            'category': category if category in self.CATEGORIES else '其他',
+            'gist': str(item.get('gist') or '').strip(),
+            'action': str(item.get('action') or '').strip(),
+        }
+
+    # ---- 周报、月报：每日摘要和合并 ----
+
+    @metrics.timed('prompt_build')
+    def build_day_prompt(self, day, emails):
+        """构建一天邮件的结构化摘要提示词，正文按重要性分配预算（预算分配器有状态，需在同一线程中调用）"""
+        budgets = self.allocator.allocate(emails)
+        email_texts = [self.build_email_block(i + 1, email_info, budget)
+                       for i, (email_info, budget) in enumerate(zip(emails, budgets))]
+        count = sum(email_info.get('cluster_size', 1) for email_info in emails)
+        return f"""你是一位专业的邮件管理助手。以下是 {day.isoformat()} 收到的 {count} 封邮件，请生成这一天的结构化摘要，之后会与其他日期的摘要合并为周报或月报。
+
+{''.join(email_texts)}
+
+请只输出一个JSON对象，不要有任何解释性文字或代码块标记，格式如下：
+{{"overview": "当天邮件概况（50字以内）", "highlights": [{{"index": 邮件编号, "priority": "high|medium|low", "category": "{'|'.join(self.CATEGORIES)}", "gist": "核心内容摘要（30-50字）", "action": "建议操作，没有则为空字符串"}}]}}
+
+highlights 最多 {self.DAY_HIGHLIGHTS} 条，只列出值得在周报或月报中提及的邮件，按重要性排序；营销推广邮件一般不需要列出。
+摘要要包含正文的关键信息，不要只写标题。"""
+
+    def parse_day_summary(self, text, emails):
+        """解析每日摘要的JSON对象，返回 {count, overview, highlights}；重点邮件的主题和发件人取自本地邮件"""
+        start = text.find('{')
+        end = text.rfind('}')
+        if start == -1 or end < start:
+            raise ValueError("AI返回内容中没有JSON对象")
+        data = json.loads(text[start:end + 1])
+        if not isinstance(data, dict):
+            raise ValueError("AI返回的每日摘要不是JSON对象")
+
+        highlights = []
+        for item in data.get('highlights') or []:
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get('index'))
+            except (TypeError, ValueError):
+                continue
+            if not 1 <= index <= len(emails):
+                continue
+            highlights.append(self._highlight(emails[index - 1], self._normalize_summary(item)))
+            if len(highlights) >= self.DAY_HIGHLIGHTS:
+                break
+        return {
+            'count': sum(email_info.get('cluster_size', 1) for email_info in emails),
+            'overview': str(data.get('overview') or '').strip(),
+            'highlights': highlights,
+        }
+
+    def keyword_day_summary(self, emails):
+        """不调用AI时（或AI失败时）按关键词生成的每日摘要"""
+        items = [(email_info, self._keyword_summary(email_info)) for email_info in emails]
+        counts = {}
+        for _, summary in items:
+            counts[summary['category']] = counts.get(summary['category'], 0) + 1
+        total = sum(email_info.get('cluster_size', 1) for email_info in emails)
+        overview = f"共 {total} 封邮件"
+        if counts:
+            overview += '（' + '，'.join(f"{category} {counts[category]} 封"
+                                        for category in self.CATEGORIES if category in counts) + '）'
+        # 营销推广等低优先级邮件不列为重点；稳定排序，同一优先级保持收到的顺序
+        items = sorted((item for item in items if item[1]['priority'] != 'low'),
+                       key=lambda item: self.PRIORITIES.index(item[1]['priority']))
+        return {
+            'count': total,
+            'overview': overview,
+            'highlights': [self._highlight(email_info, summary)
+                           for email_info, summary in items[:self.DAY_HIGHLIGHTS]],
+        }
+
+    def _highlight(self, email_info, summary):
+        """每日摘要中的一条重点邮件"""
+        return {**summary, 'subject': email_info['subject'], 'from': email_info['from'],
+                'similar': email_info.get('cluster_size', 1)}
+
+    @metrics.timed('prompt_build')
+    def build_range_prompt(self, title, days, max_highlights=None):
+        """
+        reduce步骤：把 [(日期, 每日摘要)] 合并为周报或月报的提示词
+        max_highlights: 每天最多列出的重点邮件数，提示词超出预算时减少
+        """
+        max_highlights = self.DAY_HIGHLIGHTS if max_highlights is None else max_highlights
+        lines = []
+        for day, summary in days:
+            lines.append(f"【{day.isoformat()}】{summary['count']} 封邮件。{summary['overview']}")
+            for item in summary['highlights'][:max_highlights]:
+                action = f" | 建议操作: {item['action']}" if item['action'] else ""
+                similar = f"（相似邮件 {item['similar']} 封）" if item.get('similar', 1) > 1 else ""
+                lines.append(f"  - [{item['priority']}] [{item['category']}] 主题: {item['subject']}{similar} | "
+                             f"发件人: {item['from']} | 摘要: {item['gist']}{action}")
+        total = sum(summary['count'] for _, summary in days)
+        day_lines = '\n'.join(lines)
+        return f"""你是一位专业的邮件管理助手。以下是 {days[0][0].isoformat()} 至 {days[-1][0].isoformat()} 共 {len(days)} 天、{total} 封邮件的每日摘要（每天的概况和重点邮件，已标注优先级 high/medium/low 和分类），请据此生成一份{title}。
+
+每日摘要:
+{day_lines}
+
+{RANGE_REPORT_REQUIREMENTS}"""
+
+    def range_report(self, title, days, use_llm=True):
+        """
+        根据 [(日期, 每日摘要)] 生成周报或月报：由AI合并（一次调用），不调用AI或失败时在本地组装
+        提示词超出 self.allocator.total_tokens（BudgetAllocator的总预算）时逐步减少每天列出的重点邮件数
+        """
+        if not use_llm:
+            return self._generate_range_report(title, days)
+        for max_highlights in range(self.DAY_HIGHLIGHTS, -1, -1):
+            prompt = self.build_range_prompt(title, days, max_highlights)
+            if estimate_tokens(prompt) <= self.allocator.total_tokens:
+                break
+        logger.info(f"正在合并 {len(days)} 天的每日摘要...")
+        try:
+            response = self.backend.generate(prompt)
+            logger.info("✓ AI摘要生成成功")
+            return response
+        except Exception as e:
+            logger.error(f"✗ 合并每日摘要失败，使用本地报告: {str(e)}")
+            return self._generate_range_report(title, days)
+
+    @metrics.timed('render')
+    def _generate_range_report(self, title, days):
+        """根据每日摘要在本地生成周报或月报"""
+        return render_range_digest(title, days)
+
+    def _keyword_summary(self, email_info):
+        """AI不可用时按关键词生成的摘要"""
+        body = body_prefix(email_info, 50)
+        priority, category = {
+            'system': ('high', '系统通知'),
+            'marketing': ('low', '营销推广'),
+            'other': ('medium', '其他'),
+        }[self._classify_by_keywords(email_info)]
+        return {'priority': priority, 'category': category, 'gist': body or '（无正文）', 'action': ''}
+
+    @metrics.timed('render')
+    def _generate_digest_report(self, items):
+        """根据 [(邮件信息, 摘要字典)] 在本地生成报告"""
+        return render_digest(items, self.CATEGORIES)
+
+    @metrics.timed('render')
     def _generate_no_email_report(self):
         """生成无邮件报告"""
-        return f"""
-<html>
-<head>
-    <meta charset="utf-8">
-    <style>
-        body {{ font-family: Arial, sans-serif; line-height: 1.6; padding: 20px; }}
-        .header {{ background: #4CAF50; color: white; padding: 15px; border-radius: 5px; }}
-        .content {{ margin-top: 20px; }}
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h2>📧 每日邮件摘要报告</h2>
-        <p>日期: {datetime.now().strftime('%Y-%m-%d')}</p>
-    </div>
-    <div class="content">
-        <h3>📊 今日概览</h3>
-        <p>今天没有收到新邮件。</p>
-        <p>祝你有美好的一天！</p>
-    </div>
-</body>
-</html>
-"""
+        return render_no_email()
+
+    def keyword_report(self, emails):
+        """不调用AI，按关键词分类生成报告（--no-llm / --dry-run）"""
+        if not emails:
+            return self._generate_no_email_report()
+        return self._generate_fallback_report(emails)
+
+    def _classify_by_keywords(self, email_info):
+        """按关键词把邮件分为 system / marketing / other"""
+        return self.classifier.classify(email_info)
 
+    @metrics.timed('render')
     def _generate_fallback_report(self, emails):
         """生成备用报告（当AI失败时）- 改进版包含内容摘要"""
         # 按发件人分类邮件
@@ -130,172 +566,23 @@ HTML格式要求：
         other_emails = []
 
         for email_info in emails:
-            from_addr = email_info['from'].lower()
-            subject = email_info['subject'].lower()
-            body_preview = email_info['body'][:150] if email_info['body'] else "（无正文）"
-
             email_item = {
                 'subject': email_info['subject'],
                 'from': email_info['from'],
                 'time': email_info['parsed_date'],
-                'preview': body_preview
+                'preview': body_preview(email_info) or "（无正文）"
             }
 
-            # 改进的分类逻辑 - 先判断系统通知（高优先级），再判断营销
-            # 系统通知：账单、安全、验证等重要通知
-            is_system = any(word in from_addr or word in subject or word in body_preview[:200].lower() for word in [
-                '账单', '欠费', '余额不足', '到期', '续费', '支付', '缴费',
-                'bill', 'payment', 'expired', 'renew', 'overdue',
-                '验证码', '登录异常', '密码', '风险',
-                '停机', '暂停服务', '服务到期'
-            ])
-
-            # 营销推广：优惠活动、产品推广等
-            is_marketing = any(word in subject or word in body_preview[:200].lower() for word in [
-                '优惠', '促销', '折扣', '限时', '抢购', '特价', '活动',
-                'sale', 'offer', 'discount', 'deal', 'promotion',
-                '1折', '2折', '3折', '5折', '低至', '最低',
-                '双11', '618', '秒杀', '团购', '福利',
-                '更强大', '更高效', '尽在', '立即体验',
-                '免费试用', '新功能', '升级体验',
-                'app下载', '下载app', '安装',
-                '推荐', '精选', '热门', '爆款'
-            ])
-
-            # 分类优先级：系统通知 > 营销推广 > 其他
-            # 注意：先判断系统通知，因为系统通知优先级更高
-            if is_system:
+            category = self._classify_by_keywords(email_info)
+            if category == 'system':
                 system_emails.append(email_item)
-            elif is_marketing:
+            elif category == 'marketing':
                 marketing_emails.append(email_item)
             else:
                 other_emails.append(email_item)
 
-        # 生成分类列表HTML
-        def generate_email_list(email_list, priority_color):
-            html = ""
-            for email in email_list:
-                html += f"""
-        <div style="margin-bottom: 20px; padding: 15px; background: white; border-left: 4px solid {priority_color}; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-            <h4 style="margin: 0 0 10px 0; color: #333;">📧 {email['subject']}</h4>
-            <p style="margin: 5px 0; color: #666; font-size: 14px;">
-                <strong>发件人:</strong> {email['from']}<br>
-                <strong>时间:</strong> {email['time']}
-            </p>
-            <p style="margin: 10px 0 0 0; padding: 10px; background: #f9f9f9; border-radius: 3px; color: #555; font-size: 13px; line-height: 1.6;">
-                <strong>内容摘要:</strong> {email['preview']}...
-            </p>
-        </div>
-"""
-            return html
-
-        system_section = ""
-        if system_emails:
-            system_section = f"""
-        <div style="margin-bottom: 30px;">
-            <h3 style="color: #f44336; border-bottom: 2px solid #f44336; padding-bottom: 10px;">
-                🔴 高优先级 - 系统通知/账单 ({len(system_emails)} 封)
-            </h3>
-            {generate_email_list(system_emails, '#f44336')}
-        </div>
-"""
-
-        marketing_section = ""
-        if marketing_emails:
-            marketing_section = f"""
-        <div style="margin-bottom: 30px;">
-            <h3 style="color: #4CAF50; border-bottom: 2px solid #4CAF50; padding-bottom: 10px;">
-                🟢 低优先级 - 营销推广 ({len(marketing_emails)} 封)
-            </h3>
-            {generate_email_list(marketing_emails, '#4CAF50')}
-        </div>
-"""
-
-        other_section = ""
-        if other_emails:
-            other_section = f"""
-        <div style="margin-bottom: 30px;">
-            <h3 style="color: #FF9800; border-bottom: 2px solid #FF9800; padding-bottom: 10px;">
-                🟡 中优先级 - 其他邮件 ({len(other_emails)} 封)
-            </h3>
-            {generate_email_list(other_emails, '#FF9800')}
-        </div>
-"""
-
-        return f"""
-<html>
-<head>
-    <meta charset="utf-8">
-    <style>
-        body {{
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif;
-            line-height: 1.6;
-            padding: 20px;
-            background: #f5f5f5;
-            color: #333;
-        }}
-        .container {{
-            max-width: 800px;
-            margin: 0 auto;
-            background: white;
-            padding: 30px;
-            border-radius: 10px;
-            box-shadow: 0 4px 6px rgba(0,0,0,0.1);
-        }}
-        .header {{
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-            padding: 25px;
-            border-radius: 8px;
-            margin-bottom: 30px;
-        }}
-        .header h1 {{
-            margin: 0 0 10px 0;
-            font-size: 28px;
-        }}
-        .header p {{
-            margin: 5px 0;
-            opacity: 0.9;
-        }}
-        .summary {{
-            background: #e3f2fd;
-            padding: 20px;
-            border-radius: 8px;
-            margin-bottom: 30px;
-            border-left: 4px solid #2196F3;
-        }}
-        .summary h3 {{
-            margin: 0 0 10px 0;
-            color: #1976D2;
-        }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <div class="header">
-            <h1>📧 每日邮件摘要报告</h1>
-            <p>📅 日期: {datetime.now().strftime('%Y年%m月%d日')}</p>
-            <p>⏰ 生成时间: {datetime.now().strftime('%H:%M:%S')}</p>
-        </div>
-
-        <div class="summary">
-            <h3>📊 今日概览</h3>
-            <p style="margin: 5px 0; font-size: 16px;">
-                今日共收到 <strong style="color: #2196F3; font-size: 20px;">{len(emails)}</strong> 封邮件
-            </p>
-            <p style="margin: 5px 0; color: #666;">
-                系统通知: {len(system_emails)} 封 | 营销推广: {len(marketing_emails)} 封 | 其他: {len(other_emails)} 封
-            </p>
-        </div>
-
-        {system_section}
-        {other_section}
-        {marketing_section}
-
-        <div style="margin-top: 20px; text-align: center; color: #999; font-size: 12px;">
-            <p>本报告由邮件自动摘要系统生成 | Powered by AI</p>
-        </div>
-    </div>
-</body>
-</html>
-"""
+        return render_fallback([
+            ('系统通知', '🔴 高优先级 - 系统通知/账单', '#f44336', system_emails),
+            ('其他', '🟡 中优先级 - 其他邮件', '#FF9800', other_emails),
+            ('营销推广', '🟢 低优先级 - 营销推广', '#4CAF50', marketing_emails),
+        ], len(emails))
@@ -0,0 +1,2 @@
+# -*- coding: utf-8 -*-
+"""基准测试与本地服务器替身，在项目根目录用 python -m benchmarks.<模块> 运行"""
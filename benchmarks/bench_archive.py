@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件归档基准测试
+把 N 封合成邮件按批写入归档，输出写入速度和数据库大小，
+再对比各类查询（全文关键词、发件人、日期范围、组合条件、单字LIKE扫描）与在内存中逐封扫描的耗时
+
+用法: python -m benchmarks.bench_archive [--sizes 10000,100000] [--batch 50] [--repeat 5]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from mail_archive import MailArchive
+
+
+SENDERS = ('"招商银行" <bank@cmbchina.com>', '张三 <zhangsan@example.com>', 'GitHub <noreply@github.com>',
+           'billing@cloud.example.com', '李四 <lisi@example.org>', 'newsletter@promo.example.com')
+SUBJECTS = ('您的信用卡账单已出', 'Re: 项目进度与下周计划', '[repo] Pull request #{0} merged', '发票开具通知 第{0}号',
+            '【限时优惠】全场五折', 'Weekly digest {0}')
+CHARS = '的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经'
+WORDS = ('会议', '预算', '排期', '确认', '报销', '合同', '上线', 'deploy', 'invoice', 'review', 'release', '数据库',
+         '接口', '联调', '灰度', '客户', '需求', '评审', 'meeting', 'schedule')
+
+
+def _vocabulary(rng, size=5000):
+    """随机组成的中英文词加上查询用的词（排在第50位之后），按Zipf分布取词（少数词很常见，大多数词很少出现）"""
+    words = []
+    while len(words) < size - len(WORDS):
+        if rng.random() < 0.5:
+            words.append(''.join(rng.choice(CHARS) for _ in range(rng.randint(2, 4))))
+        else:
+            words.append(''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9))))
+    words[50:50] = WORDS
+    return words, [1 / (rank + 1) for rank in range(len(words))]
+
+
+def _emails(count, seed=2026):
+    """生成 count 封邮件，接收时间分布在最近一年"""
+    rng = random.Random(seed)
+    start = datetime(2025, 10, 18)
+    words, weights = _vocabulary(rng)
+    emails = []
+    for i in range(count):
+        received = start + timedelta(seconds=rng.randrange(365 * 86400))
+        body = ' '.join(rng.choices(words, weights, k=rng.randint(20, 200)))
+        if i % 997 == 0:
+            body += ' 年度审计报告'
+        emails.append({
+            'id': str(i), 'folder': 'INBOX',
+            'subject': rng.choice(SUBJECTS).format(i), 'from': rng.choice(SENDERS), 'to': 'me@qq.com',
+            'date': received.strftime('%a, %d %b %Y %H:%M:%S +0800') + f' ({i})',
+            'parsed_date': received.strftime('%Y-%m-%d %H:%M:%S'), 'body': body,
+        })
+    return emails
+
+
+def _best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def _scan(emails, predicate, limit=20):
+    """没有归档时的做法：在已获取的邮件中逐封匹配"""
+    return sorted((e for e in emails if predicate(e)), key=lambda e: e['parsed_date'], reverse=True)[:limit]
+
+
+QUERIES = (
+    ('全文关键词', {'query': '审计报告'}, lambda e: '审计报告' in e['body']),
+    ('多个关键词', {'query': 'invoice 合同 灰度'},
+     lambda e: all(term in e['subject'] + e['from'] + e['body'] for term in ('invoice', '合同', '灰度'))),
+    ('发件人', {'sender': 'noreply@github.com'}, lambda e: 'noreply@github.com' in e['from']),
+    ('日期范围', {'since': '2026-03-01', 'until': '2026-03-07'},
+     lambda e: '2026-03-01' <= e['parsed_date'] <= '2026-03-07 23:59:59'),
+    ('组合条件', {'query': 'release', 'sender': 'lisi@example.org', 'since': '2026-06-01'},
+     lambda e: 'release' in e['body'] and 'lisi@example.org' in e['from'] and e['parsed_date'] >= '2026-06-01'),
+    ('两字中文词', {'query': '发票'}, lambda e: '发票' in e['subject'] + e['from'] + e['body']),
+    ('单字LIKE', {'query': '审'}, lambda e: '审' in e['subject'] + e['from'] + e['body']),
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='邮件归档基准测试')
+    parser.add_argument('--sizes', default='10000,100000', help='归档的邮件数')
+    parser.add_argument('--batch', type=int, default=50, help='每个事务写入的邮件数（与 FETCH_BATCH_SIZE 相同）')
+    parser.add_argument('--repeat', type=int, default=5, help='每个查询重复次数（取最快）')
+    args = parser.parse_args()
+
+    for count in (int(value) for value in args.sizes.split(',')):
+        emails = _emails(count)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'archive.db')
+            archive = MailArchive(path)
+            try:
+                start = time.perf_counter()
+                for i in range(0, count, args.batch):
+                    archive.add_emails('me@qq.com', emails[i:i + args.batch])
+                ingest = time.perf_counter() - start
+                start = time.perf_counter()
+                duplicates = archive.add_emails('me@qq.com', emails[:args.batch * 20])
+                reingest = time.perf_counter() - start
+                size_mb = os.path.getsize(path) / 1024 / 1024
+                print(f"{count} 封邮件: 写入 {ingest:.2f}s（{count / ingest:.0f} 封/秒），"
+                      f"数据库 {size_mb:.1f}MB；重复写入 {args.batch * 20} 封新增 {duplicates} 封（{reingest * 1000:.0f}ms）")
+                print(f"  {'查询':<8} {'归档(ms)':>10} {'逐封扫描(ms)':>14} {'加速':>8} {'结果':>6}")
+                for name, options, predicate in QUERIES:
+                    indexed, results = _best(lambda: archive.search(**options), args.repeat)
+                    scanned, expected = _best(lambda: _scan(emails, predicate), args.repeat)
+                    assert len(results) == len(expected), (name, len(results), len(expected))
+                    print(f"  {name:<8} {indexed * 1000:>10.2f} {scanned * 1000:>14.2f} "
+                          f"{scanned / indexed:>7.0f}x {len(results):>6}")
+            finally:
+                archive.close()
+        print()
+
+
+if __name__ == '__main__':
+    main()
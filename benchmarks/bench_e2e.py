@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端基准测试
+用合成邮箱填充本地IMAP替身，按每天 100 / 1000 / 10000 封邮件的规模测量：
+获取吞吐量、每MB解析耗时、提示词构建耗时、摘要（本地模拟后端）和发送耗时，以及峰值内存
+
+每个规模在单独的子进程中运行，峰值内存互不影响
+
+用法: python -m benchmarks.bench_e2e [--sizes 100,1000,10000] [--latency 0.002]
+"""
+
+import argparse
+import contextlib
+import email
+import io
+import itertools
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from ai_summarizer import GeminiSummarizer
+from compaction import BodyCompactor
+from email_fetcher import QQEmailFetcher
+from llm_backends import LLMScheduler, StubBackend
+from near_duplicates import NearDuplicateClusterer
+from benchmarks.local_imap import LocalIMAPServer, local_fetcher_class
+from benchmarks.local_smtp import LocalSMTPServer, local_sender_class
+from benchmarks.mailbox_gen import generate_mailbox, populate
+
+
+# 解析耗时只在前N封邮件上测量，避免10000封时重复解析全部邮件
+PARSE_SAMPLE = 500
+
+
+def _peak_rss_mb():
+    """
+    当前进程的峰值常驻内存
+    Linux上ru_maxrss会继承父进程（持有整个合成邮箱）的峰值，优先读取随exec重置的VmHWM
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def measure_parse(count, seed):
+    """解析前PARSE_SAMPLE封合成邮件，返回 (MB数, 耗时)"""
+    fetcher = QQEmailFetcher('bench@qq.com', 'x')
+    raws = list(itertools.islice(generate_mailbox(count, seed), PARSE_SAMPLE))
+    start = time.perf_counter()
+    for raw in raws:
+        fetcher.get_email_body(email.message_from_bytes(raw))
+    return sum(len(raw) for raw in raws) / (1024 * 1024), time.perf_counter() - start
+
+
+def run_child(args):
+    """子进程：连接父进程启动的本地服务器，依次执行各阶段，输出JSON结果"""
+    result = {'messages': args.child}
+    with contextlib.redirect_stdout(io.StringIO()):
+        fetcher_class = local_fetcher_class(('127.0.0.1', args.imap_port))
+        fetcher = fetcher_class('bench@qq.com', 'x')
+        fetcher.connect()
+        emails, result['fetch_s'] = _timed(fetcher.fetch_today_emails)
+        result['fetched'] = len(emails)
+        result['fetch_mb'] = fetcher.stats['bytes'] / (1024 * 1024)
+        result['round_trips'] = fetcher.stats['round_trips']
+        fetcher.disconnect()
+
+        result['parse_mb'], result['parse_s'] = measure_parse(args.child, args.seed)
+
+        # 提示词构建：和主流程相同的压缩、相似邮件合并、预算分配和片段拼接
+        backend = LLMScheduler(StubBackend(latency=0, jitter=0, seed=1))
+        summarizer = GeminiSummarizer(backend=backend)
+        start = time.perf_counter()
+        BodyCompactor().compact_emails(emails)
+        leaders = NearDuplicateClusterer().collapse(emails)
+        budgets = summarizer.allocator.allocate(leaders)
+        blocks = [summarizer.build_email_block(i + 1, email_info, tokens)
+                  for i, (email_info, tokens) in enumerate(zip(leaders, budgets))]
+        prompt = summarizer.build_prompt(blocks, len(emails))
+        result['prompt_s'] = time.perf_counter() - start
+        result['leaders'] = len(leaders)
+        result['prompt_chars'] = len(prompt)
+
+        report, result['summarize_s'] = _timed(summarizer.summarize_emails, leaders)
+
+        sender = local_sender_class(('127.0.0.1', args.smtp_port))('bench@qq.com', 'x')
+        start = time.perf_counter()
+        sent = sender.connect() and sender.send_email('me@qq.com', '基准测试报告', report)
+        sender.disconnect()
+        result['send_s'] = time.perf_counter() - start
+        result['sent'] = bool(sent)
+
+    result['peak_rss_mb'] = _peak_rss_mb()
+    print(json.dumps(result))
+
+
+def run_size(count, args):
+    """启动本地服务器并在子进程中测量一个规模"""
+    imap = LocalIMAPServer(latency=args.latency).start()
+    smtp = LocalSMTPServer(latency=args.latency).start()
+    try:
+        mailbox_bytes, generate_s = _timed(populate, imap.mailbox, count, 'INBOX', args.seed)
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_e2e', '--child', str(count), '--seed', str(args.seed),
+             '--imap-port', str(imap.port), '--smtp-port', str(smtp.port)],
+            capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result.update(mailbox_mb=mailbox_bytes / (1024 * 1024), generate_s=generate_s,
+                      delivered=len(smtp.messages))
+        return result
+    finally:
+        imap.stop()
+        smtp.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='端到端基准测试')
+    parser.add_argument('--sizes', default='100,1000,10000', help='每天的邮件数')
+    parser.add_argument('--latency', type=float, default=0.002, help='IMAP/SMTP每个命令的模拟延迟（秒）')
+    parser.add_argument('--seed', type=int, default=2026, help='合成邮箱的随机种子')
+    parser.add_argument('--child', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--imap-port', type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--smtp-port', type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        run_child(args)
+        return
+
+    print(f"IMAP/SMTP延迟 {args.latency * 1000:.0f}ms, 解析耗时按前 {PARSE_SAMPLE} 封邮件测量")
+    print(f"{'邮件数':>6} {'邮箱MB':>8} {'获取(s)':>8} {'封/秒':>8} {'MB/秒':>7} {'往返':>5} "
+          f"{'解析ms/MB':>10} {'提示词(s)':>9} {'代表邮件':>8} {'摘要(s)':>8} {'发送(s)':>8} {'峰值MB':>7}")
+    for count in [int(value) for value in args.sizes.split(',')]:
+        r = run_size(count, args)
+        if r['fetched'] != count or not r['sent'] or r['delivered'] != 1:
+            print(f"  ✗ 规模 {count}: 获取 {r['fetched']} 封, 发送{'成功' if r['sent'] else '失败'}")
+        print(f"{count:>6} {r['mailbox_mb']:>8.1f} {r['fetch_s']:>8.2f} {r['fetched'] / r['fetch_s']:>8.0f} "
+              f"{r['fetch_mb'] / r['fetch_s']:>7.1f} {r['round_trips']:>5} "
+              f"{r['parse_s'] * 1000 / r['parse_mb']:>10.1f} {r['prompt_s']:>9.2f} {r['leaders']:>8} "
+              f"{r['summarize_s']:>8.2f} {r['send_s']:>8.3f} {r['peak_rss_mb']:>7.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML转文本基准测试
+对比原先的正则替换链和html_text单遍提取器
+
+用法: python -m benchmarks.bench_html_text [--corpus 目录] [--budget 2000]
+--corpus 指向保存的 .html / .eml 邮件目录；不指定时使用内置的营销邮件样本
+"""
+
+import argparse
+import email
+import html as html_module
+import os
+import re
+import time
+
+from html_text import html_to_text
+
+
+def regex_html_to_text(html_body):
+    """改造前 get_email_body 中的正则替换链，作为对照"""
+    html_body = re.sub(r'<script[^>]*>.*?</script>', '', html_body, flags=re.DOTALL | re.IGNORECASE)
+    html_body = re.sub(r'<style[^>]*>.*?</style>', '', html_body, flags=re.DOTALL | re.IGNORECASE)
+    html_body = re.sub(r'<[^>]+>', ' ', html_body)
+    html_body = html_module.unescape(html_body)
+    html_body = re.sub(r'\s+', ' ', html_body)
+    return html_body.strip()
+
+
+def _marketing_email(index, rows):
+    """表格布局、内联样式、隐藏预览文字和跟踪链接的营销邮件"""
+    style = '<style type="text/css">' + ''.join(
+        f'.c{i} {{ color: #{i:06x}; padding: {i % 9}px; }}\n' for i in range(300)) + '</style>'
+    preheader = '<div style="display:none;max-height:0;overflow:hidden">限时优惠，立即查看</div>'
+    cells = []
+    for row in range(rows):
+        link = f'https://click.example.com/track?u={index}&amp;r={row}&amp;sig=' + 'a1b2c3' * 20
+        cells.append(
+            f'<tr><td class="c{row % 300}" style="font-family:Arial;font-size:14px">'
+            f'<a href="{link}">商品 {row} 低至 {row % 9 + 1} 折</a>&nbsp;&middot;&nbsp;'
+            f'<span style="color:#999">原价 &yen;{row * 13}</span></td>'
+            f'<td><img src="https://img.example.com/{row}.png" width="1" height="1"></td></tr>\n'
+        )
+    script = '<script>window.dataLayer=[' + ','.join(f'{{"e":{i}}}' for i in range(200)) + '];</script>'
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>促销</title>{style}</head>'
+            f'<body>{preheader}<table width="100%">{"".join(cells)}</table>{script}'
+            f'<p>如不想再收到此类邮件，请<a href="https://u.example.com/{index}">退订</a></p></body></html>')
+
+
+def _malformed_email(openers):
+    """大量未闭合的<script>/<style>，会让非贪婪DOTALL正则反复扫描到文末"""
+    body = ''.join(f'<p>段落 {i}</p><script type="text/javascript">var a{i} = 1;\n' for i in range(openers))
+    return f'<html><body>{body}<style>.x{{}}</body></html>'
+
+
+def builtin_corpus():
+    """内置样本，按 [(名称, 邮件列表)] 分组：格式正常的营销邮件和残缺标记分开计时"""
+    return [
+        ('营销邮件', [_marketing_email(i, rows) for i, rows in enumerate((20, 60, 150, 400) * 5)]),
+        ('残缺标记', [_malformed_email(800)]),
+    ]
+
+
+def load_corpus(directory):
+    """读取目录中的 .html 文件和 .eml 邮件的HTML部分"""
+    corpus = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(('.html', '.htm')):
+            with open(path, 'rb') as f:
+                corpus.append(f.read().decode('utf-8', errors='ignore'))
+        elif name.endswith('.eml'):
+            with open(path, 'rb') as f:
+                msg = email.message_from_bytes(f.read())
+            for part in msg.walk():
+                if part.get_content_type() == 'text/html':
+                    payload = part.get_payload(decode=True) or b''
+                    corpus.append(payload.decode(part.get_content_charset() or 'utf-8', errors='ignore'))
+    return corpus
+
+
+def _time(func, corpus, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for document in corpus:
+            func(document)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTML转文本基准测试')
+    parser.add_argument('--corpus', help='HTML/EML邮件目录')
+    parser.add_argument('--budget', type=int, default=2000, help='提取器的字符预算（摘要只使用前2000字符）')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    groups = [(args.corpus, load_corpus(args.corpus))] if args.corpus else builtin_corpus()
+    for name, corpus in groups:
+        size_mb = sum(len(document.encode('utf-8')) for document in corpus) / 1024 / 1024
+        print(f"{name}: {len(corpus)} 封HTML邮件, {size_mb:.2f} MB")
+
+        results = [
+            ('正则替换链', _time(regex_html_to_text, corpus, args.repeat)),
+            ('html_text（不限字符）', _time(html_to_text, corpus, args.repeat)),
+            (f'html_text（预算 {args.budget}）',
+             _time(lambda document: html_to_text(document, args.budget), corpus, args.repeat)),
+        ]
+        baseline = results[0][1]
+        for label, elapsed in results:
+            print(f"  {label:<24} {elapsed * 1000:>9.1f} ms  {size_mb / elapsed:>7.1f} MB/s  {baseline / elapsed:>6.2f}x")
+
+if __name__ == '__main__':
+    main()
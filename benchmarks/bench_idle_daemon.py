@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+守护模式基准测试
+邮件在一段时间内陆续到达本地IMAP替身，守护进程通过IDLE逐批获取并预先摘要；
+到发送时间后测量从触发到报告送达的延迟，并与批处理模式（获取+摘要+发送）对比
+
+用法: python -m benchmarks.bench_idle_daemon [--messages 1000] [--duration 10] [--llm-latency 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import threading
+import time
+from datetime import datetime
+
+from ai_summarizer import GeminiSummarizer
+from compaction import BodyCompactor
+from idle_daemon import DigestDaemon
+from llm_backends import LLMScheduler, StubBackend
+from near_duplicates import NearDuplicateClusterer
+from benchmarks.local_imap import LocalIMAPServer, local_fetcher_class
+from benchmarks.local_smtp import LocalSMTPServer, local_sender_class
+from benchmarks.mailbox_gen import generate_mailbox
+
+
+def _summarizer(args):
+    backend = LLMScheduler(StubBackend(latency=args.llm_latency, jitter=0, seed=1), max_concurrency=4)
+    return GeminiSummarizer(backend=backend, max_concurrency=4)
+
+
+def _send(sender_class, report):
+    sender = sender_class('bench@qq.com', 'x')
+    try:
+        return sender.connect() and sender.send_email('me@qq.com', '守护模式基准测试', report)
+    finally:
+        sender.disconnect()
+
+
+def run_batch(imap, smtp, args):
+    """批处理模式：邮件全部到达后一次性获取、摘要并发送，返回总耗时"""
+    fetcher = local_fetcher_class(imap)('bench@qq.com', 'x')
+    summarizer = _summarizer(args)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fetcher.connect()
+        emails = fetcher.fetch_today_emails()
+        fetcher.disconnect()
+        BodyCompactor().compact_emails(emails)
+        report = summarizer.summarize_emails(NearDuplicateClusterer().collapse(emails))
+        _send(local_sender_class(smtp), report)
+    return time.perf_counter() - start
+
+
+def run_daemon(imap, smtp, messages, args):
+    """守护模式：邮件按到达时间陆续写入，全部到达后触发发送，返回 (发送延迟, 摘要条数)"""
+    delivered = threading.Event()
+    sent_at = []
+
+    def send_report(report):
+        ok = _send(local_sender_class(smtp), report)
+        sent_at.append(time.perf_counter())
+        delivered.set()
+        return ok
+
+    daemon = DigestDaemon(local_fetcher_class(imap)('bench@qq.com', 'x'), _summarizer(args), send_report,
+                          compactor=BodyCompactor(), clusterer=NearDuplicateClusterer())
+    thread = threading.Thread(target=daemon.run, daemon=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        thread.start()
+        # 邮件分成每0.1秒一批，在duration秒内到达
+        batches = max(1, int(args.duration * 10))
+        for number in range(batches):
+            for raw in messages[number * len(messages) // batches:(number + 1) * len(messages) // batches]:
+                imap.mailbox.append('INBOX', raw)
+            time.sleep(args.duration / batches)
+        # 等待最后一批完成预摘要
+        deadline = time.monotonic() + 60
+        while daemon.received < len(messages) and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        items = len(daemon.items)
+        start = time.perf_counter()
+        daemon.next_send = datetime.now()
+        daemon.wake()
+        delivered.wait(60)
+        daemon.stop()
+        thread.join(10)
+    return sent_at[0] - start, items
+
+
+def main():
+    parser = argparse.ArgumentParser(description='守护模式基准测试')
+    parser.add_argument('--messages', type=int, default=1000, help='一天的邮件数')
+    parser.add_argument('--duration', type=float, default=10.0, help='邮件陆续到达的时长（秒）')
+    parser.add_argument('--latency', type=float, default=0.002, help='IMAP/SMTP每个命令的模拟延迟（秒）')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='模拟AI调用的延迟（秒）')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    messages = list(generate_mailbox(args.messages))
+    print(f"{args.messages} 封邮件在 {args.duration:.0f} 秒内到达, IMAP/SMTP延迟 {args.latency * 1000:.0f}ms, "
+          f"AI延迟 {args.llm_latency:.1f}s")
+
+    imap = LocalIMAPServer(latency=args.latency).start()
+    smtp = LocalSMTPServer(latency=args.latency).start()
+    try:
+        latency, items = run_daemon(imap, smtp, messages, args)
+        batch = run_batch(imap, smtp, args)
+    finally:
+        imap.stop()
+        smtp.stop()
+
+    print(f"{'模式':<8} {'发送时耗时(s)':>14} {'摘要条数':>8}")
+    print(f"{'批处理':<8} {batch:>14.2f} {'':>8}")
+    print(f"{'守护':<8} {latency:>14.3f} {items:>8}")
+    print(f"送达: {len(smtp.messages)} 封报告")
+
+
+if __name__ == '__main__':
+    main()
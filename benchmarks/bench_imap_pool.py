@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IMAP连接池基准测试
+对比 1 / 4 / 8 个连接在本地IMAP替身上获取当天邮件的耗时
+
+用法: python -m benchmarks.bench_imap_pool [--messages 2000] [--latency 0.02]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+from datetime import datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.header import Header
+from email.utils import format_datetime
+
+from imap_pool import IMAPConnectionPool
+from benchmarks.local_imap import LocalIMAPServer, local_fetcher_class
+
+
+def _make_message(index, when):
+    """生成一封 multipart/alternative 测试邮件"""
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = Header(f'基准测试邮件 {index}', 'utf-8')
+    msg['From'] = f'sender{index % 20}@example.com'
+    msg['To'] = 'me@qq.com'
+    msg['Date'] = format_datetime(when)
+    msg.attach(MIMEText(f'第{index}封邮件的正文内容。' * 40, 'plain', 'utf-8'))
+    msg.attach(MIMEText(f'<p>第{index}封邮件的<b>HTML</b>正文</p>' * 40, 'html', 'utf-8'))
+    return msg.as_bytes()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='IMAP连接池基准测试')
+    parser.add_argument('--messages', type=int, default=2000, help='每个文件夹的邮件数')
+    parser.add_argument('--folders', type=int, default=2, help='文件夹数量')
+    parser.add_argument('--latency', type=float, default=0.02, help='每个命令的模拟延迟（秒）')
+    parser.add_argument('--batch-size', type=int, default=50, help='每次UID FETCH的邮件数')
+    parser.add_argument('--sizes', default='1,4,8', help='要测试的连接数')
+    args = parser.parse_args()
+
+    # 邮件时间取UTC+8的今天中午，保证通过日期筛选
+    utc_plus_8 = timezone(timedelta(hours=8))
+    when = datetime.combine(datetime.now().date(), datetime.min.time(), tzinfo=utc_plus_8) + timedelta(hours=12)
+
+    server = LocalIMAPServer(latency=args.latency).start()
+    folder_names = ['INBOX'] + [f'Folder{i}' for i in range(1, args.folders)]
+    for folder in folder_names:
+        for i in range(args.messages):
+            server.mailbox.append(folder, _make_message(i, when))
+
+    fetcher_class = local_fetcher_class(server)
+    print(f"邮件: {args.messages} × {len(folder_names)} 个文件夹, 延迟 {args.latency * 1000:.0f}ms, "
+          f"批次 {args.batch_size}")
+    print(f"{'连接数':>6} {'耗时(s)':>10} {'加速比':>8} {'往返':>6} {'邮件数':>8}")
+
+    baseline = None
+    reference = None
+    for size in [int(value) for value in args.sizes.split(',')]:
+        pool = IMAPConnectionPool('bench@qq.com', 'x', size=size,
+                                  fetcher_class=fetcher_class, batch_size=args.batch_size)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pool.connect()
+            start = time.perf_counter()
+            emails = pool.fetch_today_emails(folders='all')
+            elapsed = time.perf_counter() - start
+            stats = pool.stats
+            pool.disconnect()
+
+        baseline = baseline or elapsed
+        keys = [(email_info['folder'], email_info['id']) for email_info in emails]
+        if reference is None:
+            reference = keys
+        elif keys != reference:
+            print("  ✗ 结果顺序与单连接不一致")
+        print(f"{size:>6} {elapsed:>10.3f} {baseline / elapsed:>7.2f}x {stats['round_trips']:>6} {len(emails):>8}")
+
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
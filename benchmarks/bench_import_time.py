@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动时间基准测试
+在子进程中用 python -X importtime 导入 main，多次取中位数，与空解释器的启动时间对比，
+并检查创建LLM调度器之后AI SDK（google.generativeai）仍未被导入。
+超出 --budget-ms 或SDK被提前导入时退出码为1，可以在CI中作为冷启动时间的守护
+
+用法: python -m benchmarks.bench_import_time [--runs 5] [--budget-ms 250] [--top 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 只应在第一次调用AI时导入的模块
+LAZY_MODULES = ('google.generativeai', 'grpc', 'google.protobuf')
+
+LAZY_CHECK = """
+import sys
+import main
+config = {'llm_backend': 'gemini', 'llm_api_key': 'x', 'llm_model': None, 'llm_base_url': None,
+          'llm_timeout': 60, 'llm_rate_per_minute': None, 'llm_concurrency': 4, 'llm_max_retries': 3}
+main.create_llm(config)
+print(' '.join(name for name in sys.modules if name.startswith(%r)))
+"""
+
+
+def _run(args):
+    return subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def _wall_time(code):
+    start = time.perf_counter()
+    _run(['-c', code])
+    return time.perf_counter() - start
+
+
+def _import_profile():
+    """返回 {模块名: (自身耗时us, 累计耗时us)}"""
+    result = _run(['-X', 'importtime', '-c', 'import main'])
+    profile = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = (int(self_us), int(cumulative_us))
+    return profile
+
+
+def main():
+    parser = argparse.ArgumentParser(description='启动时间基准测试')
+    parser.add_argument('--runs', type=int, default=5, help='重复次数（取中位数）')
+    parser.add_argument('--budget-ms', type=float, default=250, help='import main 累计耗时上限（毫秒）')
+    parser.add_argument('--top', type=int, default=10, help='列出自身耗时最多的模块数')
+    args = parser.parse_args()
+
+    profiles = [_import_profile() for _ in range(args.runs)]
+    import_ms = statistics.median(profile['main'][1] for profile in profiles) / 1000
+    bare_ms = statistics.median(_wall_time('pass') for _ in range(args.runs)) * 1000
+    main_ms = statistics.median(_wall_time('import main') for _ in range(args.runs)) * 1000
+
+    print(f"空解释器启动: {bare_ms:.0f}ms, 启动并 import main: {main_ms:.0f}ms")
+    print(f"import main 累计耗时（-X importtime，中位数）: {import_ms:.1f}ms，预算 {args.budget_ms:.0f}ms")
+    print(f"自身耗时最多的 {args.top} 个模块:")
+    last = profiles[-1]
+    for name, (self_us, cumulative_us) in sorted(last.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {name:<32} {self_us / 1000:>7.1f}ms（累计 {cumulative_us / 1000:.1f}ms）")
+
+    failed = False
+    eager = [name for name in last if name.startswith(LAZY_MODULES)]
+    if eager:
+        print(f"✗ import main 时导入了AI SDK: {', '.join(eager)}")
+        failed = True
+    loaded = _run(['-c', LAZY_CHECK % (LAZY_MODULES,)]).stdout.split()
+    if loaded:
+        print(f"✗ 创建LLM调度器时导入了AI SDK: {', '.join(loaded)}")
+        failed = True
+    else:
+        print("✓ 创建LLM调度器后AI SDK仍未导入")
+    if import_ms > args.budget_ms:
+        print(f"✗ import main 超出预算: {import_ms:.1f}ms > {args.budget_ms:.0f}ms")
+        failed = True
+    elif not failed:
+        print("✓ 启动时间在预算内")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+LLM调度器基准测试
+通过本地LLM服务器替身（OpenAI兼容接口）测量不同并发、错误率下map步骤的吞吐量和重试次数
+
+用法: python -m benchmarks.bench_llm_scheduler [--batches 40] [--latency 0.2]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_backends import LLMScheduler, OpenAICompatibleBackend
+from benchmarks.local_llm import LocalLLMServer
+
+
+def _prompt(batch, size=20):
+    """和map步骤相同格式的逐封摘要提示词"""
+    blocks = ''.join(f'\n========== 邮件 {batch * size + i} ==========\n正文内容:\n测试正文\n'
+                     for i in range(1, size + 1))
+    return f'请逐封分析以下邮件。{blocks}\n请只输出一个JSON数组，每个元素包含 "index" 等字段。'
+
+
+def run(server, batches, concurrency, rate_per_minute, base_delay):
+    """用concurrency个线程提交batches个请求，返回 (耗时, 成功数, 调度器)"""
+    backend = OpenAICompatibleBackend(model_name='stub', base_url=server.base_url, timeout=10)
+    scheduler = LLMScheduler(backend, rate_per_minute=rate_per_minute, max_concurrency=concurrency,
+                             max_retries=6, base_delay=base_delay, max_delay=2.0)
+
+    def call(batch):
+        try:
+            scheduler.generate(_prompt(batch))
+            return True
+        except Exception:
+            return False
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1) * 2) as executor:
+            succeeded = sum(executor.map(call, range(batches)))
+    return time.perf_counter() - start, succeeded, scheduler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM调度器基准测试')
+    parser.add_argument('--batches', type=int, default=40, help='map批次数（请求数）')
+    parser.add_argument('--latency', type=float, default=0.2, help='每个请求的模拟处理时间（秒）')
+    parser.add_argument('--concurrency', default='1,4,8', help='要测试的并发数')
+    parser.add_argument('--error-rates', default='0,0.2', help='服务端随机返回429的概率')
+    parser.add_argument('--server-limit', type=int, default=6, help='服务端同时处理的请求上限')
+    parser.add_argument('--rate', type=float, default=None, help='客户端每分钟请求上限')
+    parser.add_argument('--base-delay', type=float, default=0.1, help='退避基数（秒）')
+    args = parser.parse_args()
+    # 重试日志会淹没结果表格
+    logging.getLogger().setLevel(logging.ERROR)
+
+    print(f"请求: {args.batches} 个, 延迟 {args.latency * 1000:.0f}ms, 服务端并发上限 {args.server_limit}"
+          + (f", 客户端限速 {args.rate:.0f}/分钟" if args.rate else ""))
+    print(f"{'错误率':>6} {'并发':>4} {'耗时(s)':>8} {'请求/秒':>8} {'成功':>6} {'重试':>6} {'服务端峰值':>10}")
+
+    for error_rate in [float(value) for value in args.error_rates.split(',')]:
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            server = LocalLLMServer(latency=args.latency, error_rate=error_rate,
+                                    max_active=args.server_limit).start()
+            elapsed, succeeded, scheduler = run(server, args.batches, concurrency, args.rate, args.base_delay)
+            print(f"{error_rate:>6.2f} {concurrency:>4} {elapsed:>8.2f} {succeeded / elapsed:>8.1f} "
+                  f"{succeeded:>6} {scheduler.retries:>6} {server.peak:>10}")
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
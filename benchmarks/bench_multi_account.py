@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多账户模式基准测试
+每个账户一个本地IMAP替身（合成邮箱），所有账户共用一个本地SMTP替身和一个带延迟的模拟AI后端，
+对比 1 / 2 / 4 / 8 / 16 个账户在固定工作线程数下的总耗时
+
+用法: python -m benchmarks.bench_multi_account [--accounts 1,2,4,8,16] [--workers 4] [--messages 200]
+"""
+
+import argparse
+import contextlib
+import imaplib
+import io
+import logging
+import os
+import time
+
+import main as digest
+from email_fetcher import QQEmailFetcher
+from email_sender import QQEmailSender
+from llm_backends import LLMScheduler, StubBackend
+from metrics import metrics
+from utils import load_env_config
+from benchmarks.local_imap import LocalIMAPServer
+from benchmarks.local_smtp import LocalSMTPServer, local_sender_class
+from benchmarks.mailbox_gen import populate
+
+
+def _fetcher_class(ports):
+    """按登录账户连接对应的本地IMAP替身"""
+
+    class MultiAccountFetcher(QQEmailFetcher):
+        IMAP_SERVER = '127.0.0.1'
+
+        def _open_connection(self):
+            return imaplib.IMAP4(self.IMAP_SERVER, ports[self.email_account])
+
+    return MultiAccountFetcher
+
+
+def _config(workers):
+    """基准测试用的配置：不使用缓存和增量同步，其余保持默认"""
+    os.environ.setdefault('LLM_BACKEND', 'stub')
+    os.environ.setdefault('ACCOUNTS_FILE', 'benchmark')
+    config = load_env_config()
+    config.update(account_workers=workers, imap_connections=1, imap_folders=['INBOX'],
+                  streaming_pipeline=False)
+    return config
+
+
+def run(count, servers, smtp, args):
+    """处理前count个账户，返回 (耗时, 失败账户数, 送达数, AI调用数)"""
+    accounts = [{'name': f'account{i}', 'qq_email': f'account{i}@qq.com', 'qq_auth_code': 'x',
+                 'recipient_email': f'reader{i}@qq.com'} for i in range(count)]
+    ports = {account['qq_email']: server.port for account, server in zip(accounts, servers)}
+    llm = LLMScheduler(StubBackend(latency=args.llm_latency, jitter=0, seed=1),
+                       rate_per_minute=args.rate, max_concurrency=args.llm_concurrency)
+    stores = {'state_store': None, 'message_cache': None, 'summary_cache': None, 'archive': None,
+              'daily_summaries': None, 'delivery_queue': None}
+    smtp.messages.clear()
+    metrics.reset()
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        failed = digest.run_accounts(_config(args.workers), accounts, llm, stores,
+                                     fetcher_class=_fetcher_class(ports),
+                                     sender_class=local_sender_class(smtp, QQEmailSender))
+    return time.perf_counter() - start, len(failed), len(smtp.messages), llm.calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多账户模式基准测试')
+    parser.add_argument('--accounts', default='1,2,4,8,16', help='要测试的账户数')
+    parser.add_argument('--workers', type=int, default=4, help='账户工作线程数')
+    parser.add_argument('--messages', type=int, default=200, help='每个账户当天的邮件数')
+    parser.add_argument('--latency', type=float, default=0.005, help='IMAP/SMTP每个命令的模拟延迟（秒）')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='模拟AI调用的延迟（秒）')
+    parser.add_argument('--llm-concurrency', type=int, default=4, help='所有账户共用的AI并发上限')
+    parser.add_argument('--rate', type=int, default=120, help='所有账户共用的每分钟AI调用上限')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    sizes = [int(value) for value in args.accounts.split(',')]
+    servers = [LocalIMAPServer(latency=args.latency).start() for _ in range(max(sizes))]
+    smtp = LocalSMTPServer(latency=args.latency).start()
+    try:
+        for i, server in enumerate(servers):
+            populate(server.mailbox, args.messages, 'INBOX', seed=2026 + i)
+
+        print(f"每个账户 {args.messages} 封邮件, {args.workers} 个工作线程, IMAP/SMTP延迟 {args.latency * 1000:.0f}ms, "
+              f"AI延迟 {args.llm_latency:.1f}s, AI并发 {args.llm_concurrency}, 限速 {args.rate}/分钟")
+        print(f"{'账户数':>6} {'耗时(s)':>8} {'每账户(s)':>10} {'相对单账户':>10} {'失败':>5} {'送达':>5} {'AI调用':>7}")
+        baseline = None
+        for count in sizes:
+            elapsed, failed, delivered, calls = run(count, servers, smtp, args)
+            baseline = baseline or elapsed
+            print(f"{count:>6} {elapsed:>8.2f} {elapsed / count:>10.2f} {elapsed / baseline:>9.1f}x "
+                  f"{failed:>5} {delivered:>5} {calls:>7}")
+    finally:
+        for server in servers:
+            server.stop()
+        smtp.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相似邮件聚类基准测试
+在合成的“通知风暴”上测量聚类耗时、分组数、误合并数以及提示词token的减少
+
+用法: python -m benchmarks.bench_near_duplicates [--emails 2000] [--distances 0,3,6]
+"""
+
+import argparse
+import random
+import time
+
+from near_duplicates import NearDuplicateClusterer
+from prompt_budget import estimate_tokens, truncate_to_tokens
+
+
+WORDS = ('项目', '进度', '会议', '预算', '客户', '合同', '需求', '测试', '上线', '评审', '方案', '数据',
+         '报告', '接口', '性能', '安全', '部署', '文档', '计划', '风险', 'review', 'deploy', 'metrics')
+PRODUCTS = ('无线耳机', '机械键盘', '显示器支架', '保温杯', '登山包', '电动牙刷')
+COURIERS = ('顺丰速运', '中通快递', '京东物流')
+
+# 每封邮件在提示词中占用的固定部分（主题、发件人、分隔线等）
+BLOCK_OVERHEAD_TOKENS = 100
+
+
+def _ci_alert(rng, n):
+    commit = ''.join(rng.choice('0123456789abcdef') for _ in range(40))
+    return {
+        'subject': f'[CI] Build #{n} failed on main',
+        'from': 'ci@build.example.com',
+        'body': (f'Pipeline {n} failed at stage test after {rng.randint(1, 59)}m{rng.randint(0, 59)}s.\n'
+                 f'Commit {commit} by dev{rng.randint(1, 9)}.\n'
+                 f'Failed job: unit-tests ({rng.randint(1, 400)} passed, {rng.randint(1, 5)} failed).\n'
+                 f'View details: https://ci.example.com/pipelines/{n}\n'
+                 'You are receiving this email because you are subscribed to pipeline notifications.'),
+    }
+
+
+def _order_update(rng, n):
+    product = rng.choice(PRODUCTS)
+    return {
+        'subject': f'您的订单 {rng.randint(10 ** 9, 10 ** 10)} 已发货',
+        'from': 'service@shop.example.com',
+        'body': (f'亲爱的用户，您购买的商品已由{rng.choice(COURIERS)}发出，运单号 {rng.randint(10 ** 11, 10 ** 12)}，'
+                 f'预计 {rng.randint(1, 3)} 天内送达。商品：{product}。'
+                 '如有疑问请联系在线客服，感谢您的支持。'),
+    }
+
+
+def _unique(rng, n):
+    sentences = ['，'.join(rng.choice(WORDS) for _ in range(rng.randint(4, 9))) + '。' for _ in range(12)]
+    return {
+        'subject': f'关于{rng.choice(WORDS)}{rng.choice(WORDS)}的讨论 {n}',
+        'from': f'colleague{rng.randint(1, 50)}@corp.example.com',
+        'body': ''.join(sentences),
+    }
+
+
+FAMILIES = (('ci', _ci_alert, 0.45), ('order', _order_update, 0.35), ('unique', _unique, 0.20))
+
+
+def make_storm(count, seed=7):
+    """生成通知风暴，每封邮件带 family 字段用于检查误合并"""
+    rng = random.Random(seed)
+    emails = []
+    for n in range(count):
+        pick = rng.random()
+        for family, factory, share in FAMILIES:
+            pick -= share
+            if pick < 0:
+                break
+        email_info = factory(rng, n)
+        email_info['family'] = family
+        email_info['parsed_date'] = f'2026-10-17 {8 + n * 12 // count:02d}:{n % 60:02d}:00'
+        emails.append(email_info)
+    return emails
+
+
+def prompt_tokens(emails, body_tokens=2000):
+    """估算这些邮件构成的提示词token数"""
+    return sum(estimate_tokens(truncate_to_tokens(email_info['body'], body_tokens)) + BLOCK_OVERHEAD_TOKENS
+               for email_info in emails)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='相似邮件聚类基准测试')
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--distances', default='0,3,6', help='要测试的最大汉明距离')
+    args = parser.parse_args()
+
+    emails = make_storm(args.emails)
+    unique_count = sum(1 for email_info in emails if email_info['family'] == 'unique')
+    before = prompt_tokens(emails)
+    print(f"邮件: {len(emails)} 封（其中互不相同的 {unique_count} 封）, 提示词约 {before} token")
+    print(f"{'距离':>4} {'耗时(ms)':>10} {'分组':>6} {'混合分组':>8} {'误合并':>6} {'提示词token':>12} {'减少':>6}")
+
+    for distance in [int(value) for value in args.distances.split(',')]:
+        clusterer = NearDuplicateClusterer(distance)
+        copies = [dict(email_info) for email_info in emails]
+        start = time.perf_counter()
+        clusters = [clusterer.add(email_info)[0] for email_info in copies]
+        leaders = [cluster.annotate() for cluster in clusterer.clusters]
+        elapsed = time.perf_counter() - start
+
+        # 混合分组：同一组里出现了不同类型的邮件；误合并：互不相同的邮件被并入其他组
+        families = {}
+        for email_info, cluster in zip(copies, clusters):
+            families.setdefault(cluster.index, set()).add(email_info['family'])
+        mixed = sum(1 for kinds in families.values() if len(kinds) > 1)
+        false_merges = unique_count - sum(1 for leader in leaders if leader['family'] == 'unique')
+        after = prompt_tokens(leaders)
+        print(f"{distance:>4} {elapsed * 1000:>10.1f} {len(leaders):>6} {mixed:>8} {false_merges:>6} "
+              f"{after:>12} {(1 - after / before) * 100:>5.0f}%")
+
+
+if __name__ == '__main__':
+    main()
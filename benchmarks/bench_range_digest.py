@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周报、月报基准测试
+本地IMAP替身中放入最近 --days 天的邮件，用模拟AI后端生成月报：
+第一次运行（没有每日摘要）、第二天的运行（区间后移一天）和重复运行，
+输出获取的邮件数、AI调用次数、最大提示词和耗时，并与把所有邮件放进一个提示词的做法对比
+
+用法: python -m benchmarks.bench_range_digest [--days 30] [--per-day 150] [--llm-latency 0.5]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import main as digest
+from ai_summarizer import GeminiSummarizer
+from daily_summaries import DailySummaryStore
+from email_sender import QQEmailSender
+from llm_backends import LLMScheduler, StubBackend, stub_reply
+from metrics import metrics
+from prompt_budget import estimate_tokens
+from utils import load_env_config
+from benchmarks.local_imap import LocalIMAPServer, local_fetcher_class
+from benchmarks.local_smtp import LocalSMTPServer, local_sender_class
+from benchmarks.mailbox_gen import generate_message
+
+
+def populate_days(mailbox, days, per_day, today, seed=2026):
+    """向邮箱写入 today 之前 days 天的邮件，每天 per_day 封，时间在 08:00-23:00（UTC+8）之间"""
+    rng = random.Random(seed)
+    utc_plus_8 = timezone(timedelta(hours=8))
+    index = 0
+    for offset in range(days, 0, -1):
+        start = datetime.combine(today - timedelta(days=offset), datetime.min.time(), tzinfo=utc_plus_8)
+        for number in range(per_day):
+            when = start + timedelta(hours=8) + timedelta(hours=15) * number / per_day
+            mailbox.append('INBOX', generate_message(rng, index, when))
+            index += 1
+
+
+class PromptRecorder:
+    """模拟模型输出，并记录每个提示词的token数"""
+
+    def __init__(self):
+        self.tokens = []
+
+    def __call__(self, prompt):
+        self.tokens.append(estimate_tokens(prompt))
+        return stub_reply(prompt)
+
+
+def _config(days, today, store_path):
+    """基准测试用的配置：只使用每日摘要存储，截止日期为 today 的前一天"""
+    os.environ.setdefault('LLM_BACKEND', 'stub')
+    os.environ.setdefault('ACCOUNTS_FILE', 'benchmark')
+    end = today - timedelta(days=1)
+    config = load_env_config(date_range=(end - timedelta(days=days - 1), end))
+    config.update(daily_summary_db=store_path, imap_connections=1, imap_folders=['INBOX'])
+    return config
+
+
+def run(config, store, imap, smtp, args):
+    """生成一次报告，返回 (耗时, 获取的邮件数, AI调用数, 最大提示词token数, 是否送达)"""
+    recorder = PromptRecorder()
+    llm = LLMScheduler(StubBackend(latency=args.llm_latency, jitter=0, seed=1, responder=recorder),
+                       max_concurrency=args.llm_concurrency)
+    stores = {'state_store': None, 'message_cache': None, 'summary_cache': None, 'archive': None,
+              'daily_summaries': store, 'delivery_queue': None}
+    account = {'name': 'bench', 'qq_email': 'bench@qq.com', 'qq_auth_code': 'x', 'recipient_email': 'me@qq.com'}
+    smtp.messages.clear()
+    metrics.reset()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        ok, _ = digest.run_range(config, account, llm, stores, fetcher_class=local_fetcher_class(imap),
+                                 sender_class=local_sender_class(smtp, QQEmailSender))
+    elapsed = time.perf_counter() - start
+    return (elapsed, metrics.counters.get('messages_fetched', 0), len(recorder.tokens), max(recorder.tokens),
+            ok and len(smtp.messages) == 1)
+
+
+def single_prompt_tokens(imap, start, end):
+    """原来的做法：获取区间内的所有邮件放进一个提示词（每封邮件使用默认的正文上限），返回 (邮件数, token数)"""
+    fetcher = local_fetcher_class(imap)('bench@qq.com', 'x')
+    with contextlib.redirect_stdout(io.StringIO()):
+        fetcher.connect()
+        emails = fetcher.fetch_emails(start, end)
+        fetcher.disconnect()
+    summarizer = GeminiSummarizer(backend=StubBackend(latency=0, jitter=0))
+    blocks = [summarizer.build_email_block(i + 1, email_info) for i, email_info in enumerate(emails)]
+    return len(emails), estimate_tokens(summarizer.build_prompt(blocks, len(emails)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='周报、月报基准测试')
+    parser.add_argument('--days', type=int, default=30, help='报告的天数')
+    parser.add_argument('--per-day', type=int, default=150, help='每天的邮件数')
+    parser.add_argument('--latency', type=float, default=0.002, help='IMAP/SMTP每个命令的模拟延迟（秒）')
+    parser.add_argument('--llm-latency', type=float, default=0.5, help='模拟AI调用的延迟（秒）')
+    parser.add_argument('--llm-concurrency', type=int, default=4, help='AI并发上限')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    today = datetime.now().date()
+    imap = LocalIMAPServer(latency=args.latency).start()
+    smtp = LocalSMTPServer(latency=args.latency).start()
+    try:
+        # 多放一天：第一次运行截止到前天（模拟昨天的运行），第二天的运行截止到昨天
+        populate_days(imap.mailbox, args.days + 1, args.per_day, today)
+        with tempfile.TemporaryDirectory() as directory:
+            store_path = os.path.join(directory, 'daily.db')
+            store = DailySummaryStore(store_path)
+            first = _config(args.days, today - timedelta(days=1), store_path)
+            count, tokens = single_prompt_tokens(imap, *first['date_range'])
+            print(f"{args.days} 天, 每天 {args.per_day} 封邮件, AI延迟 {args.llm_latency:.1f}s, 并发 {args.llm_concurrency}")
+            print(f"单个提示词（{count} 封邮件）: 约 {tokens} tokens，默认预算 {first['prompt_token_budget']} tokens")
+            print(f"{'运行':<14} {'耗时(s)':>8} {'获取邮件':>8} {'AI调用':>7} {'最大提示词':>10} {'送达':>5}")
+            cases = (
+                ('首次（无摘要）', first),
+                ('第二天', _config(args.days, today, store_path)),
+                ('重复运行', _config(args.days, today, store_path)),
+            )
+            try:
+                for name, config in cases:
+                    elapsed, fetched, calls, largest, delivered = run(config, store, imap, smtp, args)
+                    print(f"{name:<14} {elapsed:>8.2f} {fetched:>8} {calls:>7} {largest:>10} {'✓' if delivered else '✗':>5}")
+            finally:
+                store.close()
+    finally:
+        imap.stop()
+        smtp.stop()
+
+
+if __name__ == '__main__':
+    main()
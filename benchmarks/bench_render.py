@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告渲染基准测试
+按逐封摘要报告（AI/缓存路径）和备用报告（AI不可用时）分别渲染 N 封邮件，
+输出渲染耗时、HTML和纯文本大小，以及构建MIME邮件的耗时和大小
+
+用法: python -m benchmarks.bench_render [--sizes 100,1000,10000] [--repeat 3]
+"""
+
+import argparse
+import contextlib
+import io
+import random
+import time
+
+from ai_summarizer import GeminiSummarizer
+from email_sender import QQEmailSender
+from llm_backends import StubBackend
+
+
+SUBJECTS = ('您的账单已出 <第{0}期>', 'Re: 项目进度 & 下周计划 #{0}', '【限时优惠】全场五折 "{0}"', 'Weekly digest {0}')
+SENDERS = ('"招商银行" <bank@cmbchina.com>', '张三 <zhangsan@example.com>', 'shop@promo.example.com')
+
+
+def _items(count, seed=2026):
+    """生成 count 封邮件和对应的结构化摘要，主题和发件人包含需要转义的字符"""
+    rng = random.Random(seed)
+    items = []
+    for i in range(count):
+        email_info = {
+            'subject': rng.choice(SUBJECTS).format(i),
+            'from': rng.choice(SENDERS),
+            'parsed_date': f'2026-10-18 {i % 24:02d}:{i % 60:02d}:00',
+            'body': '会议纪要：<b>请确认</b> 预算 & 排期。' * rng.randint(2, 20),
+        }
+        if i % 50 == 0:
+            email_info.update(cluster_size=rng.randint(2, 9), cluster_first='08:00', cluster_last='18:00')
+        summary = {
+            'priority': rng.choice(('high', 'medium', 'low')),
+            'category': rng.choice(GeminiSummarizer.CATEGORIES),
+            'gist': f'第{i}封：对方希望在周五前确认 <方案B> 的预算 & 排期',
+            'action': '回复确认' if i % 3 == 0 else '',
+        }
+        items.append((email_info, summary))
+    return items
+
+
+def _best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报告渲染基准测试')
+    parser.add_argument('--sizes', default='100,1000,10000', help='邮件数')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数（取最快）')
+    args = parser.parse_args()
+
+    summarizer = GeminiSummarizer(backend=StubBackend(latency=0, jitter=0))
+    sender = QQEmailSender('bench@qq.com', 'x')
+    print(f"{'报告':<6} {'邮件数':>6} {'渲染(ms)':>10} {'HTML(KB)':>10} {'文本(KB)':>10} {'MIME(ms)':>10} {'MIME(KB)':>10}")
+    for count in (int(value) for value in args.sizes.split(',')):
+        items = _items(count)
+        emails = [email_info for email_info, _ in items]
+        for name, render in (('摘要', lambda: summarizer._generate_digest_report(items)),
+                             ('备用', lambda: summarizer._generate_fallback_report(emails))):
+            with contextlib.redirect_stdout(io.StringIO()):
+                render_time, report = _best(render, args.repeat)
+                mime_time, data = _best(lambda: sender.build_message('渲染基准测试', report), args.repeat)
+            text = getattr(report, 'text', None) or ''
+            print(f"{name:<6} {count:>6} {render_time * 1000:>10.1f} {len(report.encode('utf-8')) / 1024:>10.0f} "
+                  f"{len(text.encode('utf-8')) / 1024:>10.0f} {mime_time * 1000:>10.1f} {len(data) / 1024:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
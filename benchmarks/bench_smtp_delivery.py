@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告投递基准测试
+对比逐个收件人 连接+构建邮件+发送+断开 与投递引擎（复用连接、邮件只构建一次）的吞吐量，
+并在会断开连接、拒收部分收件人的本地SMTP替身上验证重连和重试队列
+
+用法: python -m benchmarks.bench_smtp_delivery [--recipients 1,10,50,200] [--latency 0.002] [--report-kb 200]
+"""
+
+import argparse
+import contextlib
+import io
+import logging
+import os
+import tempfile
+import time
+
+from delivery import DeliveryEngine, DeliveryQueue
+from email_sender import QQEmailSender
+from benchmarks.local_smtp import LocalSMTPServer, local_sender_class
+
+
+SUBJECT = '📧 每日邮件摘要 - 投递基准测试'
+
+
+def _report(size_kb):
+    """生成约 size_kb KB 的HTML报告"""
+    row = '<tr><td>发件人</td><td>项目进度周报：本周完成接口联调，下周开始灰度发布</td></tr>\n'
+    return '<html><body><table>\n' + row * (size_kb * 1024 // len(row.encode('utf-8')) + 1) + '</table></body></html>'
+
+
+def _recipients(count):
+    return [f'reader{i}@qq.com' for i in range(count)]
+
+
+def run_per_recipient(sender_class, recipients, report):
+    """原来的发送方式：每个收件人单独连接、构建并发送"""
+    for recipient in recipients:
+        sender = sender_class('bench@qq.com', 'x')
+        if sender.connect():
+            sender.send_email(recipient, SUBJECT, report)
+        sender.disconnect()
+
+
+def run_engine(sender_class, recipients, report, queue=None):
+    """投递引擎：一个连接、一次构建"""
+    engine = DeliveryEngine(sender_class('bench@qq.com', 'x'), queue)
+    try:
+        return engine.send(recipients, SUBJECT, report)
+    finally:
+        engine.close()
+
+
+def _timed(server, func, *args):
+    server.messages.clear()
+    logins = server.logins
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        func(*args)
+    return time.perf_counter() - start, len(server.messages), server.logins - logins
+
+
+def run_faults(args, report):
+    """服务器每20封断开一次，部分收件人临时（451）或永久（550）拒收；之后恢复并重发队列"""
+    recipients = _recipients(100)
+    temporary = {address: '451 Mailbox busy, try again later' for address in recipients[5:100:10]}
+    permanent = {recipients[3]: '550 Mailbox not found'}
+    server = LocalSMTPServer(latency=args.latency, reject={**temporary, **permanent}, drop_every=20).start()
+    sender_class = local_sender_class(server, QQEmailSender)
+    with tempfile.TemporaryDirectory() as directory:
+        queue = DeliveryQueue(os.path.join(directory, 'queue.db'), retry_delay=0)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                result = run_engine(sender_class, recipients, report, queue)
+            print(f"第一次发送: 送达 {len(result['sent'])}, 进入重试队列 {len(result['queued'])}, "
+                  f"永久失败 {len(result['failed'])}, 登录 {server.logins} 次（服务器每20封断开一次）")
+
+            server.reject = dict(permanent)
+            engine = DeliveryEngine(sender_class('bench@qq.com', 'x'), queue)
+            with contextlib.redirect_stdout(io.StringIO()):
+                remaining = engine.retry_pending()
+                engine.close()
+            delivered = {recipient.strip('<>') for _, rcpts, _ in server.messages for recipient in rcpts}
+            print(f"服务器恢复后重发: 队列剩余 {remaining}, 共送达 {len(delivered)}/{len(recipients)} 个收件人")
+        finally:
+            queue.close()
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='报告投递基准测试')
+    parser.add_argument('--recipients', default='1,10,50,200', help='要测试的收件人数')
+    parser.add_argument('--latency', type=float, default=0.002, help='SMTP每个回复的模拟延迟（秒）')
+    parser.add_argument('--report-kb', type=int, default=200, help='报告HTML大小（KB）')
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.ERROR)
+
+    report = _report(args.report_kb)
+    print(f"报告 {args.report_kb}KB, SMTP延迟 {args.latency * 1000:.0f}ms")
+    print(f"{'收件人':>6} {'逐个连接(s)':>12} {'投递引擎(s)':>12} {'加速':>6} {'封/秒':>8} {'登录次数':>10}")
+    server = LocalSMTPServer(latency=args.latency).start()
+    sender_class = local_sender_class(server, QQEmailSender)
+    try:
+        for count in (int(value) for value in args.recipients.split(',')):
+            recipients = _recipients(count)
+            naive, naive_sent, naive_logins = _timed(server, run_per_recipient, sender_class, recipients, report)
+            engine, engine_sent, engine_logins = _timed(server, run_engine, sender_class, recipients, report)
+            assert naive_sent == engine_sent == count
+            print(f"{count:>6} {naive:>12.3f} {engine:>12.3f} {naive / engine:>5.1f}x {count / engine:>8.0f} "
+                  f"{naive_logins:>4} / {engine_logins:<4}")
+    finally:
+        server.stop()
+
+    print()
+    run_faults(args, report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地IMAP服务器替身
+用于在不访问imap.qq.com的情况下测试和基准测试邮件获取
+"""
+
+import imaplib
+import re
+import select
+import socketserver
+import threading
+import time
+import email
+from email.utils import parsedate_to_datetime
+from datetime import datetime
+
+from email_fetcher import QQEmailFetcher
+
+
+_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def _split_header(raw):
+    """把原始邮件拆分为头部和正文"""
+    for sep in (b'\r\n\r\n', b'\n\n'):
+        index = raw.find(sep)
+        if index != -1:
+            return raw[:index + len(sep)], raw[index + len(sep):]
+    return raw, b''
+
+
+def _quote(value):
+    """IMAP字符串引用"""
+    if value is None:
+        return 'NIL'
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{value}"'
+
+
+class Mailbox:
+    """内存邮箱：文件夹 -> 邮件列表"""
+
+    def __init__(self):
+        self.folders = {}
+        self.lock = threading.Condition()
+
+    def add_folder(self, name, uidvalidity=None):
+        """创建文件夹"""
+        with self.lock:
+            if name not in self.folders:
+                self.folders[name] = {
+                    'uidvalidity': uidvalidity or int(time.time()),
+                    'uidnext': 1,
+                    'messages': [],
+                }
+            return self.folders[name]
+
+    def append(self, folder, raw, uid=None):
+        """追加一封邮件，返回UID"""
+        with self.lock:
+            box = self.add_folder(folder)
+            if uid is None:
+                uid = box['uidnext']
+            box['uidnext'] = max(box['uidnext'], uid + 1)
+            box['messages'].append(_StoredMessage(uid, raw))
+            self.lock.notify_all()
+            return uid
+
+    def reset_uidvalidity(self, folder, uidvalidity):
+        """修改UIDVALIDITY（模拟服务器重建文件夹）"""
+        with self.lock:
+            self.folders[folder]['uidvalidity'] = uidvalidity
+
+
+class _StoredMessage:
+    """邮件及其解析结果"""
+
+    def __init__(self, uid, raw):
+        self.uid = uid
+        self.raw = raw
+        self._msg = None
+        self.date = None
+        try:
+            header, _ = _split_header(raw)
+            date_str = email.message_from_bytes(header).get('Date')
+            self.date = parsedate_to_datetime(date_str)
+        except Exception:
+            self.date = None
+
+    @property
+    def msg(self):
+        if self._msg is None:
+            self._msg = email.message_from_bytes(self.raw)
+        return self._msg
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """单个IMAP会话"""
+
+    def setup(self):
+        super().setup()
+        self.selected = None
+
+    def send(self, text):
+        if isinstance(text, str):
+            text = text.encode('utf-8')
+        self.wfile.write(text)
+        self.server.bytes_sent += len(text)
+
+    def tagged(self, tag, text):
+        latency = self.server.latency
+        if latency:
+            time.sleep(latency)
+        self.send(f'{tag} {text}\r\n')
+        self.wfile.flush()
+
+    def handle(self):
+        self.send('* OK local IMAP stand-in ready\r\n')
+        self.wfile.flush()
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            line = line.rstrip(b'\r\n').decode('utf-8', errors='replace')
+            if not line:
+                continue
+            tag, _, rest = line.partition(' ')
+            command, _, args = rest.partition(' ')
+            command = command.upper()
+            if command == 'UID':
+                sub, _, args = args.partition(' ')
+                command = 'UID ' + sub.upper()
+            handler = getattr(self, 'cmd_' + command.replace(' ', '_'), None)
+            try:
+                if handler is None:
+                    self.tagged(tag, f'BAD unknown command {command}')
+                elif handler(tag, args) is False:
+                    return
+            except Exception as e:
+                self.tagged(tag, f'BAD {e}')
+
+    # ---- 会话命令 ----
+
+    def cmd_CAPABILITY(self, tag, args):
+        self.send('* CAPABILITY IMAP4rev1 IDLE UIDPLUS\r\n')
+        self.tagged(tag, 'OK CAPABILITY completed')
+
+    def cmd_LOGIN(self, tag, args):
+        self.server.logins += 1
+        self.tagged(tag, 'OK LOGIN completed')
+
+    def cmd_LOGOUT(self, tag, args):
+        self.send('* BYE logging out\r\n')
+        self.tagged(tag, 'OK LOGOUT completed')
+        return False
+
+    def cmd_NOOP(self, tag, args):
+        self._report_exists()
+        self.tagged(tag, 'OK NOOP completed')
+
+    def cmd_LIST(self, tag, args):
+        for name in list(self.server.mailbox.folders):
+            self.send(f'* LIST (\\HasNoChildren) "/" {_quote(name)}\r\n')
+        self.tagged(tag, 'OK LIST completed')
+
+    def cmd_SELECT(self, tag, args):
+        name = args.strip().strip('"')
+        box = self.server.mailbox.folders.get(name)
+        if box is None:
+            self.tagged(tag, 'NO no such mailbox')
+            return
+        self.selected = name
+        self.known_exists = len(box['messages'])
+        self.send(f'* {len(box["messages"])} EXISTS\r\n')
+        self.send('* 0 RECENT\r\n')
+        self.send(f'* OK [UIDVALIDITY {box["uidvalidity"]}] UIDs valid\r\n')
+        self.send(f'* OK [UIDNEXT {box["uidnext"]}] next UID\r\n')
+        self.tagged(tag, 'OK [READ-WRITE] SELECT completed')
+
+    cmd_EXAMINE = cmd_SELECT
+
+    def cmd_IDLE(self, tag, args):
+        mailbox = self.server.mailbox
+        self.send('+ idling\r\n')
+        self.wfile.flush()
+        # 不能给rfile设置超时：超时一次之后socket文件对象就不能再读，客户端的DONE会丢失
+        while True:
+            self._report_exists()
+            ready, _, _ = select.select([self.connection], [], [], 0.05)
+            if not ready:
+                with mailbox.lock:
+                    mailbox.lock.wait(0.05)
+                continue
+            line = self.rfile.readline()
+            if not line or line.strip().upper() == b'DONE':
+                break
+        self.tagged(tag, 'OK IDLE terminated')
+
+    def _report_exists(self):
+        if self.selected is None:
+            return
+        count = len(self.server.mailbox.folders[self.selected]['messages'])
+        if count != getattr(self, 'known_exists', count):
+            self.send(f'* {count} EXISTS\r\n')
+            self.wfile.flush()
+        self.known_exists = count
+
+    # ---- 搜索 ----
+
+    def _messages(self):
+        return self.server.mailbox.folders[self.selected]['messages']
+
+    def _search(self, args):
+        tokens = args.split()
+        messages = self._messages()
+        result = list(enumerate(messages, 1))
+        i = 0
+        while i < len(tokens):
+            key = tokens[i].upper()
+            if key == 'ALL':
+                i += 1
+            elif key in ('SINCE', 'BEFORE', 'ON'):
+                day = datetime.strptime(tokens[i + 1].strip('"'), '%d-%b-%Y').date()
+                if key == 'SINCE':
+                    result = [(n, m) for n, m in result if m.date and m.date.date() >= day]
+                elif key == 'BEFORE':
+                    result = [(n, m) for n, m in result if m.date and m.date.date() < day]
+                else:
+                    result = [(n, m) for n, m in result if m.date and m.date.date() == day]
+                i += 2
+            elif key == 'UID':
+                uids = self._resolve_set(tokens[i + 1], by_uid=True)
+                result = [(n, m) for n, m in result if m.uid in uids]
+                i += 2
+            else:
+                raise ValueError(f'unsupported search key {key}')
+        return result
+
+    def cmd_SEARCH(self, tag, args):
+        if args.upper().startswith('CHARSET'):
+            args = args.split(' ', 2)[2]
+        found = self._search(args)
+        self.send('* SEARCH ' + ' '.join(str(n) for n, _ in found) + '\r\n')
+        self.tagged(tag, 'OK SEARCH completed')
+
+    def cmd_UID_SEARCH(self, tag, args):
+        if args.upper().startswith('CHARSET'):
+            args = args.split(' ', 2)[2]
+        found = self._search(args)
+        self.send('* SEARCH ' + ' '.join(str(m.uid) for _, m in found) + '\r\n')
+        self.tagged(tag, 'OK SEARCH completed')
+
+    def _resolve_set(self, text, by_uid):
+        messages = self._messages()
+        if by_uid:
+            top = max((m.uid for m in messages), default=0)
+        else:
+            top = len(messages)
+        wanted = set()
+        for piece in text.split(','):
+            if ':' in piece:
+                a, b = piece.split(':')
+                a = top if a == '*' else int(a)
+                b = top if b == '*' else int(b)
+                lo, hi = min(a, b), max(a, b)
+                if by_uid:
+                    wanted.update(m.uid for m in messages if lo <= m.uid <= hi)
+                else:
+                    wanted.update(range(lo, hi + 1))
+            else:
+                wanted.add(top if piece == '*' else int(piece))
+        return wanted
+
+    # ---- FETCH ----
+
+    def cmd_FETCH(self, tag, args):
+        self._fetch(tag, args, by_uid=False)
+
+    def cmd_UID_FETCH(self, tag, args):
+        self._fetch(tag, args, by_uid=True)
+
+    def _fetch(self, tag, args, by_uid):
+        msgset, _, items = args.partition(' ')
+        items = _parse_items(items)
+        if by_uid and 'UID' not in items:
+            items.insert(0, 'UID')
+        wanted = self._resolve_set(msgset, by_uid)
+        for seq, stored in enumerate(self._messages(), 1):
+            key = stored.uid if by_uid else seq
+            if key not in wanted:
+                continue
+            parts = [f'* {seq} FETCH (']
+            first = True
+            for item in items:
+                if not first:
+                    parts.append(' ')
+                first = False
+                parts.append(self._fetch_item(stored, item))
+            parts.append(')\r\n')
+            for part in parts:
+                self.send(part)
+        self.wfile.flush()
+        self.tagged(tag, 'OK FETCH completed')
+
+    def _fetch_item(self, stored, item):
+        upper = item.upper()
+        if upper == 'UID':
+            return f'UID {stored.uid}'
+        if upper == 'FLAGS':
+            return 'FLAGS (\\Seen)'
+        if upper == 'RFC822.SIZE':
+            return f'RFC822.SIZE {len(stored.raw)}'
+        if upper == 'INTERNALDATE':
+            date = stored.date or datetime.now().astimezone()
+            text = f'{date.day:02d}-{_MONTHS[date.month - 1]}-{date.year} {date.strftime("%H:%M:%S %z")}'
+            return f'INTERNALDATE "{text}"'
+        if upper in ('RFC822', 'BODY[]', 'BODY.PEEK[]'):
+            name = 'RFC822' if upper == 'RFC822' else 'BODY[]'
+            return _literal(name, stored.raw)
+        if upper == 'RFC822.HEADER':
+            return _literal('RFC822.HEADER', _split_header(stored.raw)[0])
+        if upper == 'BODYSTRUCTURE':
+            return 'BODYSTRUCTURE ' + _bodystructure(stored.msg)
+        mo = re.match(r'BODY(?:\.PEEK)?\[(.*)\](?:<(\d+)\.(\d+)>)?$', item, re.I)
+        if mo:
+            section, start, length = mo.group(1), mo.group(2), mo.group(3)
+            data = _section(stored, section)
+            name = f'BODY[{section}]'
+            if start is not None:
+                start, length = int(start), int(length)
+                data = data[start:start + length]
+                name += f'<{start}>'
+            return _literal(name, data)
+        raise ValueError(f'unsupported fetch item {item}')
+
+
+def _literal(name, data):
+    return f'{name} {{{len(data)}}}\r\n'.encode('ascii') + data
+
+
+def _parse_items(text):
+    """解析FETCH数据项列表"""
+    text = text.strip()
+    if text.startswith('(') and text.endswith(')'):
+        text = text[1:-1]
+    items = []
+    current = ''
+    depth = 0
+    for ch in text:
+        if ch == '[':
+            depth += 1
+        elif ch == ']':
+            depth -= 1
+        if ch == ' ' and depth == 0:
+            if current:
+                items.append(current)
+            current = ''
+        else:
+            current += ch
+    if current:
+        items.append(current)
+    return items
+
+
+def _part_by_number(msg, number):
+    """按IMAP段号查找MIME部分"""
+    part = msg
+    for index in number.split('.'):
+        index = int(index)
+        if part.is_multipart():
+            part = part.get_payload()[index - 1]
+        elif index != 1:
+            raise ValueError('no such part')
+    return part
+
+
+def _section(stored, section):
+    """获取BODY[section]内容"""
+    upper = section.upper()
+    header, text = _split_header(stored.raw)
+    if upper == '':
+        return stored.raw
+    if upper == 'HEADER':
+        return header
+    if upper == 'TEXT':
+        return text
+    if upper.startswith('HEADER.FIELDS'):
+        names = re.search(r'\((.*)\)', section).group(1).upper().split()
+        return _filter_header(header, names, exclude=upper.startswith('HEADER.FIELDS.NOT'))
+    mo = re.match(r'([\d.]+?)(?:\.(MIME|HEADER|TEXT))?$', section, re.I)
+    if not mo:
+        raise ValueError(f'bad section {section}')
+    part = _part_by_number(stored.msg, mo.group(1))
+    suffix = (mo.group(2) or '').upper()
+    raw_part = part.as_bytes()
+    part_header, part_body = _split_header(raw_part)
+    if suffix in ('MIME', 'HEADER'):
+        return part_header
+    if part.is_multipart() or suffix == 'TEXT':
+        return part_body
+    payload = part.get_payload(decode=False)
+    if isinstance(payload, str):
+        return payload.encode('ascii', errors='surrogateescape')
+    return part_body
+
+
+def _filter_header(header, names, exclude=False):
+    lines = header.replace(b'\r\n', b'\n').split(b'\n')
+    fields = []
+    for line in lines:
+        if line[:1] in (b' ', b'\t') and fields:
+            fields[-1] += b'\r\n' + line
+        elif line:
+            fields.append(line)
+    kept = []
+    for field in fields:
+        name = field.split(b':', 1)[0].strip().decode('ascii', errors='ignore').upper()
+        if (name in names) != exclude:
+            kept.append(field)
+    return b'\r\n'.join(kept) + b'\r\n\r\n'
+
+
+def _params(part):
+    params = part.get_params()
+    if not params or len(params) <= 1:
+        return 'NIL'
+    return '(' + ' '.join(f'{_quote(k.upper())} {_quote(v)}' for k, v in params[1:]) + ')'
+
+
+def _bodystructure(part):
+    """生成BODYSTRUCTURE"""
+    if part.is_multipart():
+        children = ''.join(_bodystructure(p) for p in part.get_payload())
+        return f'({children} {_quote(part.get_content_subtype().upper())} {_params(part)} NIL NIL NIL)'
+    maintype = part.get_content_maintype().upper()
+    subtype = part.get_content_subtype().upper()
+    encoding = (part.get('Content-Transfer-Encoding') or '7BIT').strip().upper()
+    payload = part.get_payload(decode=False)
+    if not isinstance(payload, str):
+        payload = ''
+    size = len(payload.encode('ascii', errors='surrogateescape'))
+    disposition = 'NIL'
+    disp = part.get('Content-Disposition')
+    if disp:
+        kind = disp.split(';')[0].strip().upper()
+        filename = part.get_filename()
+        disp_params = f'("FILENAME" {_quote(filename)})' if filename else 'NIL'
+        disposition = f'({_quote(kind)} {disp_params})'
+    fields = f'{_quote(maintype)} {_quote(subtype)} {_params(part)} NIL NIL {_quote(encoding)} {size}'
+    if maintype == 'TEXT':
+        fields += f' {payload.count(chr(10))}'
+    return f'({fields} NIL {disposition} NIL NIL)'
+
+
+class LocalIMAPServer(socketserver.ThreadingTCPServer):
+    """线程化本地IMAP服务器，latency为每个命令的模拟延迟（秒）"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, mailbox=None, latency=0.0, host='127.0.0.1', port=0):
+        super().__init__((host, port), _Handler)
+        self.mailbox = mailbox or Mailbox()
+        self.latency = latency
+        self.bytes_sent = 0
+        self.logins = 0
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """在后台线程启动服务器"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self.shutdown()
+        self.server_close()
+
+
+def local_fetcher_class(server, base=QQEmailFetcher):
+    """生成连接到本地服务器（明文IMAP）的获取器类，server可以是服务器对象或 (host, port)"""
+    host, port = server if isinstance(server, tuple) else server.server_address[:2]
+
+    class LocalIMAPFetcher(base):
+        IMAP_SERVER = host
+        IMAP_PORT = port
+
+        def _open_connection(self):
+            return imaplib.IMAP4(self.IMAP_SERVER, self.IMAP_PORT)
+
+    return LocalIMAPFetcher
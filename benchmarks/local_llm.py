@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地LLM服务器替身
+实现OpenAI兼容的 /chat/completions 接口，可设置延迟、限流错误率和同时处理的请求上限，
+用于离线测试 OpenAICompatibleBackend 和 LLMScheduler
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from llm_backends import stub_reply
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        if not self.path.endswith('/chat/completions'):
+            self._send(404, {'error': {'message': 'not found'}})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        request = json.loads(self.rfile.read(length).decode('utf-8'))
+        prompt = request['messages'][-1]['content']
+
+        with server.lock:
+            server.requests += 1
+            overloaded = server.active >= server.max_active
+            failing = server.random.random() < server.error_rate
+            if not overloaded and not failing:
+                server.active += 1
+                server.peak = max(server.peak, server.active)
+        if overloaded or failing:
+            self._send(429, {'error': {'message': 'rate limited'}})
+            return
+
+        try:
+            time.sleep(server.latency)
+            self._send(200, {
+                'model': request.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': stub_reply(prompt)}}],
+            })
+        finally:
+            with server.lock:
+                server.active -= 1
+
+
+class LocalLLMServer(ThreadingHTTPServer):
+    """
+    线程化本地LLM服务器
+    latency: 每个请求的处理时间（秒）
+    error_rate: 随机返回429的概率
+    max_active: 同时处理的请求上限，超出时返回429（模拟服务端限流）
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.2, error_rate=0.0, max_active=1000, host='127.0.0.1', port=0, seed=1):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.max_active = max_active
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.active = 0
+        self.peak = 0
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def start(self):
+        """在后台线程启动服务器"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地SMTP服务器替身
+支持 EHLO/HELO、AUTH PLAIN/LOGIN、MAIL/RCPT/DATA、RSET、NOOP、QUIT，收到的邮件保存在内存中；
+可以按收件人返回错误应答，或每个会话收到若干封邮件后断开连接，用于测试重连和重试队列
+"""
+
+import smtplib
+import socketserver
+import threading
+import time
+
+from email_sender import QQEmailSender
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """单个SMTP会话"""
+
+    def reply(self, text):
+        latency = self.server.latency
+        if latency:
+            time.sleep(latency)
+        self.wfile.write(f'{text}\r\n'.encode('utf-8'))
+        self.wfile.flush()
+
+    def readline(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        return line.decode('utf-8', errors='replace').rstrip('\r\n')
+
+    def handle(self):
+        self.reply('220 local SMTP stand-in ready')
+        sender = None
+        recipients = []
+        received = 0
+        while True:
+            line = self.readline()
+            if line is None:
+                return
+            command = line.split(' ', 1)[0].upper()
+
+            if command in ('EHLO', 'HELO'):
+                if command == 'EHLO':
+                    self.wfile.write(b'250-localhost\r\n250-AUTH PLAIN LOGIN\r\n')
+                    self.reply('250 SIZE 52428800')
+                else:
+                    self.reply('250 localhost')
+            elif command == 'AUTH':
+                parts = line.split()
+                if parts[1].upper() == 'LOGIN':
+                    # 用户名和密码各一轮质询
+                    for prompt in ('VXNlcm5hbWU6', 'UGFzc3dvcmQ6'):
+                        if len(parts) > 2 and prompt == 'VXNlcm5hbWU6':
+                            continue
+                        self.reply(f'334 {prompt}')
+                        if self.readline() is None:
+                            return
+                elif len(parts) < 3:
+                    self.reply('334 ')
+                    if self.readline() is None:
+                        return
+                self.server.logins += 1
+                self.reply('235 Authentication successful')
+            elif command == 'MAIL':
+                sender = line.split(':', 1)[1].strip()
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipient = line.split(':', 1)[1].strip()
+                rejection = self.server.reject.get(recipient.strip('<>'))
+                if rejection:
+                    self.reply(rejection)
+                    continue
+                recipients.append(recipient)
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw or raw in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(raw[1:] if raw.startswith(b'..') else raw)
+                data = b''.join(lines)
+                with self.server.lock:
+                    self.server.messages.append((sender, recipients, data))
+                self.reply('250 OK queued')
+                received += 1
+                if self.server.drop_every and received % self.server.drop_every == 0:
+                    # 模拟服务器关闭空闲或长时间使用的连接
+                    return
+            elif command == 'RSET':
+                sender, recipients = None, []
+                self.reply('250 OK')
+            elif command == 'NOOP':
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class LocalSMTPServer(socketserver.ThreadingTCPServer):
+    """
+    线程化本地SMTP服务器，latency为每个回复的模拟延迟（秒）
+    reject: {收件人地址: 错误应答}，例如 {'a@qq.com': '451 Try again later'}
+    drop_every: 每个会话收到这么多封邮件后断开连接，0 表示不断开
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, latency=0.0, host='127.0.0.1', port=0, reject=None, drop_every=0):
+        super().__init__((host, port), _Handler)
+        self.latency = latency
+        self.reject = dict(reject or {})
+        self.drop_every = drop_every
+        self.messages = []
+        self.logins = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """在后台线程启动服务器"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器"""
+        self.shutdown()
+        self.server_close()
+
+
+def local_sender_class(server, base=QQEmailSender):
+    """生成连接到本地服务器（明文SMTP）的发送器类，server可以是服务器对象或 (host, port)"""
+    host, port = server if isinstance(server, tuple) else server.server_address[:2]
+
+    class LocalSMTPSender(base):
+        SMTP_SERVER = host
+        SMTP_PORT = port
+
+        def _open_connection(self):
+            return smtplib.SMTP(self.SMTP_SERVER, self.SMTP_PORT)
+
+    return LocalSMTPSender
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成邮箱生成器
+按固定随机种子生成接近真实分布的邮件：纯文本、HTML营销邮件、multipart/alternative、带附件、
+回复链、多种字符集和传输编码
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+from email.charset import Charset, BASE64, QP
+from email.header import Header
+from email.mime.application import MIMEApplication
+from email.mime.image import MIMEImage
+from email.mime.multipart import MIMEMultipart
+from email.mime.nonmultipart import MIMENonMultipart
+from email.utils import format_datetime
+
+
+SENDERS = (
+    ('系统通知', 'noreply@notice.example.com'),
+    ('京东商城', 'newsletter@jd.example.com'),
+    ('GitHub', 'notifications@github.example.com'),
+    ('张伟', 'zhang.wei@corp.example.com'),
+    ('Li Na', 'lina@partner.example.com'),
+    ('招商银行', 'service@bank.example.com'),
+    ('CI Bot', 'ci@build.example.com'),
+    ('王芳', 'wangfang@qq.com'),
+)
+SUBJECTS = (
+    '您的{month}月账单已出，请按时缴费', '限时优惠：全场低至{n}折', '[CI] Build #{n} failed on main',
+    'Re: 关于项目进度的讨论', '会议纪要 - 第{n}次周会', '您的订单 {n} 已发货', '登录异常提醒',
+    'Weekly digest #{n}', '合同草案请审阅', 'Fwd: 报价单',
+)
+SENTENCES = (
+    '请在本周五之前完成评审并反馈意见。', '本次更新修复了若干已知问题，并提升了整体性能。',
+    '附件是最新版本的方案，请查收。', '如有疑问，请随时与我联系。', '我们注意到您的账户在新的设备上登录。',
+    '活动时间有限，先到先得。', 'The deployment finished with 3 warnings.', 'Please review the attached document.',
+    '本月消费共计 {amount} 元，最后还款日为 {day} 日。', '感谢您一直以来的支持与信任。',
+    '项目整体进度符合预期，下周将进入测试阶段。', 'Let me know if the numbers look right to you.',
+)
+# (字符集, 权重)：大部分是UTF-8，其余覆盖国内常见的GBK/GB2312以及Big5和Latin-1
+CHARSETS = (('utf-8', 70), ('gbk', 12), ('gb2312', 10), ('big5', 4), ('iso-8859-1', 4))
+# (邮件类型, 权重)
+KINDS = (('plain', 25), ('alternative', 30), ('marketing', 25), ('attachment', 12), ('reply', 8))
+
+
+def _weighted(rng, choices):
+    return rng.choices([value for value, _ in choices], weights=[weight for _, weight in choices])[0]
+
+
+def _text(rng, sentences):
+    parts = [rng.choice(SENTENCES).format(amount=rng.randint(10, 9999), day=rng.randint(1, 28))
+             for _ in range(sentences)]
+    paragraphs = [''.join(parts[i:i + 4]) for i in range(0, len(parts), 4)]
+    return '\n\n'.join(paragraphs)
+
+
+def _encodable(text, charset):
+    """去掉目标字符集无法编码的字符（Latin-1邮件只保留ASCII内容）"""
+    return text.encode(charset, errors='ignore').decode(charset)
+
+
+def _mime_text(text, subtype, charset, rng):
+    """随机使用base64或quoted-printable传输编码"""
+    part = MIMENonMultipart('text', subtype)
+    cs = Charset(charset)
+    cs.body_encoding = rng.choice((BASE64, QP))
+    part.set_payload(_encodable(text, charset), cs)
+    return part
+
+
+def _marketing_html(rng, rows):
+    style = '<style>' + ''.join(f'.c{i}{{color:#{i * 4099 % 0xffffff:06x};padding:{i % 9}px}}' for i in range(80)) + '</style>'
+    cells = ''.join(
+        f'<tr><td class="c{row % 80}" style="font-family:Arial;font-size:14px">'
+        f'<a href="https://click.example.com/t?u={rng.randint(1, 10 ** 9)}&amp;r={row}&amp;sig={rng.getrandbits(128):032x}">'
+        f'商品 {row} 低至 {rng.randint(1, 9)} 折</a>&nbsp;&middot;&nbsp;<span>原价 &yen;{rng.randint(10, 999)}</span></td>'
+        f'<td><img src="https://img.example.com/{row}.png" width="120" height="120"></td></tr>'
+        for row in range(rows)
+    )
+    preheader = '<div style="display:none;max-height:0">本周精选好物，错过再等一年</div>'
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>促销</title>{style}</head>'
+            f'<body>{preheader}<table width="100%">{cells}</table>'
+            f'<p>如不想再收到此类邮件，请<a href="https://u.example.com/x">退订</a></p>'
+            f'<script>window.track&&track({rng.randint(1, 10 ** 6)})</script></body></html>')
+
+
+def _html_from_text(text):
+    paragraphs = ''.join(f'<p style="margin:0 0 12px 0">{paragraph}</p>' for paragraph in text.split('\n\n'))
+    return f'<html><body><div style="font-family:sans-serif">{paragraphs}</div></body></html>'
+
+
+def generate_message(rng, index, when):
+    """生成一封邮件，返回原始字节"""
+    kind = _weighted(rng, KINDS)
+    charset = _weighted(rng, CHARSETS)
+    name, address = rng.choice(SENDERS)
+    subject = rng.choice(SUBJECTS).format(month=when.month, n=rng.randint(1, 9999))
+    text = _text(rng, rng.randint(3, 40))
+
+    if kind == 'plain':
+        msg = _mime_text(text, 'plain', charset, rng)
+    elif kind == 'alternative':
+        msg = MIMEMultipart('alternative')
+        msg.attach(_mime_text(text, 'plain', charset, rng))
+        msg.attach(_mime_text(_html_from_text(text), 'html', charset, rng))
+    elif kind == 'marketing':
+        msg = _mime_text(_marketing_html(rng, rng.randint(10, 120)), 'html', 'utf-8', rng)
+    elif kind == 'attachment':
+        msg = MIMEMultipart('mixed')
+        msg.attach(_mime_text(text, 'plain', charset, rng))
+        for number in range(rng.randint(1, 3)):
+            size = int(rng.paretovariate(1.5) * 10 * 1024)
+            payload = rng.randbytes(min(size, 1024 * 1024))
+            if rng.random() < 0.5:
+                attachment = MIMEApplication(payload, 'pdf')
+                attachment.add_header('Content-Disposition', 'attachment', filename=f'report_{number}.pdf')
+            else:
+                attachment = MIMEImage(payload, 'jpeg')
+                attachment.add_header('Content-Disposition', 'attachment', filename=f'photo_{number}.jpg')
+            msg.attach(attachment)
+    else:
+        quoted = '\n'.join('> ' + line for line in _text(rng, 12).split('\n'))
+        body = (f'{text}\n\n--\n{name}\n\n在 {when:%Y年%m月%d日} {when:%H:%M}，'
+                f'{rng.choice(SENDERS)[0]} 写道：\n{quoted}')
+        msg = _mime_text(body, 'plain', charset, rng)
+        subject = 'Re: ' + subject
+
+    header_charset = charset if charset != 'iso-8859-1' else 'utf-8'
+    msg['Subject'] = Header(_encodable(subject, header_charset), header_charset)
+    msg['From'] = f'{Header(name, "utf-8").encode()} <{address}>'
+    msg['To'] = 'me@qq.com'
+    msg['Date'] = format_datetime(when)
+    msg['Message-ID'] = f'<bench-{index}-{rng.getrandbits(32):08x}@example.com>'
+    return msg.as_bytes()
+
+
+def today_window():
+    """今天（本机日期）08:00-23:00 的UTC+8时间范围，保证通过获取器的日期筛选"""
+    utc_plus_8 = timezone(timedelta(hours=8))
+    start = datetime.combine(datetime.now().date(), datetime.min.time(), tzinfo=utc_plus_8) + timedelta(hours=8)
+    return start, timedelta(hours=15)
+
+
+def generate_mailbox(count, seed=2026):
+    """按时间顺序生成count封今天的邮件"""
+    rng = random.Random(seed)
+    start, span = today_window()
+    for index in range(count):
+        yield generate_message(rng, index, start + span * index / max(count, 1))
+
+
+def populate(mailbox, count, folder='INBOX', seed=2026):
+    """向本地IMAP替身的邮箱写入count封邮件，返回总字节数"""
+    total = 0
+    for raw in generate_mailbox(count, seed):
+        mailbox.append(folder, raw)
+        total += len(raw)
+    return total
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+正文压缩
+在摘要之前去掉引用的历史邮件、签名、退订和免责声明页脚，把链接缩短为域名，减少提示词token
+"""
+
+import logging
+import re
+from urllib.parse import urlsplit
+
+from prompt_budget import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+
+# 引用历史的开头：之后的内容都是以前的邮件
+# 署名行必须独占一行，并带有日期、时间或邮箱地址，避免截掉正文中的“某某写道：”
+_ATTRIBUTION_DETAIL = r'(?=[^\n]*(?:\d{4}|\d{1,2}:\d{2}|@))'
+_QUOTE_HEADER_RE = re.compile(
+    r'^[ \t]*(?:'
+    r'On\s' + _ATTRIBUTION_DETAIL + r'[^\n]{1,200}?\swrote\s*:[ \t]*$'
+    r'|在\s?' + _ATTRIBUTION_DETAIL + r'[^\n]{1,200}?写道\s*[:：][ \t]*$'
+    r'|-{2,}\s*(?:原始邮件|Original Message|Forwarded message|转发的邮件)\s*-{2,}'
+    r'|_{10,}'
+    r')',
+    re.IGNORECASE | re.MULTILINE
+)
+# Outlook风格的引用头：发件人一行后紧跟发送时间一行
+_OUTLOOK_HEADER_RE = re.compile(
+    r'^\s*(?:From|发件人)\s*[:：].*\n\s*(?:Sent|Date|发送时间|时间)\s*[:：]',
+    re.IGNORECASE | re.MULTILINE
+)
+_QUOTED_LINE_RE = re.compile(r'^[ \t]*>.*(?:\n|$)', re.MULTILINE)
+# 签名分隔符和移动端签名
+_SIGNATURE_RE = re.compile(r'^-- ?$', re.MULTILINE)
+_MOBILE_SIGNATURE_RE = re.compile(
+    r'^\s*(?:Sent from my \w+.*|Get Outlook for \w+.*|发自我的\s?\w+.*|来自\s?\w*邮箱.*)$',
+    re.IGNORECASE | re.MULTILINE
+)
+# 页脚关键词：只在正文后部出现时才截掉
+# confidential、copyright、© 这类词也常出现在正文里，只匹配页脚特有的写法（如行首的 “© 2026”）
+_FOOTER_RE = re.compile(
+    r'unsubscribe|取消订阅|退订|do not reply|请勿(?:直接)?回复|系统自动发送|免责声明|disclaimer'
+    r'|confidentiality notice|privacy policy|隐私政策|manage (?:your )?preferences|版权所有|all rights reserved'
+    r'|^[ \t]*(?:©|\(c\)|copyright)[ \t]*(?:©[ \t]*)?(?:19|20)\d{2}',
+    re.IGNORECASE | re.MULTILINE
+)
+_URL_RE = re.compile(r'https?://[^\s<>"\'（）()\[\]]+', re.IGNORECASE)
+_BOUNDARY_RE = re.compile(r'\n|[。！？!?]|\.(?=\s)')
+
+# 页脚只在正文最后这部分出现时才视为页脚
+FOOTER_TAIL_RATIO = 0.3
+# 去掉引用历史后几乎没有剩余内容时（例如直接转发的邮件），保留引用部分
+MIN_REMAINING_CHARS = 5
+
+
+def _shorten_url(match):
+    """把链接替换为域名"""
+    try:
+        host = urlsplit(match.group(0)).hostname or ''
+    except ValueError:
+        host = ''
+    if host.startswith('www.'):
+        host = host[4:]
+    return f'[{host}]' if host else '[链接]'
+
+
+def _cut_quoted_history(text):
+    """去掉引用的历史邮件"""
+    positions = [match.start() for match in (_QUOTE_HEADER_RE.search(text), _OUTLOOK_HEADER_RE.search(text))
+                 if match]
+    if positions:
+        head = text[:min(positions)]
+        if len(head.strip()) >= MIN_REMAINING_CHARS:
+            text = head
+    without_quotes = _QUOTED_LINE_RE.sub('', text)
+    if len(without_quotes.strip()) >= MIN_REMAINING_CHARS:
+        text = without_quotes
+    return text
+
+
+def _cut_signature(text):
+    """去掉签名分隔符之后的内容和移动端签名"""
+    match = _SIGNATURE_RE.search(text)
+    if match and len(text[:match.start()].strip()) >= MIN_REMAINING_CHARS:
+        text = text[:match.start()]
+    return _MOBILE_SIGNATURE_RE.sub('', text)
+
+
+def _cut_footer(text):
+    """正文后部出现退订、免责声明等关键词时，从所在句子或段落开始截掉"""
+    tail_start = int(len(text) * (1 - FOOTER_TAIL_RATIO))
+    match = _FOOTER_RE.search(text, tail_start)
+    if not match:
+        return text
+    boundaries = [0] + [boundary.end() for boundary in _BOUNDARY_RE.finditer(text, 0, match.start())]
+    cut = boundaries.pop()
+    # 紧挨着的前几句也是页脚（如“系统自动发送，请勿回复”）时一起去掉，中间的空行跳过
+    while boundaries and (not text[boundaries[-1]:cut].strip() or _FOOTER_RE.search(text, boundaries[-1], cut)):
+        cut = boundaries.pop()
+    if len(text[:cut].strip()) < MIN_REMAINING_CHARS:
+        return text
+    return text[:cut]
+
+
+def _normalize_whitespace(text):
+    """压缩行内空白和多余空行"""
+    lines = [' '.join(line.split()) for line in text.split('\n')]
+    text = '\n'.join(lines)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+def compact_body(text):
+    """压缩单封邮件正文，返回压缩后的文本"""
+    if not text:
+        return text
+    text = text.replace('\r\n', '\n').replace('\r', '\n')
+    text = _cut_quoted_history(text)
+    text = _cut_signature(text)
+    text = _URL_RE.sub(_shorten_url, text)
+    text = _cut_footer(text)
+    return _normalize_whitespace(text)
+
+
+class BodyCompactor:
+    """在获取和摘要之间压缩邮件正文，并统计节省的token"""
+
+    # 运行报告中列出节省最多的邮件数
+    TOP_SAVINGS = 5
+
+    def __init__(self):
+        self.reset_stats()
+
+    def reset_stats(self):
+        """重置统计"""
+        self.original_tokens = 0
+        self.compacted_tokens = 0
+        self.original_bytes = 0
+        self.compacted_bytes = 0
+        self.savings = []
+
+    def compact(self, email_info):
+        """压缩email_info['body']（原地修改），返回email_info"""
+        body = email_info.get('body') or ''
+        compacted = compact_body(body)
+        before = estimate_tokens(body) if body else 0
+        after = estimate_tokens(compacted) if compacted else 0
+
+        self.original_tokens += before
+        self.compacted_tokens += after
+        self.original_bytes += len(body.encode('utf-8'))
+        self.compacted_bytes += len(compacted.encode('utf-8'))
+        self.savings.append((before - after, email_info.get('subject', '')))
+
+        email_info['body'] = compacted
+        email_info['compaction_saved_tokens'] = before - after
+        return email_info
+
+    def compact_emails(self, emails):
+        """压缩一组邮件的正文"""
+        for email_info in emails:
+            self.compact(email_info)
+        return emails
+
+    def print_stats(self):
+        """输出本次运行节省的token和字节数"""
+        if not self.savings:
+            return
+        saved = self.original_tokens - self.compacted_tokens
+        ratio = saved / self.original_tokens * 100 if self.original_tokens else 0
+        logger.info(f"  正文压缩: {len(self.savings)} 封邮件共节省约 {saved} token ({ratio:.0f}%), "
+                    f"{(self.original_bytes - self.compacted_bytes) / 1024:.1f} KB, "
+                    f"平均每封 {saved // len(self.savings)} token")
+        for tokens, subject in sorted(self.savings, key=lambda item: item[0], reverse=True)[:self.TOP_SAVINGS]:
+            if tokens <= 0:
+                break
+            logger.info(f"    -{tokens} token  {subject[:40]}")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+每日摘要存储
+按 (账号, 日期) 保存每天邮件的结构化摘要，周报、月报由这些摘要合并生成，
+已有摘要的日期不再重新获取邮件或调用AI
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+
+class DailySummaryStore:
+    """基于SQLite的每日摘要，值为 {count, overview, highlights} 字典；模型或提示词版本不同的摘要视为不存在"""
+
+    def __init__(self, db_path):
+        """打开或创建数据库"""
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS daily_summaries (
+                account TEXT NOT NULL,
+                day TEXT NOT NULL,
+                model TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                summary TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (account, day)
+            );
+        """)
+        self.conn.commit()
+
+    def get_many(self, account, days, model, version):
+        """读取 days（date列表）中已保存的摘要，返回 {date: 摘要字典}"""
+        if not days:
+            return {}
+        wanted = {day.isoformat(): day for day in days}
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT day, summary FROM daily_summaries
+                WHERE account = ? AND day BETWEEN ? AND ? AND model = ? AND version = ?
+                """,
+                (account, min(wanted), max(wanted), model, version)
+            ).fetchall()
+        return {wanted[day]: json.loads(summary) for day, summary in rows if day in wanted}
+
+    def put_many(self, account, summaries, model, version):
+        """在一个事务中写入 {date: 摘要字典}，同一天的旧摘要被替换"""
+        now = time.time()
+        rows = [(account, day.isoformat(), model, version, json.dumps(summary, ensure_ascii=False), now)
+                for day, summary in summaries.items()]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO daily_summaries (account, day, model, version, summary, created)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            self.conn.commit()
+
+    def close(self):
+        """关闭数据库"""
+        self.conn.close()
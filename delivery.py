@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告投递
+复用一个SMTP连接把同一份报告发给多个收件人（邮件只构建一次），
+临时失败的投递写入SQLite重试队列，按指数退避在之后的运行中重发
+"""
+
+import logging
+import smtplib
+import sqlite3
+import threading
+import time
+import zlib
+
+from metrics import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def is_permanent_error(error):
+    """5xx应答（收件人不存在、被拒收等）重试也不会成功，其余错误视为临时错误"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    code = getattr(error, 'smtp_code', None)
+    return isinstance(code, int) and code >= 500
+
+
+class DeliveryQueue:
+    """
+    投递重试队列：每份报告只保存一次（zlib压缩），每个收件人一条投递记录
+    attempts 达到 max_attempts 或遇到永久错误的投递标记为 failed，不再重试
+    """
+
+    def __init__(self, db_path, max_attempts=5, retry_delay=300, max_delay=6 * 3600):
+        """
+        db_path: 队列数据库路径
+        max_attempts: 每个收件人的最多发送次数（含第一次）
+        retry_delay: 第一次重试前的等待（秒），之后每次翻倍，最多 max_delay
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        # 多账户模式的工作线程共享同一个实例，用锁串行化访问
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS outbox_messages (
+                id INTEGER PRIMARY KEY,
+                account TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                data BLOB NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS outbox_deliveries (
+                id INTEGER PRIMARY KEY,
+                message_id INTEGER NOT NULL REFERENCES outbox_messages (id),
+                recipient TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL,
+                next_attempt REAL NOT NULL,
+                last_error TEXT
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox_deliveries (status, next_attempt);
+        """)
+        self.conn.commit()
+
+    def backoff(self, attempts):
+        """第attempts次失败后的等待时间（秒）"""
+        return min(self.retry_delay * 2 ** (attempts - 1), self.max_delay)
+
+    def enqueue(self, account, subject, data, failures):
+        """
+        保存一份发送失败的报告
+        failures: [(收件人, 错误信息)]，视为已经尝试过一次
+        """
+        now = time.time()
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT INTO outbox_messages (account, subject, data, created_at) VALUES (?, ?, ?, ?)',
+                (account, subject, zlib.compress(data.encode('utf-8')), now)
+            )
+            self.conn.executemany(
+                """
+                INSERT INTO outbox_deliveries (message_id, recipient, attempts, next_attempt, last_error)
+                VALUES (?, ?, 1, ?, ?)
+                """,
+                [(cursor.lastrowid, recipient, now + self.backoff(1), error) for recipient, error in failures]
+            )
+            self.conn.commit()
+
+    def due(self, account, now=None):
+        """返回到期的投递 [(投递ID, 收件人, 主题, 邮件内容)]，同一份报告只解压一次"""
+        with self.lock:
+            rows = self.conn.execute(
+                """
+                SELECT d.id, d.recipient, d.message_id, m.subject FROM outbox_deliveries d
+                JOIN outbox_messages m ON m.id = d.message_id
+                WHERE m.account = ? AND d.status = 'pending' AND d.next_attempt <= ?
+                ORDER BY d.id
+                """,
+                (account, now or time.time())
+            ).fetchall()
+            data = {}
+            for _, _, message_id, _ in rows:
+                if message_id not in data:
+                    blob = self.conn.execute('SELECT data FROM outbox_messages WHERE id = ?', (message_id,)).fetchone()[0]
+                    data[message_id] = zlib.decompress(blob).decode('utf-8')
+        return [(delivery_id, recipient, subject, data[message_id])
+                for delivery_id, recipient, message_id, subject in rows]
+
+    def mark_sent(self, delivery_id):
+        """删除已送达的投递，报告没有其他投递时一并删除"""
+        with self.lock:
+            self.conn.execute('DELETE FROM outbox_deliveries WHERE id = ?', (delivery_id,))
+            self._delete_orphans()
+            self.conn.commit()
+
+    def mark_failed(self, delivery_id, error, permanent=False):
+        """记录一次失败，返回是否还会重试"""
+        with self.lock:
+            attempts = self.conn.execute(
+                'SELECT attempts FROM outbox_deliveries WHERE id = ?', (delivery_id,)
+            ).fetchone()[0] + 1
+            retry = not permanent and attempts < self.max_attempts
+            self.conn.execute(
+                'UPDATE outbox_deliveries SET attempts = ?, next_attempt = ?, last_error = ?, status = ? WHERE id = ?',
+                (attempts, time.time() + self.backoff(attempts), error, 'pending' if retry else 'failed', delivery_id)
+            )
+            self.conn.commit()
+        return retry
+
+    def pending(self, account=None):
+        """等待重试的投递数"""
+        query = """
+            SELECT COUNT(*) FROM outbox_deliveries d JOIN outbox_messages m ON m.id = d.message_id
+            WHERE d.status = 'pending'
+        """
+        params = ()
+        if account is not None:
+            query += ' AND m.account = ?'
+            params = (account,)
+        with self.lock:
+            return self.conn.execute(query, params).fetchone()[0]
+
+    def _delete_orphans(self):
+        self.conn.execute("""
+            DELETE FROM outbox_messages
+            WHERE id NOT IN (SELECT message_id FROM outbox_deliveries)
+        """)
+
+    def close(self):
+        """关闭数据库"""
+        self.conn.close()
+
+
+class DeliveryEngine:
+    """
+    用一个QQEmailSender发送报告：第一次需要时连接，之后复用同一个连接；
+    服务器断开时由sender重连，临时失败写入重试队列（没有配置队列时直接算作失败）
+    """
+
+    def __init__(self, sender, queue=None):
+        """
+        sender: 未连接的QQEmailSender
+        queue: DeliveryQueue，None 表示不保存失败的投递
+        """
+        self.sender = sender
+        self.queue = queue
+        self.account = sender.email_account
+        self.unreachable = False
+
+    def _deliver(self, recipient, data):
+        """发送给一个收件人，返回错误（成功时为None）；连接失败后本轮其余收件人不再重复连接"""
+        if self.unreachable or (self.sender.smtp is None and not self.sender.connect()):
+            self.unreachable = True
+            return ConnectionError("无法连接到SMTP服务器")
+        try:
+            self.sender.deliver(recipient, data)
+            return None
+        except smtplib.SMTPServerDisconnected as e:
+            # sender已经重连过一次仍然失败
+            self.unreachable = True
+            self.sender.smtp = None
+            return e
+        except (smtplib.SMTPException, OSError) as e:
+            return e
+
+    def send(self, recipients, subject, content, content_type='html'):
+        """
+        把同一份报告发给所有收件人
+        返回 {'sent': [收件人], 'queued': [收件人], 'failed': [(收件人, 错误信息)]}
+        """
+        result = {'sent': [], 'queued': [], 'failed': []}
+        data = self.sender.build_message(subject, content, content_type)
+        retryable = []
+        self.unreachable = False
+        for recipient in recipients:
+            error = self._deliver(recipient, data)
+            if error is None:
+                result['sent'].append(recipient)
+            elif self.queue is None or is_permanent_error(error):
+                result['failed'].append((recipient, str(error)))
+            else:
+                retryable.append((recipient, str(error)))
+
+        if retryable:
+            self.queue.enqueue(self.account, subject, data, retryable)
+            result['queued'] = [recipient for recipient, _ in retryable]
+            metrics.count('deliveries_queued', len(retryable))
+        if result['failed']:
+            metrics.count('deliveries_failed', len(result['failed']))
+
+        logger.info(f"✓ 报告已发送给 {len(result['sent'])}/{len(recipients)} 个收件人")
+        if result['queued']:
+            logger.warning(f"⚠ {len(result['queued'])} 个收件人发送失败，已加入重试队列: {', '.join(result['queued'])}")
+        for recipient, error in result['failed']:
+            logger.error(f"✗ 发送到 {recipient} 失败: {error}")
+        return result
+
+    def retry_pending(self):
+        """重发队列中到期的投递，返回仍在等待重试的投递数"""
+        if self.queue is None:
+            return 0
+        due = self.queue.due(self.account)
+        if not due:
+            return self.queue.pending(self.account)
+
+        logger.info(f"重发队列中的 {len(due)} 个投递...")
+        sent = 0
+        self.unreachable = False
+        for delivery_id, recipient, subject, data in due:
+            error = self._deliver(recipient, data)
+            if error is None:
+                self.queue.mark_sent(delivery_id)
+                sent += 1
+            elif not self.queue.mark_failed(delivery_id, str(error), is_permanent_error(error)):
+                logger.error(f"✗ 放弃发送「{subject}」到 {recipient}: {str(error)}")
+                metrics.count('deliveries_failed')
+        if sent:
+            metrics.count('deliveries_retried', sent)
+
+        remaining = self.queue.pending(self.account)
+        logger.info(f"✓ 重发成功 {sent}/{len(due)} 个投递，队列中还有 {remaining} 个")
+        return remaining
+
+    def close(self):
+        """断开SMTP连接"""
+        if self.sender.smtp is not None:
+            self.sender.disconnect()
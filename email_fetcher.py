@@ -7,34 +7,80 @@ QQ邮箱IMAP客户端
 
 import imaplib
 import email
+import logging
+import re
+import select
+import threading
 from email.header import decode_header
 from datetime import datetime, timezone, timedelta
 
+from email_record import EmailRecord
+from imap_response import build_uid_sets, find_item, parse_fetch_response, response_size
+from html_text import html_to_text
+from metrics import metrics
+from mime_parts import decode_text, decode_transfer, parse_bodystructure, select_text_parts
+
+
+logger = logging.getLogger(__name__)
+
 
 class QQEmailFetcher:
     """QQ邮箱IMAP客户端 - 用于接收邮件"""
 
     IMAP_SERVER = 'imap.qq.com'
     IMAP_PORT = 993
-
-    def __init__(self, email_account, auth_code):
-        """初始化邮箱客户端"""
+    FETCH_BATCH_SIZE = 200
+    # 第一阶段获取的头部字段，Content-* 用于解析部分获取的正文
+    HEADER_FIELDS = 'DATE SUBJECT FROM TO CONTENT-TYPE CONTENT-TRANSFER-ENCODING'
+
+    def __init__(self, email_account, auth_code, batch_size=None, body_limit=None,
+                 selective_fetch=True, state_store=None, message_cache=None, html_budget=None, archive=None):
+        """
+        初始化邮箱客户端
+        batch_size: 每次UID FETCH请求的邮件数
+        body_limit: 只获取正文前N字节（BODY.PEEK[...]<0.N>），None表示完整获取
+        selective_fetch: 根据BODYSTRUCTURE只获取正文段落，不下载附件
+        state_store: SyncStateStore实例，启用按UID的增量同步
+        message_cache: MessageCache实例，缓存命中的邮件不再从服务器下载
+        html_budget: HTML正文转文本时最多提取的字符数，None表示不限制
+        archive: MailArchive实例，获取到的邮件（压缩前的正文）批量写入本地归档
+        """
         self.email_account = email_account
         self.auth_code = auth_code
+        self.batch_size = batch_size or self.FETCH_BATCH_SIZE
+        self.body_limit = body_limit
+        self.selective_fetch = selective_fetch
+        self.state_store = state_store
+        self.pending_sync = {}
+        # 同时获取多个文件夹时（连接池设置），UID只在文件夹内唯一，记录id使用 "文件夹:UID"
+        self.qualify_ids = False
+        self.message_cache = message_cache
+        self.html_budget = html_budget
+        self.archive = archive
+        self._archive_pending = []
         self.imap = None
+        self.selected_folder = None
+        self._cache_pending = []
+        self._cache_lock = threading.Lock()
+        self.stats = {'round_trips': 0, 'bytes': 0}
 
     def connect(self):
         """连接到QQ邮箱IMAP服务器"""
         try:
-            print(f"正在连接到 {self.IMAP_SERVER}...")
-            self.imap = imaplib.IMAP4_SSL(self.IMAP_SERVER, self.IMAP_PORT)
-            self.imap.login(self.email_account, self.auth_code)
-            print("✓ IMAP登录成功")
+            logger.info(f"正在连接到 {self.IMAP_SERVER}...")
+            with metrics.timer('imap_connect'):
+                self.imap = self._open_connection()
+                self.imap.login(self.email_account, self.auth_code)
+            logger.info("✓ IMAP登录成功")
             return True
         except Exception as e:
-            print(f"✗ IMAP连接失败: {str(e)}")
+            logger.error(f"✗ IMAP连接失败: {str(e)}")
             return False
 
+    def _open_connection(self):
+        """建立IMAP连接，测试时可在子类中替换为本地服务器"""
+        return imaplib.IMAP4_SSL(self.IMAP_SERVER, self.IMAP_PORT)
+
     def disconnect(self):
         """断开连接"""
         if self.imap:
@@ -43,6 +89,186 @@ class QQEmailFetcher:
             except Exception:
                 pass
 
+    def reset_stats(self):
+        """重置网络和缓存统计"""
+        self.stats = {'round_trips': 0, 'bytes': 0}
+        if self.message_cache:
+            self.message_cache.reset_stats()
+
+    def _uid_command(self, command, *args):
+        """执行UID命令，并记录往返次数和接收字节数"""
+        with metrics.timer('search' if command == 'SEARCH' else 'fetch'):
+            status, data = self.imap.uid(command, *args)
+        size = response_size(data)
+        self.stats['round_trips'] += 1
+        self.stats['bytes'] += size
+        metrics.count('imap_round_trips')
+        metrics.count('imap_bytes', size)
+        return status, data
+
+    def select_folder(self, folder='INBOX'):
+        """选择文件夹，返回其UIDVALIDITY（服务器未提供时为None）"""
+        # SELECT失败后连接不再处于任何文件夹中，之后的获取需要重新选择
+        self.selected_folder = None
+        status, _ = self.imap.select(self._quote_folder(folder))
+        if status != 'OK':
+            raise imaplib.IMAP4.error(f"无法选择文件夹 {folder}")
+        self.selected_folder = folder
+        _, data = self.imap.response('UIDVALIDITY')
+        if data and data[0]:
+            return int(data[-1])
+        return None
+
+    def _quote_folder(self, folder):
+        """带空格的文件夹名需要加引号"""
+        if ' ' in folder and not folder.startswith('"'):
+            return f'"{folder}"'
+        return folder
+
+    def list_folders(self):
+        """通过LIST获取所有可选择的文件夹名"""
+        status, data = self.imap.list()
+        if status != 'OK':
+            return []
+        folders = []
+        for line in data:
+            if not line:
+                continue
+            if isinstance(line, tuple):
+                line = line[0] + b'"' + line[1] + b'"'
+            mo = re.match(rb'\((?P<flags>[^)]*)\) (?P<delim>"[^"]*"|NIL) (?P<name>.+)$', line)
+            if not mo or b'\\Noselect' in mo.group('flags'):
+                continue
+            folders.append(mo.group('name').strip().strip(b'"').decode('utf-8', errors='ignore'))
+        return folders
+
+    def _incremental_criteria(self, folder, uidvalidity, criteria):
+        """根据同步状态生成搜索条件，返回 (条件, 上次UID)"""
+        if not self.state_store or uidvalidity is None:
+            return criteria, 0
+
+        state = self.state_store.get(self.email_account, folder)
+        if not state:
+            logger.info(f"  {folder} 没有同步记录，执行完整同步")
+            return criteria, 0
+
+        stored_validity, last_uid = state
+        if stored_validity != uidvalidity:
+            logger.warning(f"  {folder} 的UIDVALIDITY已变化 ({stored_validity} -> {uidvalidity})，执行完整同步")
+            return criteria, 0
+
+        logger.info(f"  增量同步: 只获取 UID > {last_uid} 的新邮件")
+        return f'UID {last_uid + 1}:* {criteria}', last_uid
+
+    def commit_sync(self):
+        """在摘要成功发送后保存同步进度"""
+        if self.state_store:
+            for folder, (uidvalidity, last_uid) in self.pending_sync.items():
+                self.state_store.update(self.email_account, folder, uidvalidity, last_uid)
+        self.pending_sync = {}
+
+    def search_uids(self, criteria):
+        """按条件搜索邮件，返回UID列表"""
+        status, data = self._uid_command('SEARCH', None, criteria)
+        if status != 'OK':
+            return None
+        return [int(uid) for uid in data[0].split()] if data and data[0] else []
+
+    def fetch_messages(self, uids, items='RFC822'):
+        """
+        按批次获取邮件，每批一个UID消息集（如 1:200），逐封返回 (uid, 数据项字典)
+        服务器拒绝某一批时抛出异常：跳过这一批会让这些邮件从摘要中消失，增量同步进度也会越过它们
+        """
+        for uid_set in build_uid_sets(uids, self.batch_size):
+            status, data = self._uid_command('FETCH', uid_set, f'(UID {items})')
+            if status != 'OK':
+                metrics.count('imap_failed_batches')
+                raise imaplib.IMAP4.error(f"批量获取失败: {uid_set}")
+            for _, fetched in parse_fetch_response(data):
+                uid = fetched.get('UID')
+                if uid is None:
+                    continue
+                yield int(uid), fetched
+
+    def _fetch_raw_bodies(self, matched):
+        """
+        获取匹配邮件的原始正文，matched为 {uid: {'header': 头部字节, 'structure': BODYSTRUCTURE}}
+        优先按BODYSTRUCTURE只获取正文段落；设置body_limit时每个段落只取前N字节
+        返回 (uid, 原始正文)，原始正文交给extract_body解码，这里只做网络I/O
+        """
+        if not matched:
+            return
+
+        fallback = []
+        selected = {}
+        groups = {}
+        for uid, info in matched.items():
+            parts = parse_bodystructure(info.get('structure')) if self.selective_fetch else []
+            if not parts:
+                fallback.append(uid)
+                continue
+            # 段落编号相同的邮件放在同一批请求中
+            selected[uid] = select_text_parts(parts)
+            sections = tuple(part.section for part in selected[uid])
+            groups.setdefault(sections, []).append(uid)
+
+        for sections, uids in groups.items():
+            if not sections:
+                for uid in uids:
+                    yield uid, ('text', "")
+                continue
+
+            partial = f'<0.{self.body_limit}>' if self.body_limit else ''
+            items = ' '.join(f'BODY.PEEK[{section}]{partial}' for section in sections)
+            for uid, fetched in self.fetch_messages(uids, items):
+                if uid not in selected:
+                    continue
+                data = [(part, fetched.get(f'BODY[{part.section}]') or b'') for part in selected[uid]]
+                yield uid, ('parts', data)
+
+        if not fallback:
+            return
+        if not self.body_limit:
+            for uid, fetched in self.fetch_messages(fallback, 'RFC822'):
+                raw = fetched.get('RFC822')
+                if raw and uid in matched:
+                    yield uid, ('message', raw)
+            return
+
+        items = f'BODY.PEEK[TEXT]<0.{self.body_limit}>'
+        for uid, fetched in self.fetch_messages(fallback, items):
+            if uid not in matched:
+                continue
+            # 用第一阶段的头部（含Content-Type）拼接部分正文，交给MIME解析器
+            text = find_item(fetched, 'BODY[TEXT]') or b''
+            yield uid, ('message', matched[uid]['header'] + text)
+
+    @metrics.timed('body_extraction')
+    def extract_body(self, raw):
+        """把 _fetch_raw_bodies 返回的原始正文解码为文本"""
+        kind, data = raw
+        if kind == 'text':
+            return data
+        if kind == 'message':
+            return self.get_email_body(email.message_from_bytes(data))
+
+        text_parts = []
+        html_parts = []
+        for part, payload in data:
+            text = decode_text(decode_transfer(payload, part.encoding), part.charset)
+            if part.content_type == 'text/plain':
+                text_parts.append(text)
+            else:
+                html_parts.append(text)
+        return self._join_body(text_parts, html_parts)
+
+    def print_stats(self):
+        """输出本次运行的网络统计"""
+        logger.info(f"  网络统计: {self.stats['round_trips']} 次往返, "
+                    f"{self.stats['bytes'] / 1024:.1f} KB")
+        if self.message_cache:
+            self.message_cache.print_stats()
+
     def decode_str(self, s):
         """解码邮件头部信息"""
         if s is None:
@@ -83,54 +309,38 @@ class QQEmailFetcher:
                         continue
 
                     if content_type == 'text/plain':
-                        text_parts.append(payload.decode('utf-8', errors='ignore'))
+                        text_parts.append(decode_text(payload, part.get_content_charset()))
                     elif content_type == 'text/html':
-                        html_parts.append(payload.decode('utf-8', errors='ignore'))
+                        html_parts.append(decode_text(payload, part.get_content_charset()))
                 except Exception:
                     continue
 
-            # 优先使用文本，如果没有文本则使用HTML
-            if text_parts:
-                body = '\n'.join(text_parts)
-            elif html_parts:
-                # 简单的HTML转文本（去除标签）
-                import re
-                html_body = '\n'.join(html_parts)
-                # 移除script和style标签及内容
-                html_body = re.sub(r'<script[^>]*>.*?</script>', '', html_body, flags=re.DOTALL | re.IGNORECASE)
-                html_body = re.sub(r'<style[^>]*>.*?</style>', '', html_body, flags=re.DOTALL | re.IGNORECASE)
-                # 移除HTML标签
-                html_body = re.sub(r'<[^>]+>', ' ', html_body)
-                # 解码HTML实体
-                import html as html_module
-                html_body = html_module.unescape(html_body)
-                # 清理多余空白
-                html_body = re.sub(r'\s+', ' ', html_body)
-                body = html_body.strip()
+            body = self._join_body(text_parts, html_parts)
         else:
             # 非multipart邮件
             try:
                 payload = msg.get_payload(decode=True)
                 if payload:
                     content_type = msg.get_content_type()
-                    decoded = payload.decode('utf-8', errors='ignore')
+                    decoded = decode_text(payload, msg.get_content_charset())
 
                     if content_type == 'text/html':
-                        # HTML转文本
-                        import re
-                        import html as html_module
-                        decoded = re.sub(r'<script[^>]*>.*?</script>', '', decoded, flags=re.DOTALL | re.IGNORECASE)
-                        decoded = re.sub(r'<style[^>]*>.*?</style>', '', decoded, flags=re.DOTALL | re.IGNORECASE)
-                        decoded = re.sub(r'<[^>]+>', ' ', decoded)
-                        decoded = html_module.unescape(decoded)
-                        decoded = re.sub(r'\s+', ' ', decoded)
-
-                    body = decoded.strip()
+                        body = self._join_body([], [decoded])
+                    else:
+                        body = decoded.strip()
             except Exception:
                 pass
 
         return body
 
+    def _join_body(self, text_parts, html_parts):
+        """合并正文段落：优先使用文本，如果没有文本则使用HTML"""
+        if text_parts:
+            return '\n'.join(text_parts)
+        if not html_parts:
+            return ""
+        return html_to_text('\n'.join(html_parts), self.html_budget)
+
     def parse_email_date(self, date_str):
         """解析邮件日期字符串为datetime对象"""
         try:
@@ -139,83 +349,335 @@ class QQEmailFetcher:
         except Exception:
             return None
 
-    def fetch_today_emails(self):
-        """获取今天的所有邮件"""
+    @metrics.timed('parse')
+    def _match_header(self, header, target_date):
+        """
+        解析头部并按UTC+8日期筛选，匹配时返回头部信息字典
+        target_date: 日期，(开始日期, 结束日期) 闭区间，或None（不按日期筛选）
+        """
+        msg = email.message_from_bytes(header)
+        # 解码日期头部，防止出现 encoded string
+        date_str = self.decode_str(msg.get('Date', ''))
+        email_date = self.parse_email_date(date_str)
+
+        # 逐封的调试输出只在DEBUG级别生成，默认级别下不解码主题
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            subject = self.decode_str(msg.get('Subject', ''))
+            logger.debug(f"  调试: 邮件「{subject[:30]}」 原始日期: {date_str}")
+
+        if not email_date:
+            if debug:
+                logger.debug("    解析失败")
+            return None
+
+        # 明确转换为 UTC+8 时区（中国标准时间）
+        utc_plus_8 = timezone(timedelta(hours=8))
+        local_email_date = email_date.astimezone(utc_plus_8)
+        local_date = local_email_date.date()
+
+        # 使用本地时区的日期进行比较
+        if target_date is None:
+            matched = True
+        elif isinstance(target_date, tuple):
+            matched = target_date[0] <= local_date <= target_date[1]
+        else:
+            matched = local_date == target_date
+        if debug:
+            logger.debug(f"    UTC日期: {email_date.date()}, 本地日期 (UTC+8): {local_date}, "
+                         f"目标日期: {target_date}, 匹配: {matched}")
+        if not matched:
+            return None
+        return {
+            'header': header,
+            'msg': msg,
+            'date': date_str,
+            'local_date': local_email_date,
+        }
+
+    def _build_email_info(self, uid, info, body, folder='INBOX'):
+        """组装邮件记录（EmailRecord，支持字典式访问）"""
+        msg = info['msg']
+        return EmailRecord(
+            id=f'{folder}:{uid}' if self.qualify_ids else str(uid),
+            folder=folder,
+            subject=self.decode_str(msg.get('Subject', '')),
+            sender=self.decode_str(msg.get('From', '')),
+            to=self.decode_str(msg.get('To', '')),
+            date=info['date'],
+            parsed_date=info['local_date'].strftime('%Y-%m-%d %H:%M:%S'),
+            body=body,
+        )
+
+    def search_today(self, folder='INBOX'):
+        """选择文件夹并搜索今天的邮件，返回 (目标日期, UID列表, UIDVALIDITY)；搜索失败时UID列表为None"""
+        uidvalidity = self.select_folder(folder)
+
+        # 获取本地时区的今天日期
+        today = datetime.now()
+        today_date = today.date()
+        today_str = today.strftime('%d-%b-%Y')
+        search_criteria = f'SINCE {today_str}'
+
+        logger.info(f"正在搜索 {folder} 中 {today.strftime('%Y-%m-%d')} 的邮件...")
+        search_criteria, last_uid = self._incremental_criteria(folder, uidvalidity, search_criteria)
+        email_uids = self.search_uids(search_criteria)
+        if email_uids is None:
+            return today_date, None, uidvalidity
+
+        # UID n:* 在没有新邮件时也会返回当前最大UID，需要再过滤一次
+        email_uids = [uid for uid in email_uids if uid > last_uid]
+        if uidvalidity is not None:
+            self.pending_sync[folder] = (uidvalidity, max(email_uids, default=last_uid))
+        return today_date, email_uids, uidvalidity
+
+    def search_range(self, folder, start, end):
+        """
+        选择文件夹并搜索 start ~ end（包含两端）的邮件，返回 ((start, end), UID列表, UIDVALIDITY)
+        不使用也不更新增量同步进度；搜索失败时UID列表为None
+        """
+        uidvalidity = self.select_folder(folder)
+        # BEFORE 不包含当天
+        search_criteria = f"SINCE {start.strftime('%d-%b-%Y')} BEFORE {(end + timedelta(days=1)).strftime('%d-%b-%Y')}"
+        logger.info(f"正在搜索 {folder} 中 {start} ~ {end} 的邮件...")
+        return (start, end), self.search_uids(search_criteria), uidvalidity
+
+    def iter_raw_emails(self, folder, uidvalidity, email_uids, target_date):
+        """
+        按批次获取日期匹配的邮件，逐封返回 (uid, 头部信息, 原始正文)，顺序与UID一致
+        每批先查缓存，再获取头部筛选日期，最后只下载匹配邮件的正文
+        """
+        if self.selected_folder != folder:
+            self.select_folder(folder)
+
+        for start in range(0, len(email_uids), self.batch_size):
+            chunk = email_uids[start:start + self.batch_size]
+            results = {}
+
+            # 缓存命中的邮件不再访问服务器
+            cached = {}
+            if self.message_cache and uidvalidity is not None:
+                cached = self.message_cache.get_many(
+                    self.email_account, folder, uidvalidity, chunk, self.body_limit, self.html_budget)
+            for uid, (header, body) in cached.items():
+                info = self._match_header(header, target_date)
+                if info:
+                    results[uid] = (info, ('text', body))
+
+            # 第一阶段：只获取头部字段，按UTC+8日期筛选
+            to_fetch = {}
+            missing = [uid for uid in chunk if uid not in cached]
+            header_items = f'BODY.PEEK[HEADER.FIELDS ({self.HEADER_FIELDS})]'
+            if self.selective_fetch:
+                header_items += ' BODYSTRUCTURE'
+            for uid, fetched in self.fetch_messages(missing, header_items):
+                header = find_item(fetched, 'BODY[HEADER')
+                if not header:
+                    continue
+                info = self._match_header(header, target_date)
+                if info:
+                    info['structure'] = fetched.get('BODYSTRUCTURE')
+                    info['from_server'] = True
+                    to_fetch[uid] = info
+
+            # 第二阶段：只下载匹配邮件的正文
+            for uid, raw in self._fetch_raw_bodies(to_fetch):
+                results[uid] = (to_fetch[uid], raw)
+
+            for uid in sorted(results):
+                info, raw = results[uid]
+                yield uid, info, raw
+
+    def build_email(self, folder, uidvalidity, uid, info, raw):
+        """解码正文并组装邮件信息，新下载的正文写入缓存"""
+        body = self.extract_body(raw)
+        metrics.count('messages_fetched')
+        if info.get('from_server') and self.message_cache and uidvalidity is not None:
+            with self._cache_lock:
+                self._cache_pending.append((folder, uidvalidity, uid, info['header'], body))
+                full = len(self._cache_pending) >= self.batch_size
+            if full:
+                self.flush_cache()
+        email_info = self._build_email_info(uid, info, body, folder)
+        if self.archive is not None:
+            # 之后的正文压缩会修改记录，归档保存副本（共享压缩后的正文字节）
+            with self._cache_lock:
+                self._archive_pending.append(email_info.copy())
+                full = len(self._archive_pending) >= self.batch_size
+            if full:
+                self.flush_cache()
+        return email_info
+
+    def flush_cache(self):
+        """把待写入的正文批量写入缓存，待归档的邮件在一个事务中写入归档"""
+        with self._cache_lock:
+            pending, self._cache_pending = self._cache_pending, []
+            archived, self._archive_pending = self._archive_pending, []
+        if archived:
+            try:
+                self.archive.add_emails(self.email_account, archived)
+            except Exception as e:
+                # 归档只是附带功能，失败不影响本次摘要
+                logger.warning(f"⚠ 写入邮件归档失败: {str(e)}")
+        groups = {}
+        for folder, uidvalidity, uid, header, body in pending:
+            groups.setdefault((folder, uidvalidity), []).append((uid, header, body))
+        for (folder, uidvalidity), entries in groups.items():
+            self.message_cache.put_many(self.email_account, folder, uidvalidity, entries, self.body_limit,
+                                        self.html_budget)
+
+    def fetch_uids(self, folder, uidvalidity, email_uids, target_date):
+        """获取指定UID中日期匹配的邮件，按UID排序返回邮件信息列表"""
+        emails = [self.build_email(folder, uidvalidity, uid, info, raw)
+                  for uid, info, raw in self.iter_raw_emails(folder, uidvalidity, email_uids, target_date)]
+        self.flush_cache()
+        return emails
+
+    def iter_today_raw(self, folder='INBOX'):
+        """
+        流式获取今天的邮件，逐封返回 (文件夹, UIDVALIDITY, uid, 头部信息, 原始正文)
+        搜索或获取失败时清除这个文件夹待保存的同步进度并抛出异常
+        """
+        self.reset_stats()
+        try:
+            today_date, email_uids, uidvalidity = self.search_today(folder)
+            if email_uids is None:
+                raise imaplib.IMAP4.error(f"搜索 {folder} 失败")
+            logger.info(f"服务器返回 {len(email_uids)} 封邮件，正在筛选...")
+            for uid, info, raw in self.iter_raw_emails(folder, uidvalidity, email_uids, today_date):
+                yield folder, uidvalidity, uid, info, raw
+        except Exception:
+            self.pending_sync.pop(folder, None)
+            raise
+
+    def fetch_today_emails(self, folder='INBOX'):
+        """
+        获取今天的所有邮件；配置了state_store时只获取上次运行之后的新邮件
+        连接、搜索或任何一批获取失败时返回None，并且不记录这个文件夹的同步进度
+        """
         if not self.imap:
-            print("请先连接到邮箱服务器")
-            return []
+            logger.error("请先连接到邮箱服务器")
+            return None
 
         try:
-            self.imap.select('INBOX')
+            self.reset_stats()
+            today_date, email_uids, uidvalidity = self.search_today(folder)
+            if email_uids is None:
+                logger.error("搜索失败")
+                return None
 
-            # 获取本地时区的今天日期
-            import time
-            local_timezone = time.timezone
-            today = datetime.now()
-            today_date = today.date()
-            today_str = today.strftime('%d-%b-%Y')
-            search_criteria = f'SINCE {today_str}'
+            logger.info(f"服务器返回 {len(email_uids)} 封邮件，正在筛选...")
+            emails = self.fetch_uids(folder, uidvalidity, email_uids, today_date)
 
-            print(f"正在搜索 {today.strftime('%Y-%m-%d')} 的邮件...")
-            status, messages = self.imap.search(None, search_criteria)
+            logger.info(f"✓ 找到 {len(emails)} 封今天的邮件")
+            self.print_stats()
+            return emails
 
-            if status != 'OK':
-                print("搜索失败")
-                return []
+        except Exception as e:
+            # search_today 已记下最大UID，获取不完整时不能保存，否则没获取到的邮件以后不会再处理
+            self.pending_sync.pop(folder, None)
+            logger.exception(f"✗ 获取邮件时出错: {str(e)}")
+            return None
 
-            email_ids = messages[0].split()
-            print(f"服务器返回 {len(email_ids)} 封邮件，正在筛选...")
+    def fetch_emails(self, start, end, folder='INBOX'):
+        """
+        获取 start ~ end（date，包含两端，按UTC+8日期）的所有邮件，用于周报、月报等多日报告
+        与增量同步无关，总是返回区间内的全部邮件；连接、搜索或任何一批获取失败时返回None，
+        调用方不能把不完整的结果保存为每日摘要
+        """
+        if not self.imap:
+            logger.error("请先连接到邮箱服务器")
+            return None
 
-            emails = []
-            matched_count = 0
+        try:
+            self.reset_stats()
+            date_range, email_uids, uidvalidity = self.search_range(folder, start, end)
+            if email_uids is None:
+                logger.error("搜索失败")
+                return None
 
-            for email_id in email_ids:
-                status, msg_data = self.imap.fetch(email_id, '(RFC822)')
-                if status != 'OK':
-                    continue
+            logger.info(f"服务器返回 {len(email_uids)} 封邮件，正在筛选...")
+            emails = self.fetch_uids(folder, uidvalidity, email_uids, date_range)
 
-                msg = email.message_from_bytes(msg_data[0][1])
-                # 解码日期头部，防止出现 encoded string
-                date_str = self.decode_str(msg.get('Date', ''))
-                email_date = self.parse_email_date(date_str)
-
-                # 调试输出
-                subject = self.decode_str(msg.get('Subject', ''))
-                print(f"  调试: 邮件「{subject[:30]}」")
-                print(f"    原始日期: {date_str}")
-
-                if email_date:
-                    # 明确转换为 UTC+8 时区（中国标准时间）
-                    utc_plus_8 = timezone(timedelta(hours=8))
-                    local_email_date = email_date.astimezone(utc_plus_8)
-                    local_date = local_email_date.date()
-
-                    print(f"    UTC日期: {email_date.date()}")
-                    print(f"    本地日期 (UTC+8): {local_date}")
-                    print(f"    目标日期: {today_date}")
-                    print(f"    匹配: {local_date == today_date}")
-
-                    # 使用本地时区的日期进行比较
-                    if local_date == today_date:
-                        matched_count += 1
-                        email_info = {
-                            'id': email_id.decode(),
-                            'subject': self.decode_str(msg.get('Subject', '')),
-                            'from': self.decode_str(msg.get('From', '')),
-                            'to': self.decode_str(msg.get('To', '')),
-                            'date': date_str,
-                            'parsed_date': local_email_date.strftime('%Y-%m-%d %H:%M:%S'),
-                            'body': self.get_email_body(msg)
-                        }
-                        emails.append(email_info)
-                else:
-                    print(f"    解析失败")
-
-            print(f"✓ 找到 {matched_count} 封今天的邮件")
+            logger.info(f"✓ 找到 {len(emails)} 封 {start} ~ {end} 的邮件")
+            self.print_stats()
             return emails
 
         except Exception as e:
-            print(f"✗ 获取邮件时出错: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return []
+            logger.exception(f"✗ 获取邮件时出错: {str(e)}")
+            return None
+
+    # ---- 守护模式：IDLE / NOOP ----
+
+    def supports_idle(self):
+        """服务器是否支持IDLE（RFC 2177）"""
+        return self.imap is not None and 'IDLE' in self.imap.capabilities
+
+    def idle(self, timeout, interrupt=None):
+        """
+        发送IDLE等待服务器推送，有推送、timeout秒到期或interrupt（socket）可读时发送DONE结束
+        返回是否收到 EXISTS；imaplib（3.14之前）没有IDLE，这里直接收发命令行
+        """
+        tag = self.imap._new_tag()
+        self.imap.send(tag + b' IDLE\r\n')
+        changed = False
+        while True:
+            line = self._read_idle_line()
+            if line.startswith(b'+'):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.error(f"服务器拒绝IDLE: {line.strip()!r}")
+            changed = changed or self._is_exists(line)
+
+        if not changed and not self._has_buffered_data():
+            select.select([self.imap.sock] + ([interrupt] if interrupt is not None else []), [], [], timeout)
+
+        self.imap.send(b'DONE\r\n')
+        while True:
+            line = self._read_idle_line()
+            if line.startswith(tag):
+                break
+            changed = changed or self._is_exists(line)
+        self.stats['round_trips'] += 1
+        if not line[len(tag):].strip().upper().startswith(b'OK'):
+            raise imaplib.IMAP4.error(f"IDLE失败: {line.strip()!r}")
+        return changed
+
+    def _has_buffered_data(self):
+        """
+        imaplib的读缓冲区（或SSL层）中是否已有未读取的数据
+        服务器常把推送和 "+ idling" 放在同一个包里，这些数据select看不到
+        """
+        sock = self.imap.sock
+        timeout = sock.gettimeout()
+        sock.setblocking(False)
+        try:
+            return bool(self.imap.file.peek(1))
+        except OSError:
+            # 非阻塞的SSL socket没有数据时抛出SSLWantReadError
+            return False
+        finally:
+            sock.settimeout(timeout)
+
+    def _read_idle_line(self):
+        line = self.imap.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("IDLE期间连接已关闭")
+        return line
+
+    def _is_exists(self, line):
+        return line.startswith(b'*') and line.rstrip().upper().endswith(b'EXISTS')
+
+    def poll(self):
+        """不支持IDLE时用NOOP轮询，返回服务器是否报告了 EXISTS"""
+        status, _ = self.imap.noop()
+        self.stats['round_trips'] += 1
+        if status != 'OK':
+            raise imaplib.IMAP4.error("NOOP失败")
+        _, data = self.imap.response('EXISTS')
+        return bool(data and data[0])
+
+    def latest_uid(self):
+        """当前文件夹中最大的UID，空文件夹返回0"""
+        uids = self.search_uids('UID *')
+        return max(uids, default=0) if uids else 0
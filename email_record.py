@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件记录
+用 __slots__ 保存邮件的头部字段，正文以zlib压缩的UTF-8字节保存，访问时才解压；
+只需要正文开头时（预览、关键词分类、相似度指纹、缓存键）只解压需要的部分
+
+正文在获取时就解码为文本，不保留原始段落等到访问时再解码：每封邮件的正文都会被路由、预算分配和
+相似度指纹读取，解码省不掉，而压缩后的原始段落比压缩后的文本大好几倍，峰值内存反而更高
+"""
+
+import zlib
+
+
+# 备用报告和关键词摘要使用的正文预览长度
+PREVIEW_CHARS = 150
+# 压缩级别：正文通常只有几KB，1级已经能压到三分之一左右，且比默认级别快得多
+COMPRESS_LEVEL = 1
+
+
+class EmailRecord:
+    """
+    一封邮件：id、文件夹、主题、发件人、收件人、日期和压缩后的正文
+    支持 email_info['subject'] 式的字典访问（'from' 对应 sender 属性），
+    cluster_size、summary_key 等附加字段保存在 extra 中
+    """
+
+    __slots__ = ('id', 'folder', 'subject', 'sender', 'to', 'date', 'parsed_date',
+                 '_raw', '_chars', '_preview', 'extra')
+
+    # 字典键 -> 属性名
+    FIELDS = {'id': 'id', 'folder': 'folder', 'subject': 'subject', 'from': 'sender', 'to': 'to',
+              'date': 'date', 'parsed_date': 'parsed_date'}
+
+    def __init__(self, id='', folder='INBOX', subject='', sender='', to='', date='', parsed_date='', body=''):
+        self.id = id
+        self.folder = folder
+        self.subject = subject
+        self.sender = sender
+        self.to = to
+        self.date = date
+        self.parsed_date = parsed_date
+        self.extra = None
+        self.body = body
+
+    # ---- 正文 ----
+
+    @property
+    def body(self):
+        """完整正文（每次访问都解压，不常驻内存）"""
+        if not self._raw:
+            return ''
+        return zlib.decompress(self._raw).decode('utf-8')
+
+    @body.setter
+    def body(self, text):
+        text = text or ''
+        self._raw = zlib.compress(text.encode('utf-8'), COMPRESS_LEVEL) if text else b''
+        self._chars = len(text)
+        self._preview = None
+
+    @property
+    def body_length(self):
+        """正文字符数，不需要解压"""
+        return self._chars
+
+    def body_prefix(self, chars):
+        """正文前chars个字符，只解压需要的部分"""
+        if chars >= self._chars:
+            return self.body
+        # UTF-8每个字符最多4字节，末尾被截断的半个字符在切片之外
+        data = zlib.decompressobj().decompress(self._raw, chars * 4)
+        return data.decode('utf-8', errors='ignore')[:chars]
+
+    @property
+    def preview(self):
+        """正文预览（缓存）"""
+        if self._preview is None:
+            self._preview = self.body_prefix(PREVIEW_CHARS)
+        return self._preview
+
+    def copy(self, **changes):
+        """复制记录；压缩后的正文是不可变的字节，直接共享"""
+        record = EmailRecord.__new__(EmailRecord)
+        for name in self.__slots__:
+            setattr(record, name, getattr(self, name))
+        record.extra = dict(self.extra) if self.extra else None
+        for key, value in changes.items():
+            record[key] = value
+        return record
+
+    # ---- 字典式访问 ----
+
+    def __getitem__(self, key):
+        name = self.FIELDS.get(key)
+        if name is not None:
+            return getattr(self, name)
+        if key == 'body':
+            return self.body
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        name = self.FIELDS.get(key)
+        if name is not None:
+            setattr(self, name, value)
+        elif key == 'body':
+            self.body = value
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.FIELDS or key == 'body' or bool(self.extra and key in self.extra)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def update(self, values=(), **kwargs):
+        for key, value in dict(values, **kwargs).items():
+            self[key] = value
+
+    def keys(self):
+        return list(self.FIELDS) + ['body'] + list(self.extra or ())
+
+    def to_dict(self):
+        """转换为普通字典"""
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f'EmailRecord(id={self.id!r}, folder={self.folder!r}, subject={self.subject!r})'
+
+
+def body_prefix(email_info, chars):
+    """EmailRecord或邮件字典的正文前chars个字符"""
+    if isinstance(email_info, EmailRecord):
+        return email_info.body_prefix(chars)
+    return (email_info.get('body') or '')[:chars]
+
+
+def body_preview(email_info):
+    """EmailRecord或邮件字典的正文预览"""
+    if isinstance(email_info, EmailRecord):
+        return email_info.preview
+    return (email_info.get('body') or '')[:PREVIEW_CHARS]
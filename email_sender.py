@@ -5,12 +5,19 @@ QQ邮箱SMTP客户端
 用于发送邮件
 """
 
+import logging
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.header import Header
 from email.utils import formatdate
 
+from metrics import metrics
+from report_renderer import report_text
+
+
+logger = logging.getLogger(__name__)
+
 
 class QQEmailSender:
     """QQ邮箱SMTP客户端 - 用于发送邮件"""
@@ -27,15 +34,21 @@ class QQEmailSender:
     def connect(self):
         """连接到QQ SMTP服务器"""
         try:
-            print(f"正在连接到 {self.SMTP_SERVER}...")
-            self.smtp = smtplib.SMTP_SSL(self.SMTP_SERVER, self.SMTP_PORT)
-            self.smtp.login(self.email_account, self.auth_code)
-            print("✓ SMTP登录成功")
+            logger.info(f"正在连接到 {self.SMTP_SERVER}...")
+            with metrics.timer('smtp_connect'):
+                self.smtp = self._open_connection()
+                self.smtp.login(self.email_account, self.auth_code)
+            logger.info("✓ SMTP登录成功")
             return True
         except Exception as e:
-            print(f"✗ SMTP连接失败: {str(e)}")
+            logger.error(f"✗ SMTP连接失败: {str(e)}")
+            self.smtp = None
             return False
 
+    def _open_connection(self):
+        """建立SMTP连接（基准测试中替换为本地明文连接）"""
+        return smtplib.SMTP_SSL(self.SMTP_SERVER, self.SMTP_PORT)
+
     def disconnect(self):
         """断开连接"""
         if self.smtp:
@@ -43,26 +56,55 @@ class QQEmailSender:
                 self.smtp.quit()
             except Exception:
                 pass
+            self.smtp = None
+
+    def build_message(self, subject, content, content_type='html'):
+        """
+        构建并序列化不含收件人的邮件；发给多个收件人时只构建一次，发送时再加上To头部
+        HTML报告生成 multipart/alternative，先放纯文本版本，不显示HTML的客户端读取纯文本
+        """
+        if content_type == 'html':
+            msg = MIMEMultipart('alternative')
+            msg.attach(MIMEText(report_text(content), 'plain', 'utf-8'))
+        else:
+            msg = MIMEMultipart()
+        msg['From'] = self.email_account
+        msg['Subject'] = Header(subject, 'utf-8')
+        msg['Date'] = formatdate(localtime=True)
+        msg.attach(MIMEText(content, content_type, 'utf-8'))
+        return msg.as_string()
+
+    def deliver(self, to_email, data):
+        """
+        通过当前连接发送build_message生成的邮件，服务器已断开连接时重连一次
+        失败时抛出smtplib的异常，由调用方决定是否重试
+        """
+        data = f'To: {to_email}\n{data}'
+        for attempt in range(2):
+            try:
+                with metrics.timer('send'):
+                    self.smtp.sendmail(self.email_account, to_email, data)
+                break
+            except smtplib.SMTPServerDisconnected:
+                # QQ邮箱会断开空闲连接，重连后重发
+                if attempt or not self.connect():
+                    raise
+        metrics.count('reports_sent')
+        metrics.count('smtp_bytes', len(data))
 
     def send_email(self, to_email, subject, content, content_type='html'):
         """发送邮件"""
         if not self.smtp:
-            print("请先连接到邮箱服务器")
+            logger.error("请先连接到邮箱服务器")
             return False
 
         try:
-            msg = MIMEMultipart()
-            msg['From'] = self.email_account
-            msg['To'] = to_email
-            msg['Subject'] = Header(subject, 'utf-8')
-            msg['Date'] = formatdate(localtime=True)
-            msg.attach(MIMEText(content, content_type, 'utf-8'))
-
-            print(f"正在发送邮件到 {to_email}...")
-            self.smtp.sendmail(self.email_account, to_email, msg.as_string())
-            print("✓ 邮件发送成功")
+            data = self.build_message(subject, content, content_type)
+            logger.info(f"正在发送邮件到 {to_email}...")
+            self.deliver(to_email, data)
+            logger.info("✓ 邮件发送成功")
             return True
 
         except Exception as e:
-            print(f"✗ 发送失败: {str(e)}")
+            logger.error(f"✗ 发送失败: {str(e)}")
             return False
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTML转文本
+单遍流式提取器：丢弃script/style和隐藏内容，保留链接文字，达到字符预算后提前结束
+
+从前往后只扫描一次：注释和需要整体跳过的元素（script/style、head等）用一个以 < 开头的正则定位，
+隐藏属性（hidden、display:none）的关键字用 str.find 定位，两者之间的可见片段用正则整体去标签。
+每次只在当前窗口内查找，设置预算时提前结束前不会扫描整封邮件。标签模式遇到 < 即停止，
+残缺标记不会导致反复回溯到文末。
+"""
+
+import re
+from html import unescape
+
+
+# 原始文本元素：内容不是HTML，直接跳到结束标签
+RAW_TEXT_TAGS = ('script', 'style')
+
+# 整个元素都不需要的标签
+SKIP_TAGS = ('head', 'title', 'noscript', 'template', 'svg', 'object')
+
+# 没有结束标签的元素
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+
+# 可见片段每次处理的字符数，设置了预算时用于提前结束
+CHUNK_SIZE = 8 * 1024
+
+# 注释和需要整体跳过的元素；先用首字母排除大多数普通标签（<a、<td、<div等），再不区分大小写比较标签名
+_SPECIAL_OPEN_RE = re.compile(
+    r'<(?=[!' + ''.join(sorted({tag[0] + tag[0].upper() for tag in RAW_TEXT_TAGS + SKIP_TAGS})) + r'])'
+    r'(?:!--|(?i:' + '|'.join(RAW_TEXT_TAGS + SKIP_TAGS) + r')\b)')
+# 隐藏属性的关键字：只查找全小写和全大写的写法，不为大小写混写复制整封邮件的小写副本
+_HIDDEN_LITERALS = ('hidden', 'display', 'visibility', 'HIDDEN', 'DISPLAY', 'VISIBILITY')
+# 窗口之间的重叠，保证跨窗口的标记不会被漏掉
+_OVERLAP = 16
+_ELEMENT_OPEN_RE = re.compile(r'<(' + '|'.join(RAW_TEXT_TAGS + SKIP_TAGS) + r')\b[^<>]*>', re.IGNORECASE)
+# 关键字命中后，再确认它确实是所在开始标签的隐藏属性
+_OPEN_TAG_RE = re.compile(r'<([a-zA-Z][a-zA-Z0-9:-]*)([^<>]*)>')
+_HIDDEN_ATTR_RE = re.compile(
+    r'(?:^|\s)hidden(?:\s|=|/|$)|display\s*:\s*none|visibility\s*:\s*hidden', re.IGNORECASE)
+# 等价于 <[^<>]+>：re对取反字符集逐字符匹配较慢，写成字符范围快约一半
+_TAG_RE = re.compile(r'<[\x00-;=?-\U0010ffff]+>')
+_RAW_END_RE = {tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in RAW_TEXT_TAGS}
+_ELEMENT_RE_CACHE = {}
+
+
+def _element_end(html, pos, tag):
+    """跳过元素内容，返回匹配的结束标签之后的位置（考虑同名嵌套）"""
+    pattern = _ELEMENT_RE_CACHE.get(tag)
+    if pattern is None:
+        pattern = re.compile(rf'<(/?){re.escape(tag)}\b[^<>]*>', re.IGNORECASE)
+        _ELEMENT_RE_CACHE[tag] = pattern
+    depth = 1
+    while True:
+        match = pattern.search(html, pos)
+        if match is None:
+            return len(html)
+        pos = match.end()
+        if match.group(1):
+            depth -= 1
+            if depth == 0:
+                return pos
+        elif not match.group(0).endswith('/>'):
+            depth += 1
+
+
+class _SpecialFinder:
+    """查找特殊标记的候选位置，每种标记只保留下一次出现的位置和已经查找过的范围"""
+
+    KEYS = ('<',) + _HIDDEN_LITERALS
+
+    def __init__(self, html):
+        self.html = html
+        # 下一次出现的位置；None表示在 scanned 之前没有
+        self.next = dict.fromkeys(self.KEYS, -1)
+        self.scanned = dict.fromkeys(self.KEYS, 0)
+
+    def _find(self, key, start, end):
+        if key == '<':
+            match = _SPECIAL_OPEN_RE.search(self.html, start, end)
+            return match.start() if match else -1
+        return self.html.find(key, start, end)
+
+    def _next(self, key, start, end):
+        """key在 [start, end) 内第一次出现的位置，没有时返回None"""
+        position = self.next[key]
+        if position is None:
+            if self.scanned[key] >= end:
+                return None
+            # 接着上次查找过的范围继续，和上次的末尾稍有重叠
+            start = max(start, self.scanned[key] - _OVERLAP)
+        elif position >= start:
+            return position if position < end else None
+        return self._store(key, self._find(key, start, end), end)
+
+    def _store(self, key, position, end):
+        if position == -1:
+            self.next[key] = None
+            self.scanned[key] = end
+            return None
+        self.next[key] = position
+        return position
+
+    def search(self, start, end):
+        """返回 [start, end) 内第一个确认的特殊标记 (类型, 起点, 终点, 标签名)，没有时返回None"""
+        while True:
+            best = None
+            best_key = None
+            for key in self.KEYS:
+                position = self._next(key, start, end if best is None else best)
+                if position is not None and (best is None or position < best):
+                    best, best_key = position, key
+            if best is None:
+                return None
+
+            found = self._confirm(best_key, best, start)
+            if found:
+                return found
+            # 误报（如 <header、display:block），从下一个字符继续
+            self._store(best_key, self._find(best_key, best + 1, end), end)
+
+    def _confirm(self, key, position, start):
+        html = self.html
+        if key == '<':
+            if html.startswith('<!--', position):
+                return 'comment', position, position + 4, None
+            match = _ELEMENT_OPEN_RE.match(html, position)
+            if not match:
+                return None
+            tag = match.group(1).lower()
+            kind = 'raw' if tag in RAW_TEXT_TAGS else 'skip'
+            return kind, position, match.end(), tag
+
+        # 隐藏属性必须位于开始标签内部
+        tag_start = html.rfind('<', start, position)
+        if tag_start == -1:
+            return None
+        match = _OPEN_TAG_RE.match(html, tag_start)
+        if not match or match.end() <= position or not _HIDDEN_ATTR_RE.search(match.group(2)):
+            return None
+        tag = match.group(1).lower()
+        if tag in VOID_TAGS or match.group(0).endswith('/>'):
+            return 'void', tag_start, match.end(), tag
+        return 'hidden', tag_start, match.end(), tag
+
+
+def _normalize(parts):
+    """拼接文字、解码实体并压缩空白"""
+    # 营销邮件里最多的实体是 &nbsp;，先用 str.replace 替换，unescape 只需处理剩下的实体
+    text = ''.join(parts).replace('&nbsp;', '\xa0')
+    if '&' in text:
+        text = unescape(text)
+    return ' '.join(text.split())
+
+
+class _Collector:
+    """收集可见文字并跟踪字符预算"""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.parts = []
+        self.estimate = 0
+        self.checkpoint = max_chars
+
+    def add(self, segment):
+        """加入一段HTML，返回是否已达到预算"""
+        if self.max_chars is None:
+            self.parts.append(_TAG_RE.sub(' ', segment))
+            return False
+
+        start = 0
+        while start < len(segment):
+            end = start + CHUNK_SIZE
+            if end < len(segment):
+                # 不在标签中间切开
+                lt = segment.rfind('<', start, end)
+                if lt > segment.rfind('>', start, end) and lt > start:
+                    end = lt
+            text = _TAG_RE.sub(' ', segment[start:end])
+            start = end
+            self.parts.append(text)
+
+            # 按压缩空白后的长度估算，估算值达到检查点时再精确计算
+            self.estimate += len(text) - text.count(' ')
+            if self.estimate >= self.checkpoint:
+                exact = len(_normalize(self.parts))
+                if exact >= self.max_chars:
+                    return True
+                self.estimate = exact
+                self.checkpoint = exact + max(self.max_chars - exact, 256)
+        return False
+
+    def text(self):
+        text = _normalize(self.parts)
+        if self.max_chars is not None:
+            text = text[:self.max_chars].rstrip()
+        return text
+
+
+def html_to_text(html, max_chars=None):
+    """把HTML转换为单行纯文本（连续空白压缩为一个空格），max_chars为字符预算"""
+    if not html:
+        return ""
+
+    collector = _Collector(max_chars)
+    finder = _SpecialFinder(html)
+    length = len(html)
+    # 设置预算时按窗口查找特殊标记，避免在提前结束前扫描整封邮件
+    window = length if max_chars is None else CHUNK_SIZE * 4
+    pos = 0
+    while pos < length:
+        endpos = min(length, pos + window)
+        found = finder.search(pos, endpos)
+        if found is None:
+            if endpos >= length:
+                collector.add(html[pos:])
+                break
+            # 窗口内没有特殊标记：在最后一个 < 处切开，先处理前面的可见片段
+            cut = html.rfind('<', pos + 1, endpos)
+            if cut == -1:
+                cut = endpos
+            if collector.add(html[pos:cut]):
+                break
+            pos = cut
+            continue
+
+        kind, start, end, tag = found
+        if collector.add(html[pos:start]):
+            break
+        collector.parts.append(' ')
+        pos = end
+
+        if kind == 'raw':
+            close = _RAW_END_RE[tag].search(html, pos)
+            pos = length if close is None else close.end()
+        elif kind in ('skip', 'hidden'):
+            pos = _element_end(html, pos, tag)
+        elif kind == 'comment':
+            close = html.find('-->', pos)
+            pos = length if close == -1 else close + 3
+
+    return collector.text()
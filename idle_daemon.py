@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IMAP IDLE 守护模式
+保持一个IMAP连接，用IDLE（服务器不支持时用NOOP轮询）等待新邮件，新邮件到达时立即获取并生成逐封摘要；
+到发送时间只在本地组装报告，发送时的耗时与当天的邮件量无关
+"""
+
+import imaplib
+import logging
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+from email_record import body_prefix
+from prompt_budget import truncate_to_tokens
+
+
+logger = logging.getLogger(__name__)
+
+
+def next_send_time(send_time, now=None):
+    """下一个发送时间点：今天的send_time（'HH:MM'）已经过去时取明天"""
+    now = now or datetime.now()
+    hour, minute = (int(part) for part in send_time.split(':'))
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += timedelta(days=1)
+    return target
+
+
+class DigestDaemon:
+    """
+    滚动摘要：启动时处理当天已有的邮件，之后每封新邮件到达时预先摘要，
+    到发送时间组装报告并发送，然后开始下一期
+    """
+
+    # RFC 2177：服务器可能在30分钟无活动后断开，每次IDLE不超过29分钟
+    IDLE_TIMEOUT = 25 * 60
+    POLL_INTERVAL = 60
+    # 连接中断后的重连等待（秒），每次失败翻倍
+    RECONNECT_DELAY = 5
+    MAX_RECONNECT_DELAY = 300
+    # 发送失败后的重试间隔（秒）
+    SEND_RETRY_DELAY = 300
+
+    def __init__(self, fetcher, summarizer, send_report, send_time='23:50', folder='INBOX',
+                 compactor=None, clusterer=None, idle_timeout=None, poll_interval=None, retry_deliveries=None):
+        """
+        fetcher: 未连接的QQEmailFetcher
+        summarizer: GeminiSummarizer
+        send_report: send_report(报告HTML) -> 是否发送成功
+        send_time: 每天发送报告的时间 'HH:MM'
+        compactor / clusterer: 与批处理模式相同的正文压缩和相似邮件合并
+        idle_timeout: 单次IDLE的最长时间（秒）
+        poll_interval: 服务器不支持IDLE时的NOOP轮询间隔（秒）
+        retry_deliveries: retry_deliveries() -> 仍在等待重试的投递数；启动时和每次发送后
+            每隔 SEND_RETRY_DELAY 秒调用一次，直到重试队列清空
+        """
+        self.fetcher = fetcher
+        self.summarizer = summarizer
+        self.send_report = send_report
+        self.send_time = send_time
+        self.folder = folder
+        self.compactor = compactor
+        self.clusterer = clusterer
+        self.idle_timeout = idle_timeout or self.IDLE_TIMEOUT
+        self.poll_interval = poll_interval or self.POLL_INTERVAL
+        self.retry_deliveries = retry_deliveries
+        # 下次重发投递的时间（time.monotonic），None 表示队列中没有等待的投递
+        self.retry_at = time.monotonic() if retry_deliveries is not None else None
+        self.next_send = next_send_time(send_time)
+        self.connected = False
+        self.uidvalidity = None
+        self.last_uid = 0
+        self._stop = threading.Event()
+        self._woken = threading.Event()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self.reset_period()
+
+    def reset_period(self):
+        """开始新的一期：清空已摘要的邮件"""
+        # [(只保留正文预览的邮件记录, 摘要字典)]；启用clusterer时与 clusterer.clusters 一一对应
+        self.items = []
+        self.received = 0
+        if self.clusterer is not None:
+            self.clusterer.reset()
+        if self.compactor is not None:
+            self.compactor.reset_stats()
+
+    def stop(self):
+        """请求停止（可以在信号处理函数或其他线程中调用）"""
+        self._stop.set()
+        self.wake()
+
+    def wake(self):
+        """立即结束正在进行的IDLE或轮询等待，例如修改了next_send之后"""
+        self._woken.set()
+        try:
+            self._wakeup_w.send(b'x')
+        except OSError:
+            pass
+
+    def _drain_wakeup(self):
+        try:
+            while self._wakeup_r.recv(64):
+                pass
+        except OSError:
+            pass
+
+    # ---- 获取与预摘要 ----
+
+    def _open_session(self):
+        """连接并选择文件夹；第一次连接时处理当天已有的邮件，重连时补获取断开期间的新邮件"""
+        if not self.fetcher.connect():
+            raise ConnectionError("无法连接到邮箱服务器")
+        self.connected = True
+        uidvalidity = self.fetcher.select_folder(self.folder)
+
+        if self.uidvalidity is None:
+            # 先记下当前最大UID，之后到达的邮件由IDLE循环获取
+            baseline = self.fetcher.latest_uid()
+            today_date, uids, uidvalidity = self.fetcher.search_today(self.folder)
+            if uids is None:
+                raise imaplib.IMAP4.error(f"搜索 {self.folder} 失败")
+            self.uidvalidity = uidvalidity
+            try:
+                if uids:
+                    logger.info(f"处理今天已有的 {len(uids)} 封邮件...")
+                    self._ingest(uids, today_date)
+            except Exception:
+                # 重连后重新处理今天已有的邮件；search_today 记下的最大UID不能保存
+                self.uidvalidity = None
+                self.fetcher.pending_sync.pop(self.folder, None)
+                raise
+            self.last_uid = max([baseline] + uids)
+        elif uidvalidity != self.uidvalidity:
+            # 旧UID已经失效，从当前位置继续；本期已摘要的邮件保留
+            logger.warning(f"⚠ {self.folder} 的UIDVALIDITY已变化 ({self.uidvalidity} -> {uidvalidity})，从最新邮件继续")
+            self.uidvalidity = uidvalidity
+            self.last_uid = self.fetcher.latest_uid()
+        else:
+            self.ingest_new()
+        self._record_sync()
+
+    def ingest_new(self):
+        """获取UID大于last_uid的新邮件并预先摘要，返回新邮件数"""
+        uids = self.fetcher.search_uids(f'UID {self.last_uid + 1}:*')
+        # UID n:* 在没有新邮件时也会返回当前最大UID
+        uids = [uid for uid in uids or [] if uid > self.last_uid]
+        if not uids:
+            return 0
+        count = self._ingest(uids, None)
+        self.last_uid = max(uids)
+        self._record_sync()
+        return count
+
+    def _record_sync(self):
+        """记录同步进度，报告发送成功后由commit_sync保存"""
+        if self.uidvalidity is not None:
+            self.fetcher.pending_sync[self.folder] = (self.uidvalidity, self.last_uid)
+
+    def _ingest(self, uids, target_date):
+        """获取、压缩、合并相似邮件并生成逐封摘要，只保留正文预览和摘要"""
+        emails = self.fetcher.fetch_uids(self.folder, self.uidvalidity, uids, target_date)
+        fresh = []
+        for email_info in emails:
+            if self.compactor is not None:
+                email_info = self.compactor.compact(email_info)
+            if self.clusterer is not None:
+                # 与已有某组相似的邮件只计入该组的数量和时间范围，不再摘要
+                tokens = self.summarizer.DEFAULT_BODY_TOKENS
+                leader = email_info.copy(body=truncate_to_tokens(body_prefix(email_info, tokens * 4), tokens))
+                _, is_new = self.clusterer.add(leader)
+                if not is_new:
+                    continue
+            fresh.append(email_info)
+
+        if fresh:
+            blocks = [self.summarizer.build_email_block(i + 1, email_info) for i, email_info in enumerate(fresh)]
+            for email_info, summary in self.summarizer.summarize_items(blocks, fresh):
+                self.items.append((email_info.copy(body=email_info.preview), summary))
+        self.received += len(emails)
+        logger.info(f"✓ 新邮件 {len(emails)} 封，本期累计 {self.received} 封（{len(self.items)} 条摘要）")
+        return len(emails)
+
+    # ---- 发送 ----
+
+    def build_report(self):
+        """用已生成的逐封摘要在本地组装报告"""
+        items = []
+        for index, (email_info, summary) in enumerate(self.items):
+            cluster = self.clusterer.clusters[index] if self.clusterer is not None else None
+            if cluster is not None and cluster.count > 1:
+                email_info.update(cluster_size=cluster.count, cluster_first=cluster.first, cluster_last=cluster.last)
+            items.append((email_info, summary))
+        return self.summarizer.assemble_report(items)
+
+    def send_digest(self):
+        """发送本期报告，成功后保存同步进度并开始下一期"""
+        if self.connected:
+            # 发送前补获取最后一次IDLE之后到达的邮件
+            self.ingest_new()
+        start = time.perf_counter()
+        report = self.build_report()
+        logger.info(f"报告组装完成: {self.received} 封邮件, 耗时 {time.perf_counter() - start:.3f} 秒")
+        sent = self.send_report(report)
+        if self.retry_deliveries is not None:
+            # 部分收件人可能进入了重试队列
+            self.retry_at = time.monotonic() + self.SEND_RETRY_DELAY
+        if not sent:
+            logger.error(f"✗ 报告发送失败，{self.SEND_RETRY_DELAY} 秒后重试")
+            self.next_send = datetime.now() + timedelta(seconds=self.SEND_RETRY_DELAY)
+            return False
+
+        self.fetcher.commit_sync()
+        self.reset_period()
+        self.next_send = next_send_time(self.send_time)
+        logger.info(f"✓ 报告已发送，下次发送时间: {self.next_send.strftime('%Y-%m-%d %H:%M')}")
+        return True
+
+    def retry_due(self):
+        """到时间时重发重试队列中的投递"""
+        if self.retry_at is None or time.monotonic() < self.retry_at:
+            return
+        remaining = self.retry_deliveries()
+        self.retry_at = time.monotonic() + self.SEND_RETRY_DELAY if remaining else None
+
+    # ---- 主循环 ----
+
+    def wait_for_mail(self, timeout):
+        """IDLE（或NOOP轮询）最多timeout秒，返回服务器是否报告了新邮件"""
+        if self.fetcher.supports_idle():
+            changed = self.fetcher.idle(min(timeout, self.idle_timeout), self._wakeup_r)
+        else:
+            self._woken.wait(min(timeout, self.poll_interval))
+            changed = not self._stop.is_set() and self.fetcher.poll()
+        self._woken.clear()
+        self._drain_wakeup()
+        return changed
+
+    def _disconnect(self):
+        if self.connected:
+            self.fetcher.disconnect()
+        self.connected = False
+
+    def run(self):
+        """运行到stop()被调用；连接中断时按指数退避重连，发送时间不受影响"""
+        logger.info(f"守护模式: 监听 {self.folder}，每天 {self.send_time} 发送报告"
+                    f"（下次 {self.next_send.strftime('%Y-%m-%d %H:%M')}）")
+        delay = self.RECONNECT_DELAY
+        while not self._stop.is_set():
+            try:
+                if datetime.now() >= self.next_send:
+                    self.send_digest()
+                self.retry_due()
+                if not self.connected:
+                    self._open_session()
+                    mode = 'IDLE' if self.fetcher.supports_idle() else f'NOOP轮询（每 {self.poll_interval} 秒）'
+                    logger.info(f"✓ 已连接，等待新邮件: {mode}")
+                    delay = self.RECONNECT_DELAY
+                timeout = max(1.0, (self.next_send - datetime.now()).total_seconds())
+                if self.retry_at is not None:
+                    timeout = min(timeout, max(1.0, self.retry_at - time.monotonic()))
+                if self.wait_for_mail(timeout) and not self._stop.is_set():
+                    self.ingest_new()
+            except Exception as e:
+                logger.warning(f"⚠ 守护循环出错: {str(e)}，{delay} 秒后重连")
+                self._disconnect()
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+        self._disconnect()
+        if self.received:
+            logger.warning(f"⚠ 守护模式已停止，本期 {self.received} 封邮件尚未发送（下次运行时会重新处理）")
+        else:
+            logger.info("守护模式已停止")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IMAP连接池
+使用多个已登录的连接并行获取邮件，支持同时扫描多个文件夹
+"""
+
+import logging
+import math
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+from email_fetcher import QQEmailFetcher
+
+
+logger = logging.getLogger(__name__)
+
+
+class IMAPConnectionPool:
+    """并行邮件获取：把各文件夹的UID区间分给N个连接，结果按 (文件夹顺序, UID) 排序"""
+
+    # QQ邮箱的发件箱、草稿箱等不参与摘要
+    EXCLUDED_FOLDERS = ('Sent Messages', 'Drafts', 'Deleted Messages', 'Junk')
+
+    def __init__(self, email_account, auth_code, size=4, fetcher_class=QQEmailFetcher, **fetcher_kwargs):
+        """
+        初始化连接池
+        size: 连接数（工作线程数）
+        fetcher_class: 每个连接使用的获取器类，其余参数原样传给它
+        """
+        self.email_account = email_account
+        self.auth_code = auth_code
+        self.size = max(1, int(size))
+        self.fetcher_class = fetcher_class
+        self.fetcher_kwargs = fetcher_kwargs
+        self.fetchers = []
+        self._idle = queue.Queue()
+        # {文件夹: (UIDVALIDITY, 最大UID)}：获取完整时从各连接收集，报告发送后由commit_sync保存
+        self.pending_sync = {}
+
+    def connect(self):
+        """并行建立所有连接，至少一个成功即可工作"""
+        fetchers = [self.fetcher_class(self.email_account, self.auth_code, **self.fetcher_kwargs)
+                    for _ in range(self.size)]
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            results = list(executor.map(lambda fetcher: fetcher.connect(), fetchers))
+
+        self.fetchers = [fetcher for fetcher, ok in zip(fetchers, results) if ok]
+        for fetcher in self.fetchers:
+            self._idle.put(fetcher)
+        if len(self.fetchers) < self.size:
+            logger.warning(f"  连接池: {len(self.fetchers)}/{self.size} 个连接可用")
+        return bool(self.fetchers)
+
+    def disconnect(self):
+        """断开所有连接"""
+        for fetcher in self.fetchers:
+            fetcher.disconnect()
+        self.fetchers = []
+        self._idle = queue.Queue()
+
+    def _run(self, func, *args):
+        """借用一个空闲连接执行任务，完成后归还"""
+        fetcher = self._idle.get()
+        try:
+            return func(fetcher, *args)
+        finally:
+            self._idle.put(fetcher)
+
+    def list_folders(self, exclude=None):
+        """列出要扫描的文件夹（INBOX排在最前）"""
+        exclude = self.EXCLUDED_FOLDERS if exclude is None else exclude
+        folders = self._run(lambda fetcher: fetcher.list_folders())
+        folders = [folder for folder in folders if folder not in exclude]
+        folders.sort(key=lambda folder: (folder.upper() != 'INBOX', folder))
+        return folders
+
+    def fetch_today_emails(self, folders=None):
+        """
+        并行获取今天的邮件，folders为None时只扫描INBOX，'all'表示LIST返回的所有文件夹
+        任何文件夹搜索或获取失败时返回None，并且不记录同步进度，下次运行重新获取
+        """
+        if not self.fetchers:
+            logger.error("请先连接到邮箱服务器")
+            return None
+        emails, failures = self._fetch(folders, lambda fetcher, folder: fetcher.search_today(folder), '今天的邮件')
+        # search_today 在获取前就记下了各文件夹的最大UID，全部获取成功后才能保存
+        for fetcher in self.fetchers:
+            if not failures:
+                self.pending_sync.update(fetcher.pending_sync)
+            fetcher.pending_sync = {}
+        return None if failures else emails
+
+    def fetch_emails(self, start, end, folders=None):
+        """
+        并行获取 start ~ end（包含两端）的邮件，不使用增量同步进度
+        任何文件夹搜索或获取失败时返回None，避免把不完整的结果当作这几天的全部邮件
+        """
+        if not self.fetchers:
+            logger.error("请先连接到邮箱服务器")
+            return None
+        emails, failures = self._fetch(folders, lambda fetcher, folder: fetcher.search_range(folder, start, end),
+                                       f"{start} ~ {end} 的邮件")
+        return None if failures else emails
+
+    def _fetch(self, folders, search, description):
+        """
+        按 search(fetcher, 文件夹) -> (日期条件, UID列表, UIDVALIDITY) 搜索各文件夹并并行获取
+        返回 (邮件列表, 失败的搜索和获取任务数)
+        """
+        if folders is None:
+            folders = ['INBOX']
+        elif folders == 'all':
+            folders = self.list_folders()
+
+        for fetcher in self.fetchers:
+            fetcher.reset_stats()
+            fetcher.qualify_ids = len(folders) > 1
+
+        failures = 0
+        with ThreadPoolExecutor(max_workers=len(self.fetchers)) as executor:
+            # 各文件夹的选择和搜索也并行进行
+            searches = [executor.submit(self._run, search, folder) for folder in folders]
+
+            tasks = []
+            for folder, future in zip(folders, searches):
+                try:
+                    target_date, uids, uidvalidity = future.result()
+                except Exception as e:
+                    logger.error(f"✗ 搜索 {folder} 失败: {str(e)}")
+                    failures += 1
+                    continue
+                if uids is None:
+                    logger.error(f"✗ 搜索 {folder} 失败")
+                    failures += 1
+                    continue
+                if not uids:
+                    continue
+                logger.info(f"  {folder}: 服务器返回 {len(uids)} 封邮件")
+
+                # 每个任务不超过一个FETCH批次，并尽量让所有连接都有活干
+                chunk = min(self.fetchers[0].batch_size, math.ceil(len(uids) / len(self.fetchers)))
+                for start in range(0, len(uids), chunk):
+                    tasks.append((folder, executor.submit(
+                        self._run,
+                        lambda fetcher, *args: fetcher.fetch_uids(*args),
+                        folder, uidvalidity, uids[start:start + chunk], target_date
+                    )))
+
+            # 按提交顺序收集，保证输出顺序稳定
+            emails = []
+            for folder, future in tasks:
+                try:
+                    emails.extend(future.result())
+                except Exception as e:
+                    logger.error(f"✗ 获取 {folder} 的邮件时出错: {str(e)}")
+                    failures += 1
+
+        logger.info(f"✓ 找到 {len(emails)} 封{description}（{len(self.fetchers)} 个连接, {len(folders)} 个文件夹）")
+        self.print_stats()
+        return emails, failures
+
+    @property
+    def stats(self):
+        """汇总所有连接的网络统计"""
+        return {
+            'round_trips': sum(fetcher.stats['round_trips'] for fetcher in self.fetchers),
+            'bytes': sum(fetcher.stats['bytes'] for fetcher in self.fetchers),
+        }
+
+    def print_stats(self):
+        """输出本次运行的网络统计"""
+        stats = self.stats
+        logger.info(f"  网络统计: {stats['round_trips']} 次往返, {stats['bytes'] / 1024:.1f} KB")
+        cache = self.fetcher_kwargs.get('message_cache')
+        if cache:
+            cache.print_stats()
+
+    def commit_sync(self):
+        """在摘要成功发送后保存同步进度（连接断开后也可以调用）"""
+        state_store = self.fetcher_kwargs.get('state_store')
+        if state_store:
+            for folder, (uidvalidity, last_uid) in self.pending_sync.items():
+                state_store.update(self.email_account, folder, uidvalidity, last_uid)
+        self.pending_sync = {}
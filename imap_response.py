@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IMAP响应解析工具
+提供UID消息集构建和多邮件FETCH响应解析
+"""
+
+import re
+
+
+_OPEN = object()
+_CLOSE = object()
+_PARTIAL_RE = re.compile(r'<\d+>$')
+
+
+def build_uid_sets(uids, batch_size):
+    """将UID列表按批次大小切分，并压缩连续区间，例如 ['1:200', '201:400']"""
+    uids = sorted(set(int(uid) for uid in uids))
+    batch_size = max(1, int(batch_size))
+    sets = []
+    for start in range(0, len(uids), batch_size):
+        chunk = uids[start:start + batch_size]
+        ranges = []
+        run_start = prev = chunk[0]
+        for uid in chunk[1:]:
+            if uid == prev + 1:
+                prev = uid
+                continue
+            ranges.append(_format_range(run_start, prev))
+            run_start = prev = uid
+        ranges.append(_format_range(run_start, prev))
+        sets.append(','.join(ranges))
+    return sets
+
+
+def _format_range(start, end):
+    return str(start) if start == end else f'{start}:{end}'
+
+
+def response_size(data):
+    """统计IMAP响应数据的字节数"""
+    total = 0
+    for item in data or []:
+        if isinstance(item, tuple):
+            total += sum(len(piece) for piece in item if piece)
+        elif item:
+            total += len(item)
+    return total
+
+
+def _tokenize(text, tokens):
+    """把响应行切分为括号、原子和字符串"""
+    i = 0
+    n = len(text)
+    while i < n:
+        c = text[i]
+        if c in b' \r\n':
+            i += 1
+        elif c == 0x28:  # (
+            tokens.append(_OPEN)
+            i += 1
+        elif c == 0x29:  # )
+            tokens.append(_CLOSE)
+            i += 1
+        elif c == 0x22:  # "
+            i += 1
+            value = bytearray()
+            while i < n and text[i] != 0x22:
+                if text[i] == 0x5C and i + 1 < n:  # 反斜杠转义
+                    i += 1
+                value.append(text[i])
+                i += 1
+            tokens.append(bytes(value))
+            i += 1
+        elif c == 0x7B:  # { 字面量标记，内容由调用方追加
+            i = text.index(b'}', i) + 1
+        else:
+            start = i
+            depth = 0
+            while i < n:
+                c = text[i]
+                if c == 0x5B:  # [
+                    depth += 1
+                elif c == 0x5D:  # ]
+                    depth -= 1
+                elif depth == 0 and c in b' ()':
+                    break
+                i += 1
+            atom = text[start:i].decode('ascii', errors='ignore')
+            tokens.append(None if atom.upper() == 'NIL' else atom)
+
+
+def _build_list(tokens, pos):
+    """从左括号之后开始构建嵌套列表"""
+    result = []
+    while pos < len(tokens):
+        token = tokens[pos]
+        if token is _CLOSE:
+            return result, pos + 1
+        if token is _OPEN:
+            value, pos = _build_list(tokens, pos + 1)
+            result.append(value)
+        else:
+            result.append(token)
+            pos += 1
+    return result, pos
+
+
+def normalize_item_name(name):
+    """统一FETCH数据项名称：去掉.PEEK和部分获取的起始偏移"""
+    name = name.upper().replace('BODY.PEEK[', 'BODY[')
+    return _PARTIAL_RE.sub('', name)
+
+
+def parse_fetch_response(data):
+    """解析FETCH响应，返回 [(序号, {数据项: 值})]，支持一次返回多封邮件"""
+    tokens = []
+    for item in data or []:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            _tokenize(item[0], tokens)
+            tokens.append(item[1])
+        else:
+            _tokenize(item, tokens)
+
+    results = []
+    pos = 0
+    while pos < len(tokens):
+        token = tokens[pos]
+        if (isinstance(token, str) and token.isdigit()
+                and pos + 1 < len(tokens) and tokens[pos + 1] is _OPEN):
+            values, pos = _build_list(tokens, pos + 2)
+            items = {}
+            for i in range(0, len(values) - 1, 2):
+                if isinstance(values[i], str):
+                    items[normalize_item_name(values[i])] = values[i + 1]
+            results.append((int(token), items))
+        else:
+            pos += 1
+    return results
+
+
+def find_item(items, prefix):
+    """按名称前缀查找数据项，例如 'BODY[HEADER'"""
+    prefix = normalize_item_name(prefix)
+    for name, value in items.items():
+        if name.startswith(prefix):
+            return value
+    return None
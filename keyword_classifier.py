@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+关键词分类器
+每个类别的关键词编译成一个正则交替式，一次扫描主题、发件人和正文；也可作为AI之前的路由
+"""
+
+import re
+
+from email_record import body_prefix
+
+
+# 系统通知：账单、安全、验证等重要通知
+SYSTEM_KEYWORDS = (
+    '账单', '欠费', '余额不足', '到期', '续费', '支付', '缴费',
+    'bill', 'payment', 'expired', 'renew', 'overdue',
+    '验证码', '登录异常', '密码', '风险',
+    '停机', '暂停服务', '服务到期',
+)
+
+# 营销推广：优惠活动、产品推广等
+MARKETING_KEYWORDS = (
+    '优惠', '促销', '折扣', '限时', '抢购', '特价', '活动',
+    'sale', 'offer', 'discount', 'deal', 'promotion',
+    '1折', '2折', '3折', '5折', '低至', '最低',
+    '双11', '618', '秒杀', '团购', '福利',
+    '更强大', '更高效', '尽在', '立即体验',
+    '免费试用', '新功能', '升级体验',
+    'app下载', '下载app', '安装',
+    '推荐', '精选', '热门', '爆款',
+)
+
+# (类别, 关键词, 检查的字段)，按优先级排列：先命中的类别优先
+DEFAULT_CATEGORIES = (
+    ('system', SYSTEM_KEYWORDS, ('from', 'subject', 'body')),
+    ('marketing', MARKETING_KEYWORDS, ('subject', 'body')),
+)
+
+
+class KeywordClassifier:
+    """按类别匹配关键词，返回第一个命中的类别，都未命中时为 other"""
+
+    DEFAULT_CATEGORY = 'other'
+
+    def __init__(self, categories=DEFAULT_CATEGORIES, body_chars=150):
+        """
+        categories: [(类别, 关键词列表, 检查的字段)]，字段为 from / subject / body
+        body_chars: 只检查正文的前多少个字符
+        """
+        self.body_chars = body_chars
+        self.categories = []
+        for name, keywords, fields in categories:
+            # 长词在前，保证交替式优先匹配最长的关键词
+            words = sorted({word.lower() for word in keywords}, key=len, reverse=True)
+            pattern = re.compile('|'.join(re.escape(word) for word in words))
+            self.categories.append((name, pattern, tuple(fields)))
+
+    def _fields(self, email_info):
+        """每个字段只转换一次小写"""
+        return {
+            'from': (email_info.get('from') or '').lower(),
+            'subject': (email_info.get('subject') or '').lower(),
+            'body': body_prefix(email_info, self.body_chars).lower(),
+        }
+
+    def matches(self, email_info):
+        """返回 {类别: 命中的不同关键词集合}，未命中的类别不出现"""
+        fields = self._fields(email_info)
+        found = {}
+        for name, pattern, names in self.categories:
+            hits = set()
+            for field in names:
+                hits.update(pattern.findall(fields[field]))
+            if hits:
+                found[name] = hits
+        return found
+
+    def classify(self, email_info):
+        """返回邮件的类别"""
+        fields = self._fields(email_info)
+        for name, pattern, names in self.categories:
+            if any(pattern.search(fields[field]) for field in names):
+                return name
+        return self.DEFAULT_CATEGORY
+
+    def is_bulk_marketing(self, email_info, min_hits=2):
+        """有把握的营销邮件：命中至少min_hits个不同的营销关键词，且没有命中其他类别"""
+        found = self.matches(email_info)
+        return set(found) == {'marketing'} and len(found['marketing']) >= min_hits
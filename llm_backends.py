@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型后端
+统一的 generate(prompt) 接口：Gemini、OpenAI兼容HTTP接口和用于离线测试的本地模拟后端，
+LLMScheduler 在其外层提供令牌桶限速、并发上限、单次超时和带抖动的指数退避重试
+"""
+
+import json
+import logging
+import random
+import re
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from metrics import metrics
+from prompt_budget import estimate_tokens
+
+
+logger = logging.getLogger(__name__)
+
+# 这些HTTP状态码表示限流或服务端临时故障，可以重试
+RETRYABLE_STATUS = (408, 409, 429, 500, 502, 503, 504)
+# google.api_core 中对应临时故障的异常类名（不直接导入，避免在其他后端下依赖该库）
+RETRYABLE_ERROR_NAMES = ('ResourceExhausted', 'ServiceUnavailable', 'DeadlineExceeded',
+                         'InternalServerError', 'TooManyRequests', 'Aborted')
+
+
+class LLMError(Exception):
+    """后端调用失败，retryable表示是否值得重试"""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def is_retryable(error):
+    """判断异常是否为限流、超时或服务端临时故障"""
+    if isinstance(error, LLMError):
+        return error.retryable
+    if isinstance(error, (TimeoutError, socket.timeout, ConnectionError)):
+        return True
+    if isinstance(error, urllib.error.HTTPError):
+        return error.code in RETRYABLE_STATUS
+    if isinstance(error, urllib.error.URLError):
+        return True
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if isinstance(code, int) and code in RETRYABLE_STATUS:
+        return True
+    return type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+class GeminiBackend:
+    """Google Gemini（google-generativeai）"""
+
+    DEFAULT_MODEL = 'gemini-2.0-flash-exp'
+
+    def __init__(self, api_key, model_name=None, timeout=60):
+        self.api_key = api_key
+        self.model_name = model_name or self.DEFAULT_MODEL
+        self.timeout = timeout
+        self.model = None
+        self._lock = threading.Lock()
+
+    def _load_model(self):
+        """
+        第一次调用时才导入google.generativeai：导入它需要几百毫秒到数秒，
+        配置错误、连接失败或当天没有邮件而没有调用AI的运行不必付出这部分启动时间
+        """
+        with self._lock:
+            if self.model is None:
+                import google.generativeai as genai
+
+                genai.configure(api_key=self.api_key)
+                self.model = genai.GenerativeModel(self.model_name)
+        return self.model
+
+    def generate(self, prompt):
+        """返回模型输出的文本"""
+        model = self.model or self._load_model()
+        response = model.generate_content(prompt, request_options={'timeout': self.timeout})
+        return response.text
+
+
+class OpenAICompatibleBackend:
+    """OpenAI兼容的 /chat/completions 接口（OpenAI、DeepSeek、vLLM、Ollama等）"""
+
+    DEFAULT_MODEL = 'gpt-4o-mini'
+    DEFAULT_BASE_URL = 'https://api.openai.com/v1'
+
+    def __init__(self, api_key=None, model_name=None, base_url=None, timeout=60, temperature=0.3):
+        self.api_key = api_key
+        self.model_name = model_name or self.DEFAULT_MODEL
+        self.base_url = (base_url or self.DEFAULT_BASE_URL).rstrip('/')
+        self.timeout = timeout
+        self.temperature = temperature
+
+    def generate(self, prompt):
+        """返回模型输出的文本"""
+        payload = json.dumps({
+            'model': self.model_name,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': self.temperature,
+        }).encode('utf-8')
+        headers = {'Content-Type': 'application/json'}
+        if self.api_key:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        request = urllib.request.Request(f'{self.base_url}/chat/completions', data=payload, headers=headers)
+
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            detail = e.read().decode('utf-8', errors='ignore')[:200]
+            raise LLMError(f'HTTP {e.code}: {detail}', retryable=e.code in RETRYABLE_STATUS) from e
+
+        try:
+            return data['choices'][0]['message']['content']
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMError(f'无法解析响应: {str(data)[:200]}') from e
+
+
+def stub_reply(prompt):
+    """模拟模型输出：每日摘要提示词返回JSON对象，逐封摘要提示词返回JSON数组，其余返回简单的HTML报告"""
+    indices = [int(index) for index in re.findall(r'========== 邮件 (\d+) ==========', prompt)]
+    if '"highlights"' in prompt:
+        return json.dumps({
+            'overview': f'共 {len(indices)} 封邮件的模拟概况',
+            'highlights': [{'index': index, 'priority': 'medium', 'category': '其他',
+                            'gist': f'邮件 {index} 的模拟摘要', 'action': ''} for index in indices[:8]],
+        }, ensure_ascii=False)
+    if '"index"' in prompt:
+        return json.dumps([
+            {'index': index, 'priority': 'medium', 'category': '其他',
+             'gist': f'邮件 {index} 的模拟摘要', 'action': ''}
+            for index in indices
+        ], ensure_ascii=False)
+    return f'<html><body><h2>📧 模拟摘要报告</h2><p>提示词 {len(prompt)} 字符，{len(indices)} 封邮件</p></body></html>'
+
+
+class StubBackend:
+    """本地模拟后端：按设定的延迟和错误率返回，用于离线测试调度器的吞吐量"""
+
+    def __init__(self, latency=0.2, jitter=0.5, error_rate=0.0, timeout_rate=0.0, timeout=60,
+                 seed=None, responder=stub_reply, model_name='stub'):
+        """
+        latency: 平均延迟（秒），实际延迟在 ±jitter 比例内随机
+        error_rate: 返回可重试错误（模拟429/503）的概率
+        timeout_rate: 超过timeout才返回的概率，此时抛出超时
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self.responder = responder
+        self.model_name = model_name
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def generate(self, prompt):
+        with self.lock:
+            self.calls += 1
+            delay = self.latency * (1 + self.jitter * (2 * self.random.random() - 1))
+            roll = self.random.random()
+        if roll < self.timeout_rate:
+            time.sleep(min(self.timeout, delay * 10))
+            raise TimeoutError(f'模拟超时（{self.timeout}s）')
+        time.sleep(delay)
+        if roll < self.timeout_rate + self.error_rate:
+            raise LLMError('模拟限流: HTTP 429', retryable=True)
+        return self.responder(prompt)
+
+
+class TokenBucket:
+    """令牌桶限速：平均每秒rate个请求，最多突发capacity个"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """取一个令牌，没有时等待，返回等待的秒数"""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class LLMScheduler:
+    """包装一个后端：限速、限制并发，并对可重试的错误做带抖动的指数退避"""
+
+    def __init__(self, backend, rate_per_minute=None, max_concurrency=4, max_retries=3,
+                 base_delay=1.0, max_delay=30.0):
+        """
+        rate_per_minute: 每分钟最多发起的请求数，None表示不限速
+        max_concurrency: 同时进行的请求数
+        max_retries: 可重试错误的最大重试次数
+        base_delay / max_delay: 退避时间的基数和上限（秒）
+        """
+        self.backend = backend
+        self.bucket = TokenBucket(rate_per_minute / 60) if rate_per_minute else None
+        self.semaphore = threading.BoundedSemaphore(max(1, int(max_concurrency)))
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.random = random.Random()
+        self.lock = threading.Lock()
+        self.reset_stats()
+
+    @property
+    def model_name(self):
+        return self.backend.model_name
+
+    def reset_stats(self):
+        """重置调用统计"""
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.rate_wait = 0.0
+
+    def _backoff(self, attempt):
+        """第attempt次重试前的等待时间（full jitter）"""
+        return self.random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def generate(self, prompt):
+        """调用后端生成文本，重试用尽或遇到不可重试的错误时抛出最后一次的异常"""
+        attempt = 0
+        metrics.count('llm_prompt_tokens', estimate_tokens(prompt))
+        while True:
+            waited = self.bucket.acquire() if self.bucket else 0.0
+            with self.lock:
+                self.calls += 1
+                self.rate_wait += waited
+            metrics.count('llm_requests')
+            try:
+                with self.semaphore, metrics.timer('llm_call'):
+                    response = self.backend.generate(prompt)
+                metrics.count('llm_response_tokens', estimate_tokens(response or ''))
+                return response
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    with self.lock:
+                        self.failures += 1
+                    metrics.count('llm_failures')
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                with self.lock:
+                    self.retries += 1
+                metrics.count('llm_retries')
+                logger.warning(f"  ⚠ AI调用失败，{delay:.1f} 秒后第 {attempt} 次重试: {str(e)}")
+                time.sleep(delay)
+
+    def print_stats(self):
+        """输出本次运行的调用统计"""
+        logger.info(f"  AI调用统计: {self.calls} 次请求, {self.retries} 次重试, {self.failures} 次失败, "
+                    f"限速等待 {self.rate_wait:.1f} 秒")
+
+
+def create_backend(name, api_key=None, model_name=None, base_url=None, timeout=60):
+    """根据名称创建后端：gemini / openai / stub"""
+    name = (name or 'gemini').lower()
+    if name == 'gemini':
+        return GeminiBackend(api_key, model_name=model_name, timeout=timeout)
+    if name == 'openai':
+        return OpenAICompatibleBackend(api_key, model_name=model_name, base_url=base_url, timeout=timeout)
+    if name == 'stub':
+        return StubBackend(timeout=timeout)
+    raise ValueError(f"不支持的LLM后端: {name}")
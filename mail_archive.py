@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地邮件归档
+把获取过的邮件（头部字段和已提取的正文）保存到SQLite，用FTS5全文索引搜索，
+发件人和日期有单独的索引；查询历史邮件不需要再连接IMAP服务器
+
+命令行:
+  python mail_archive.py search 发票 --from billing@example.com --since 2026-10-01
+  python mail_archive.py show 123
+  python mail_archive.py stats
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from email.utils import parseaddr
+
+
+# 中日韩文字没有空格分词，连续的一段文字按相邻两字切分（bigram）后交给unicode61分词器建立索引
+CJK_RUN = re.compile('[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+')
+
+
+def _split_run(match):
+    run = match.group()
+    if len(run) == 1:
+        return f' {run} '
+    return ' ' + ' '.join(run[i:i + 2] for i in range(len(run) - 1)) + ' '
+
+
+def cjk_tokens(text):
+    """把文本中连续的中日韩文字替换为空格分隔的相邻两字，其他文字不变（索引和查询使用同一种切分）"""
+    return CJK_RUN.sub(_split_run, text or '')
+
+
+class MailArchive:
+    """按 (账号, Date头部, 发件人, 主题) 去重的邮件归档，重复写入同一封邮件会被忽略"""
+
+    # 摘要片段在第一个命中的关键词前后保留的字符数
+    SNIPPET_CHARS = 40
+
+    def __init__(self, db_path):
+        """打开或创建归档数据库"""
+        self.db_path = db_path
+        # 连接池的工作线程共享同一个实例，用锁串行化访问
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS emails (
+                id INTEGER PRIMARY KEY,
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uid TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                sender TEXT NOT NULL,
+                sender_address TEXT NOT NULL,
+                recipients TEXT NOT NULL,
+                date TEXT NOT NULL,
+                received TEXT NOT NULL,
+                body TEXT NOT NULL,
+                archived_at REAL NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_emails_identity ON emails (account, date, sender, subject);
+            CREATE INDEX IF NOT EXISTS idx_emails_sender ON emails (sender_address, received);
+            CREATE INDEX IF NOT EXISTS idx_emails_received ON emails (received);
+        """)
+        # 触发器调用的切分函数，每个连接都要注册
+        self.conn.create_function('cjk_tokens', 1, cjk_tokens, deterministic=True)
+        # 无内容索引：只保存切分后的词，原文在emails表中；归档只追加，不需要删除触发器
+        self.conn.executescript("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+                subject, sender, body, content='', tokenize='unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS emails_fts_insert AFTER INSERT ON emails BEGIN
+                INSERT INTO emails_fts (rowid, subject, sender, body)
+                VALUES (new.id, cjk_tokens(new.subject), cjk_tokens(new.sender), cjk_tokens(new.body));
+            END;
+        """)
+        self.conn.commit()
+
+    def add_emails(self, account, emails):
+        """在一个事务中批量写入邮件（EmailRecord或邮件字典），返回新写入的邮件数"""
+        now = time.time()
+        rows = [
+            # 多文件夹获取时id为 "文件夹:UID"，文件夹已单独保存，这里只保存UID
+            (account, email_info.get('folder') or 'INBOX', str(email_info.get('id') or '').rpartition(':')[2],
+             email_info['subject'] or '', email_info['from'] or '', parseaddr(email_info['from'] or '')[1].lower(),
+             email_info.get('to') or '', email_info.get('date') or '', email_info['parsed_date'] or '',
+             email_info.get('body') or '', now)
+            for email_info in emails
+        ]
+        if not rows:
+            return 0
+        with self.lock:
+            cursor = self.conn.executemany(
+                """
+                INSERT OR IGNORE INTO emails (account, folder, uid, subject, sender, sender_address, recipients,
+                                              date, received, body, archived_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            self.conn.commit()
+        # 被 OR IGNORE 跳过的已归档邮件不计入 rowcount
+        return cursor.rowcount
+
+    def _match_expression(self, terms):
+        """把关键词转换为FTS5查询：每个词切分后作为一个短语（加引号，避免被当作查询语法），短语末尾按前缀匹配"""
+        return ' '.join('"' + cjk_tokens(term).replace('"', '""') + '" *' for term in terms)
+
+    def _snippet(self, body, terms):
+        """正文中第一个命中的关键词前后的一段文字，没有关键词时取正文开头"""
+        lowered = body.lower()
+        positions = [lowered.find(term.lower()) for term in terms]
+        positions = [position for position in positions if position >= 0]
+        if not positions:
+            return ' '.join(body[:80].split())
+        start = max(min(positions) - self.SNIPPET_CHARS, 0)
+        snippet = ' '.join(body[start:min(positions) + self.SNIPPET_CHARS * 2].split())
+        return ('…' if start else '') + snippet + '…'
+
+    def search(self, query=None, account=None, sender=None, since=None, until=None, folder=None, limit=20):
+        """
+        搜索归档，返回 [{'id', 'account', 'folder', 'subject', 'from', 'received', 'snippet'}]
+        query: 空格分隔的关键词，全部命中才返回（匹配主题、发件人和正文）
+        sender: 发件人地址（完整地址精确匹配，否则按子串匹配名字和地址）
+        since / until: 'YYYY-MM-DD' 或 'YYYY-MM-DD HH:MM:SS'（接收时间，本地时区，包含两端）
+        有关键词时按相关度排序，否则按时间倒序
+        """
+        terms = (query or '').split()
+        # 单个中文字没有对应的索引词，只有标点的词切分后为空，这两种词用LIKE扫描
+        scanned = [term for term in terms
+                   if not re.search(r'\w', term) or any(len(run) == 1 for run in CJK_RUN.findall(term))]
+        indexed = [term for term in terms if term not in scanned]
+
+        conditions, params = [], []
+        if account:
+            conditions.append('e.account = ?')
+            params.append(account)
+        if folder:
+            conditions.append('e.folder = ?')
+            params.append(folder)
+        if sender:
+            if '@' in sender and ' ' not in sender:
+                conditions.append('e.sender_address = ?')
+                params.append(sender.lower())
+            else:
+                conditions.append('e.sender LIKE ?')
+                params.append(f'%{sender}%')
+        if since:
+            conditions.append('e.received >= ?')
+            params.append(since)
+        if until:
+            conditions.append('e.received <= ?')
+            params.append(until + ' 23:59:59' if len(until) == 10 else until)
+        for term in scanned:
+            conditions.append('(e.subject LIKE ? OR e.sender LIKE ? OR e.body LIKE ?)')
+            params.extend([f'%{term}%'] * 3)
+
+        columns = 'e.id, e.account, e.folder, e.subject, e.sender, e.received, e.body'
+        if indexed and not conditions:
+            # 只有关键词时先在全文索引内排序取前 limit 封，只为这几封读取邮件表
+            sql = f"""
+                SELECT {columns} FROM (
+                    SELECT rowid, bm25(emails_fts) AS score FROM emails_fts
+                    WHERE emails_fts MATCH ? ORDER BY score LIMIT ?
+                ) ranked JOIN emails e ON e.id = ranked.rowid
+                ORDER BY ranked.score, e.received DESC
+            """
+            params = [self._match_expression(indexed), limit]
+        else:
+            if indexed:
+                sql = f"""
+                    SELECT {columns} FROM emails_fts JOIN emails e ON e.id = emails_fts.rowid
+                    WHERE emails_fts MATCH ?
+                """
+                params.insert(0, self._match_expression(indexed))
+                order = 'ORDER BY bm25(emails_fts), e.received DESC'
+            else:
+                sql = f'SELECT {columns} FROM emails e WHERE 1'
+                order = 'ORDER BY e.received DESC'
+            for condition in conditions:
+                sql += f' AND {condition}'
+            sql += f' {order} LIMIT ?'
+            params.append(limit)
+
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{'id': row['id'], 'account': row['account'], 'folder': row['folder'], 'subject': row['subject'],
+                 'from': row['sender'], 'received': row['received'], 'snippet': self._snippet(row['body'], terms)}
+                for row in rows]
+
+    def get(self, email_id):
+        """返回一封归档邮件的所有字段，不存在时返回None"""
+        with self.lock:
+            row = self.conn.execute('SELECT * FROM emails WHERE id = ?', (email_id,)).fetchone()
+        if row is None:
+            return None
+        email_info = dict(row)
+        email_info['from'] = email_info.pop('sender')
+        email_info['to'] = email_info.pop('recipients')
+        email_info['parsed_date'] = email_info.pop('received')
+        return email_info
+
+    def stats(self):
+        """按账号统计邮件数和时间范围"""
+        with self.lock:
+            rows = self.conn.execute("""
+                SELECT account, COUNT(*) AS count, MIN(received) AS first, MAX(received) AS last
+                FROM emails GROUP BY account ORDER BY account
+            """).fetchall()
+        return [dict(row) for row in rows]
+
+    def close(self):
+        """关闭数据库"""
+        self.conn.close()
+
+
+def main(argv=None):
+    """命令行：search / show / stats"""
+    parser = argparse.ArgumentParser(description='搜索本地邮件归档')
+    parser.add_argument('--db', default=os.getenv('ARCHIVE_DB') or 'mail_archive.db', help='归档数据库（默认 ARCHIVE_DB）')
+    commands = parser.add_subparsers(dest='command', required=True)
+    search = commands.add_parser('search', help='搜索邮件')
+    search.add_argument('query', nargs='*', help='关键词（全部命中）')
+    search.add_argument('--from', dest='sender', help='发件人地址或名字')
+    search.add_argument('--since', help='开始日期 YYYY-MM-DD')
+    search.add_argument('--until', help='结束日期 YYYY-MM-DD（包含）')
+    search.add_argument('--account', help='只搜索这个邮箱账号')
+    search.add_argument('--folder', help='只搜索这个文件夹')
+    search.add_argument('--limit', type=int, default=20, help='最多返回的邮件数')
+    show = commands.add_parser('show', help='显示一封邮件的完整内容')
+    show.add_argument('id', type=int)
+    commands.add_parser('stats', help='各账号的邮件数和时间范围')
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"✗ 归档数据库不存在: {args.db}")
+        return 1
+    archive = MailArchive(args.db)
+    try:
+        if args.command == 'search':
+            start = time.perf_counter()
+            results = archive.search(' '.join(args.query), account=args.account, sender=args.sender,
+                                     since=args.since, until=args.until, folder=args.folder, limit=args.limit)
+            elapsed = (time.perf_counter() - start) * 1000
+            for result in results:
+                print(f"[{result['id']}] {result['received']}  {result['subject']}")
+                print(f"      {result['from']}")
+                print(f"      {result['snippet']}")
+            print(f"✓ {len(results)} 封邮件（{elapsed:.1f} ms）")
+        elif args.command == 'show':
+            email_info = archive.get(args.id)
+            if email_info is None:
+                print(f"✗ 没有这封邮件: {args.id}")
+                return 1
+            for label, key in (('主题', 'subject'), ('发件人', 'from'), ('收件人', 'to'), ('时间', 'parsed_date'),
+                               ('账号', 'account'), ('文件夹', 'folder')):
+                print(f"{label}: {email_info[key]}")
+            print()
+            print(email_info['body'])
+        else:
+            for row in archive.stats():
+                print(f"{row['account']}: {row['count']} 封邮件（{row['first']} ~ {row['last']}）")
+        return 0
+    finally:
+        archive.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
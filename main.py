@@ -6,89 +6,470 @@
 1. 获取当天QQ邮箱的所有邮件
 2. 使用Gemini AI生成摘要报告
 3. 将摘要发送到指定邮箱
+
+设置 ACCOUNTS_FILE 后进入多账户模式：账户文件中的每个邮箱在工作线程池中分别处理，共用一个AI调用限速器
+设置 DAEMON_MODE=1 后常驻运行：用IMAP IDLE监听新邮件并预先摘要，每天在 DIGEST_SEND_TIME 发送报告
+
+命令行参数：
+  --no-llm   不调用AI，按关键词分类生成报告并发送
+  --dry-run  不调用AI也不发送，把报告写入 --output 目录，不保存同步进度
+  --period week|month / --since YYYY-MM-DD [--until YYYY-MM-DD]
+             生成周报、月报：由每天的结构化摘要合并生成，已保存每日摘要（DAILY_SUMMARY_DB）的日期不再获取邮件
 """
 
 from email_fetcher import QQEmailFetcher
+from imap_pool import IMAPConnectionPool
+from pipeline import DigestPipeline
 from email_sender import QQEmailSender
 from ai_summarizer import GeminiSummarizer
-from utils import load_env_config
-from datetime import datetime
+from message_cache import MessageCache
+from mail_archive import MailArchive
+from daily_summaries import DailySummaryStore
+from range_digest import RangeDigest, day_runs, range_title, resolve_date_range
+from summary_cache import SummaryCache
+from prompt_budget import BudgetAllocator
+from compaction import BodyCompactor
+from idle_daemon import DigestDaemon
+from delivery import DeliveryEngine, DeliveryQueue
+from keyword_classifier import KeywordClassifier
+from near_duplicates import NearDuplicateClusterer
+from llm_backends import LLMScheduler, create_backend
+from metrics import metrics
+from sync_state import SyncStateStore
+from report_renderer import report_text
+from utils import load_accounts, load_env_config, parse_recipients
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+import argparse
+import logging
+import os
+import re
+import signal
 import sys
+import time
 
 
-def main():
-    """主函数"""
-    print("=" * 70)
-    print("📧 每日邮件自动摘要系统")
-    print("=" * 70)
-    print(f"运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-    print()
+def parse_args(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='每日邮件自动摘要系统')
+    parser.add_argument('--no-llm', action='store_true', help='不调用AI，按关键词分类生成报告')
+    parser.add_argument('--dry-run', action='store_true', help='不调用AI也不发送，把报告写入文件')
+    parser.add_argument('--output', default='.', help='--dry-run 的报告输出目录（默认当前目录）')
+    parser.add_argument('--period', choices=('week', 'month'), help='生成截止到昨天的周报（7天）或月报（30天）')
+    parser.add_argument('--since', type=date.fromisoformat, help='报告的开始日期 YYYY-MM-DD')
+    parser.add_argument('--until', type=date.fromisoformat, help='报告的截止日期 YYYY-MM-DD（包含，默认昨天）')
+    args = parser.parse_args(argv)
+    try:
+        args.date_range = resolve_date_range(args.period, args.since, args.until)
+    except ValueError as e:
+        parser.error(str(e))
+    return args
+
 
+def create_llm(config):
+    """创建带限速和重试的LLM调度器；多账户模式下所有账户共用一个"""
+    return LLMScheduler(
+        create_backend(config['llm_backend'], api_key=config['llm_api_key'], model_name=config['llm_model'],
+                       base_url=config['llm_base_url'], timeout=config['llm_timeout']),
+        rate_per_minute=config['llm_rate_per_minute'],
+        max_concurrency=config['llm_concurrency'],
+        max_retries=config['llm_max_retries'],
+    )
+
+
+def save_preview(config, account, report, label=None):
+    """--dry-run：把报告的HTML和纯文本版本写入输出目录，返回HTML文件路径；label默认为今天的日期"""
+    os.makedirs(config['dry_run_output'], exist_ok=True)
+    name = re.sub(r'[^\w.@-]', '_', account['name'])
+    label = label or datetime.now().strftime('%Y%m%d')
+    base = os.path.join(config['dry_run_output'], f"digest-{name}-{label}")
+    with open(base + '.html', 'w', encoding='utf-8') as f:
+        f.write(report)
+    with open(base + '.txt', 'w', encoding='utf-8') as f:
+        f.write(report_text(report))
+    return base + '.html'
+
+
+def create_stores(config):
+    """创建同步状态、邮件缓存、摘要缓存、邮件归档、每日摘要和投递重试队列（SQLite，可以在多个账户之间共用）"""
+    stores = {'state_store': None, 'message_cache': None, 'summary_cache': None, 'archive': None,
+              'daily_summaries': None, 'delivery_queue': None}
+    if config['sync_state_db']:
+        stores['state_store'] = SyncStateStore(config['sync_state_db'])
+        print(f"  - 增量同步: {config['sync_state_db']}")
+    if config['message_cache_db']:
+        stores['message_cache'] = MessageCache(config['message_cache_db'],
+                                               max_bytes=config['message_cache_max_mb'] * 1024 * 1024)
+        print(f"  - 邮件缓存: {config['message_cache_db']}")
+    if config['summary_cache_db']:
+        stores['summary_cache'] = SummaryCache(config['summary_cache_db'],
+                                               ttl_days=config['summary_cache_ttl_days'],
+                                               max_entries=config['summary_cache_max_entries'])
+        print(f"  - 摘要缓存: {config['summary_cache_db']}")
+    if config['archive_db'] and not config['dry_run']:
+        stores['archive'] = MailArchive(config['archive_db'])
+        print(f"  - 邮件归档: {config['archive_db']}")
+    if config['daily_summary_db'] and config['date_range']:
+        stores['daily_summaries'] = DailySummaryStore(config['daily_summary_db'])
+        print(f"  - 每日摘要: {config['daily_summary_db']}")
+    if config['delivery_queue_db']:
+        stores['delivery_queue'] = DeliveryQueue(config['delivery_queue_db'],
+                                                 max_attempts=config['delivery_max_attempts'],
+                                                 retry_delay=config['delivery_retry_seconds'])
+        print(f"  - 投递重试队列: {config['delivery_queue_db']}")
+    return stores
+
+
+def create_summarizer_options(config, llm, stores):
+    """GeminiSummarizer的参数；预算分配器有运行状态，每次调用都新建"""
+    return {
+        'backend': llm,
+        'summary_cache': stores['summary_cache'],
+        'map_reduce': config['map_reduce'],
+        'batch_tokens': config['map_batch_tokens'],
+        'max_concurrency': config['llm_concurrency'],
+        'allocator': BudgetAllocator(config['prompt_token_budget'],
+                                     min_tokens=config['email_min_tokens'],
+                                     max_tokens=config['email_max_tokens']),
+        'router': KeywordClassifier() if config['route_marketing'] else None,
+        'route_min_hits': config['route_min_hits'],
+    }
+
+
+def create_fetcher(config, account, stores, fetcher_class=QQEmailFetcher):
+    """创建单连接获取器，或在多连接、多文件夹时创建连接池，返回 (获取器, 文件夹, 是否为连接池)"""
+    fetcher_options = {'state_store': stores['state_store'], 'message_cache': stores['message_cache'],
+                       'html_budget': config['html_budget'], 'archive': stores['archive']}
+    folders = account.get('imap_folders') or config['imap_folders']
+    use_pool = config['imap_connections'] > 1 or folders != ['INBOX']
+    if use_pool:
+        fetcher = IMAPConnectionPool(account['qq_email'], account['qq_auth_code'], size=config['imap_connections'],
+                                     fetcher_class=fetcher_class, **fetcher_options)
+        print(f"  - 连接池: {config['imap_connections']} 个连接")
+    else:
+        fetcher = fetcher_class(account['qq_email'], account['qq_auth_code'], **fetcher_options)
+    return fetcher, folders, use_pool
+
+
+def deliver_report(account, stores, subject, report, sender_class=QQEmailSender):
+    """先重发之前失败的投递（共用同一个SMTP连接），再把报告发送给所有收件人；有收件人送达或进入重试队列时返回True"""
+    engine = DeliveryEngine(sender_class(account['qq_email'], account['qq_auth_code']), stores['delivery_queue'])
     try:
-        # 1. 加载配置
-        print("【步骤 1/4】加载配置...")
-        config = load_env_config()
-        print(f"✓ 配置加载成功")
-        print(f"  - QQ邮箱: {config['qq_email']}")
-        print(f"  - 收件人: {config['recipient_email']}")
-        print()
+        engine.retry_pending()
+        result = engine.send(parse_recipients(account['recipient_email']), subject, report)
+    finally:
+        engine.close()
+    return bool(result['sent'] or result['queued'])
+
+
+def run_account(config, account, llm, stores, fetcher_class=QQEmailFetcher, sender_class=QQEmailSender):
+    """
+    获取、摘要并发送一个账户今天的邮件，返回 (是否成功, 邮件数)
+    account: {'qq_email', 'qq_auth_code', 'recipient_email', 'imap_folders'(可选)}
+    压缩器、聚类器和预算分配器有运行状态，每个账户单独创建
+    """
+    print("【步骤 2/4】获取今天的邮件...")
+    compactor = BodyCompactor() if config['prompt_compaction'] else None
+    clusterer = None
+    if config['dedup_max_distance'] > 0:
+        clusterer = NearDuplicateClusterer(config['dedup_max_distance'])
+    summarizer_options = create_summarizer_options(config, llm, stores)
+    fetcher, folders, use_pool = create_fetcher(config, account, stores, fetcher_class)
+
+    if not fetcher.connect():
+        print("✗ 无法连接到邮箱服务器")
+        return False, 0
 
-        # 2. 获取今天的邮件
-        print("【步骤 2/4】获取今天的邮件...")
-        fetcher = QQEmailFetcher(config['qq_email'], config['qq_auth_code'])
+    # 流式流水线只用于单连接模式，获取、解码和提示词构建同时进行
+    streaming = config['streaming_pipeline'] and not use_pool and llm is not None
+    summary_report = None
+    try:
+        if streaming:
+            print("  - 流式流水线: 已启用")
+            summarizer = GeminiSummarizer(**summarizer_options)
+            pipeline = DigestPipeline(fetcher, summarizer, queue_size=config['pipeline_queue_size'],
+                                      compactor=compactor, clusterer=clusterer)
+            summary_report = pipeline.run()
+            # pipeline.emails 是合并相似邮件后的代表邮件，计数使用合并前的邮件数
+            emails = pipeline.emails
+            email_count = pipeline.email_count
+        elif use_pool:
+            emails = fetcher.fetch_today_emails(folders)
+        else:
+            emails = fetcher.fetch_today_emails()
+    finally:
+        fetcher.disconnect()
+
+    if emails is None:
+        # 不完整的结果不能当作今天的全部邮件发送，也不保存同步进度，下次运行重新获取
+        print("✗ 获取邮件失败")
+        return False, 0
+    if not streaming:
+        email_count = len(emails)
+
+    print(f"✓ 成功获取 {email_count} 封邮件")
+    print()
 
+    # 3. 使用Gemini生成摘要
+    print("【步骤 3/4】生成AI摘要报告...")
+    if summary_report is None:
+        if compactor is not None:
+            # 去掉引用历史、签名、页脚和长链接后再构建提示词
+            compactor.compact_emails(emails)
+            compactor.print_stats()
+        summary_emails = emails
+        if clusterer is not None:
+            # 几乎相同的邮件（CI告警、订单更新等）只发送一次，附带数量和时间范围
+            summary_emails = clusterer.collapse(emails)
+            clusterer.print_stats()
+        summarizer = GeminiSummarizer(**summarizer_options)
+        if llm is None:
+            print("  - 不调用AI，按关键词分类生成报告")
+            summary_report = summarizer.keyword_report(summary_emails)
+        else:
+            summary_report = summarizer.summarize_emails(summary_emails)
+    else:
+        print("✓ 摘要已在流水线中生成")
+    print()
+
+    # 4. 发送摘要邮件
+    print("【步骤 4/4】发送摘要报告...")
+    if config['dry_run']:
+        print(f"✓ 试运行，报告未发送: {save_preview(config, account, summary_report)}")
+        return True, email_count
+
+    subject = f"📧 每日邮件摘要 - {datetime.now().strftime('%Y年%m月%d日')}"
+    if not deliver_report(account, stores, subject, summary_report, sender_class):
+        print("✗ 邮件发送失败")
+        return False, email_count
+
+    # 摘要送达（或已保存到重试队列）后才记录同步进度，失败时下次运行会重新处理这些邮件
+    fetcher.commit_sync()
+    return True, email_count
+
+
+def run_range(config, account, llm, stores, fetcher_class=QQEmailFetcher, sender_class=QQEmailSender):
+    """
+    生成并发送一个账户在 config['date_range'] 期间的周报或月报，返回 (是否成功, 新获取的邮件数)
+    已保存每日摘要的日期不再获取邮件；其余日期按连续区间获取，每天一次AI调用生成每日摘要，再一次调用合并为报告
+    """
+    start, end = config['date_range']
+    days = [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+    title = range_title(start, end)
+    summarizer = GeminiSummarizer(**create_summarizer_options(config, llm, stores))
+    digest = RangeDigest(summarizer, stores['daily_summaries'], account['qq_email'], use_llm=llm is not None,
+                         max_concurrency=config['llm_concurrency'])
+    summaries = digest.saved_summaries(days)
+    missing = [day for day in days if day not in summaries]
+
+    print(f"【步骤 2/4】获取 {start} ~ {end} 的邮件...")
+    print(f"  - {len(days)} 天中已有 {len(summaries)} 天的每日摘要，需要获取 {len(missing)} 天的邮件")
+    emails_by_day = {day: [] for day in missing}
+    if missing:
+        fetcher, folders, use_pool = create_fetcher(config, account, stores, fetcher_class)
         if not fetcher.connect():
             print("✗ 无法连接到邮箱服务器")
-            return 1
-
+            return False, 0
         try:
-            emails = fetcher.fetch_today_emails()
+            for run_start, run_end in day_runs(missing):
+                if use_pool:
+                    emails = fetcher.fetch_emails(run_start, run_end, folders)
+                else:
+                    emails = fetcher.fetch_emails(run_start, run_end)
+                if emails is None:
+                    # 不完整的结果不能作为这几天的每日摘要保存
+                    print(f"✗ 获取 {run_start} ~ {run_end} 的邮件失败")
+                    return False, 0
+                for email_info in emails:
+                    emails_by_day[date.fromisoformat(email_info['parsed_date'][:10])].append(email_info)
         finally:
             fetcher.disconnect()
+    count = sum(len(emails) for emails in emails_by_day.values())
+    print(f"✓ 成功获取 {count} 封邮件")
+    print()
 
-        if emails is None:
-            emails = []
+    print(f"【步骤 3/4】生成{title}...")
+    if config['prompt_compaction']:
+        compactor = BodyCompactor()
+        for emails in emails_by_day.values():
+            compactor.compact_emails(emails)
+        compactor.print_stats()
+    if config['dedup_max_distance'] > 0:
+        clusterer = NearDuplicateClusterer(config['dedup_max_distance'])
+        for day, emails in emails_by_day.items():
+            emails_by_day[day] = clusterer.collapse(emails)
+    summaries.update(digest.summarize_days(emails_by_day))
+    digest.print_stats()
+    report = digest.report(title, summaries)
+    print()
 
-        print(f"✓ 成功获取 {len(emails)} 封邮件")
-        print()
+    print(f"【步骤 4/4】发送{title}...")
+    if config['dry_run']:
+        label = f"{start.strftime('%Y%m%d')}-{end.strftime('%Y%m%d')}"
+        print(f"✓ 试运行，报告未发送: {save_preview(config, account, report, label)}")
+        return True, count
 
-        # 3. 使用Gemini生成摘要
-        print("【步骤 3/4】生成AI摘要报告...")
-        summarizer = GeminiSummarizer(config['gemini_api_key'])
-        summary_report = summarizer.summarize_emails(emails)
-        print()
+    subject = f"📧 {title} - {start.strftime('%m月%d日')} ~ {end.strftime('%m月%d日')}"
+    if not deliver_report(account, stores, subject, report, sender_class):
+        print("✗ 邮件发送失败")
+        return False, count
+    return True, count
 
-        # 4. 发送摘要邮件
-        print("【步骤 4/4】发送摘要报告...")
-        sender = QQEmailSender(config['qq_email'], config['qq_auth_code'])
 
-        if not sender.connect():
-            print("✗ 无法连接到SMTP服务器")
-            return 1
+def run_accounts(config, accounts, llm, stores, fetcher_class=QQEmailFetcher, sender_class=QQEmailSender):
+    """
+    在工作线程池中处理多个账户，单个账户的失败不影响其他账户
+    所有账户共用llm（同一个令牌桶和并发上限），返回失败的账户名列表
+    """
+    workers = max(1, min(config['account_workers'], len(accounts)))
+    print(f"多账户模式: {len(accounts)} 个账户, {workers} 个工作线程")
 
+    def process(account):
+        start = time.perf_counter()
+        try:
+            run = run_range if config['date_range'] else run_account
+            ok, count = run(config, account, llm, stores, fetcher_class, sender_class)
+            error = None if ok else '获取或发送失败'
+        except Exception as e:
+            ok, count, error = False, 0, str(e)
+            print(f"✗ 账户 {account['name']} 处理出错: {error}")
+        metrics.record_account(account['name'], ok, count, time.perf_counter() - start, error)
+        return ok
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(process, accounts))
+
+    print()
+    print("=" * 70)
+    for account, ok in zip(accounts, results):
+        result = metrics.accounts[account['name']]
+        status = "✓" if ok else "✗"
+        detail = f"{result['emails']} 封邮件, {result['seconds']:.1f} 秒"
+        if result['error']:
+            detail += f", {result['error']}"
+        print(f"{status} {account['name']} → {account['recipient_email']}: {detail}")
+    print("=" * 70)
+    return [account['name'] for account, ok in zip(accounts, results) if not ok]
+
+
+def run_daemon(config, account, llm, stores, fetcher_class=QQEmailFetcher, sender_class=QQEmailSender):
+    """
+    守护模式：保持IMAP连接监听INBOX，新邮件到达时预先摘要，每天在DIGEST_SEND_TIME组装并发送报告
+    SIGINT / SIGTERM 时结束当前IDLE并退出
+    """
+    fetcher = fetcher_class(account['qq_email'], account['qq_auth_code'], state_store=stores['state_store'],
+                            message_cache=stores['message_cache'], html_budget=config['html_budget'],
+                            archive=stores['archive'])
+    clusterer = None
+    if config['dedup_max_distance'] > 0:
+        clusterer = NearDuplicateClusterer(config['dedup_max_distance'])
+
+    # 守护进程在整个运行期间复用一个投递引擎，SMTP连接在每次发送后断开
+    engine = DeliveryEngine(sender_class(account['qq_email'], account['qq_auth_code']), stores['delivery_queue'])
+
+    def send_report(report):
         try:
             subject = f"📧 每日邮件摘要 - {datetime.now().strftime('%Y年%m月%d日')}"
-            success = sender.send_email(
-                to_email=config['recipient_email'],
-                subject=subject,
-                content=summary_report,
-                content_type='html'
-            )
-
-            if success:
-                print()
-                print("=" * 70)
-                print("✅ 任务完成！")
-                print(f"✓ 分析了 {len(emails)} 封邮件")
-                print(f"✓ 摘要报告已发送到: {config['recipient_email']}")
-                print("=" * 70)
-                return 0
-            else:
-                print("✗ 邮件发送失败")
-                return 1
+            result = engine.send(parse_recipients(account['recipient_email']), subject, report)
+        finally:
+            engine.close()
+        success = bool(result['sent'] or result['queued'])
+        # 每期导出一次运行指标，然后重新计数
+        metrics.print_summary()
+        metrics.export(config['metrics_json'], config['metrics_prom'], success=success)
+        if success:
+            metrics.reset()
+        return success
 
+    def retry_deliveries():
+        try:
+            return engine.retry_pending()
         finally:
-            sender.disconnect()
+            engine.close()
+
+    daemon = DigestDaemon(
+        fetcher, GeminiSummarizer(**create_summarizer_options(config, llm, stores)), send_report,
+        send_time=config['digest_send_time'],
+        compactor=BodyCompactor() if config['prompt_compaction'] else None,
+        clusterer=clusterer,
+        idle_timeout=config['idle_timeout'],
+        poll_interval=config['poll_interval'],
+        retry_deliveries=retry_deliveries if stores['delivery_queue'] is not None else None,
+    )
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: daemon.stop())
+    daemon.run()
+    llm.print_stats()
+    return 0
+
+
+def main(argv=None):
+    """主函数"""
+    args = parse_args(argv)
+    print("=" * 70)
+    print("📧 每日邮件自动摘要系统")
+    print("=" * 70)
+    print(f"运行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print()
+
+    metrics.reset()
+    config = None
+    try:
+        # 1. 加载配置
+        print("【步骤 1/4】加载配置...")
+        config = load_env_config(no_llm=args.no_llm, dry_run=args.dry_run, dry_run_output=args.output,
+                                 date_range=args.date_range)
+        # 各模块的进度输出走logging，LOG_LEVEL=WARNING 时获取循环不输出任何内容
+        logging.basicConfig(level=config['log_level'], format='%(message)s', stream=sys.stdout)
+        accounts = load_accounts(config['accounts_file']) if config['accounts_file'] else None
+        print(f"✓ 配置加载成功")
+        if accounts:
+            print(f"  - 账户文件: {config['accounts_file']}（{len(accounts)} 个账户）")
+        else:
+            print(f"  - QQ邮箱: {config['qq_email']}")
+            print(f"  - 收件人: {config['recipient_email']}")
+        if config['date_range']:
+            start, end = config['date_range']
+            print(f"  - 报告区间: {start} ~ {end}（{range_title(start, end)}）")
+        if config['no_llm']:
+            print("  - AI: 不调用（关键词报告）" + ("，试运行不发送" if config['dry_run'] else ""))
+        else:
+            print(f"  - LLM后端: {config['llm_backend']}")
+        stores = create_stores(config)
+        # 后端的SDK在第一次调用AI时才导入
+        llm = None if config['no_llm'] else create_llm(config)
+        print()
+
+        if accounts:
+            failed = run_accounts(config, accounts, llm, stores)
+            if llm is not None:
+                llm.print_stats()
+            if failed:
+                print(f"✗ {len(failed)}/{len(accounts)} 个账户失败: {', '.join(failed)}")
+                return 1
+            print(f"✅ 任务完成！{len(accounts)} 个账户的摘要均已{'生成' if config['dry_run'] else '发送'}")
+            return 0
+
+        account = {'name': config['qq_email'], 'qq_email': config['qq_email'],
+                   'qq_auth_code': config['qq_auth_code'], 'recipient_email': config['recipient_email']}
+        if config['daemon_mode']:
+            return run_daemon(config, account, llm, stores)
+
+        run = run_range if config['date_range'] else run_account
+        ok, count = run(config, account, llm, stores)
+        if llm is not None:
+            llm.print_stats()
+        if not ok:
+            return 1
+
+        print()
+        print("=" * 70)
+        print("✅ 任务完成！")
+        print(f"✓ 分析了 {count} 封邮件")
+        if not config['dry_run']:
+            print(f"✓ 摘要报告已发送到: {config['recipient_email']}")
+        print("=" * 70)
+        return 0
 
     except ValueError as e:
         print(f"✗ 配置错误: {str(e)}")
@@ -99,6 +480,15 @@ def main():
         import traceback
         traceback.print_exc()
         return 1
+    finally:
+        # 守护模式在每期发送后导出；试运行不导出，避免覆盖正式运行的结果
+        if config is not None and not config['daemon_mode'] and not config['dry_run']:
+            metrics.print_summary()
+            if metrics.accounts:
+                success = all(result['success'] for result in metrics.accounts.values())
+            else:
+                success = metrics.counters.get('reports_sent', 0) > 0
+            metrics.export(config['metrics_json'], config['metrics_prom'], success=success)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件内容缓存
+按 (账号, 文件夹, UIDVALIDITY, UID) 在本地保存头部和已提取的正文，带容量上限和LRU淘汰
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+
+
+logger = logging.getLogger(__name__)
+
+
+class MessageCache:
+    """基于SQLite的邮件缓存，内容使用zlib压缩"""
+
+    DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+    # SQLite单条语句的参数数量有限，按批查询
+    QUERY_CHUNK = 500
+
+    def __init__(self, db_path, max_bytes=None):
+        """打开或创建缓存数据库，max_bytes为压缩后总大小上限"""
+        self.db_path = db_path
+        self.max_bytes = max_bytes or self.DEFAULT_MAX_BYTES
+        # 连接池的工作线程共享同一个实例，用锁串行化访问
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(messages)')]
+        if columns and 'html_budget' not in columns:
+            # 旧版本的条目没有记录HTML提取上限，无法判断能否复用，直接清空（只是缓存）
+            self.conn.execute('DROP TABLE messages')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS messages (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                uid INTEGER NOT NULL,
+                body_limit INTEGER,
+                html_budget INTEGER,
+                header BLOB NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (account, folder, uidvalidity, uid)
+            );
+            CREATE INDEX IF NOT EXISTS idx_messages_last_access ON messages (last_access);
+        """)
+        self.conn.commit()
+        self.reset_stats()
+
+    def get_many(self, account, folder, uidvalidity, uids, body_limit=None, html_budget=None):
+        """
+        批量读取缓存，返回 {uid: (头部字节, 正文文本)}
+        正文截断长度（body_limit）或HTML提取上限（html_budget）比这次要求的小的条目视为未命中
+        """
+        uids = list(uids)
+        found = {}
+        now = time.time()
+        with self.lock:
+            for start in range(0, len(uids), self.QUERY_CHUNK):
+                chunk = uids[start:start + self.QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f"""
+                    SELECT uid, body_limit, html_budget, header, body FROM messages
+                    WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid IN ({placeholders})
+                    """,
+                    (account, folder, uidvalidity, *chunk)
+                ).fetchall()
+                for uid, cached_limit, cached_budget, header, body in rows:
+                    if not self._covers(cached_limit, body_limit) or not self._covers(cached_budget, html_budget):
+                        continue
+                    header = zlib.decompress(header)
+                    body = zlib.decompress(body).decode('utf-8')
+                    found[uid] = (header, body)
+                    self.bytes_saved += len(header) + len(body.encode('utf-8'))
+
+            if found:
+                self.conn.executemany(
+                    """
+                    UPDATE messages SET last_access = ?
+                    WHERE account = ? AND folder = ? AND uidvalidity = ? AND uid = ?
+                    """,
+                    [(now, account, folder, uidvalidity, uid) for uid in found]
+                )
+                self.conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(uids) - len(found)
+        return found
+
+    @staticmethod
+    def _covers(cached, requested):
+        """缓存时的上限（None表示不限制）是否不小于这次要求的上限"""
+        return cached is None or (requested is not None and cached >= requested)
+
+    def put_many(self, account, folder, uidvalidity, entries, body_limit=None, html_budget=None):
+        """在一个事务中写入 [(uid, 头部字节, 正文文本)]，然后按容量淘汰"""
+        now = time.time()
+        rows = []
+        for uid, header, body in entries:
+            header = zlib.compress(header)
+            body = zlib.compress(body.encode('utf-8'))
+            rows.append((account, folder, uidvalidity, uid, body_limit, html_budget,
+                         header, body, len(header) + len(body), now))
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany(
+                """
+                INSERT OR REPLACE INTO messages
+                    (account, folder, uidvalidity, uid, body_limit, html_budget, header, body, size, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                rows
+            )
+            self.conn.commit()
+            self._evict_locked()
+
+    def evict(self):
+        """超过容量上限时按最近访问时间淘汰最旧的条目"""
+        with self.lock:
+            return self._evict_locked()
+
+    def _evict_locked(self):
+        """淘汰逻辑，调用方需持有锁"""
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM messages').fetchone()[0]
+        if total <= self.max_bytes:
+            return 0
+
+        removed = []
+        cursor = self.conn.execute(
+            'SELECT rowid, size FROM messages ORDER BY last_access ASC'
+        )
+        for rowid, size in cursor:
+            if total <= self.max_bytes:
+                break
+            removed.append((rowid,))
+            total -= size
+        self.conn.executemany('DELETE FROM messages WHERE rowid = ?', removed)
+        self.conn.commit()
+        return len(removed)
+
+    def reset_stats(self):
+        """重置命中统计"""
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def print_stats(self):
+        """输出缓存命中情况"""
+        logger.info(f"  缓存统计: 命中 {self.hits} 封, 未命中 {self.misses} 封, "
+                    f"节省约 {self.bytes_saved / 1024:.1f} KB")
+
+    def close(self):
+        """关闭数据库"""
+        self.conn.close()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+记录各阶段耗时（连接、搜索、获取、解析、正文提取、提示词构建、AI调用、渲染、发送）和计数
+（邮件数、字节数、token数、重试次数），运行结束时导出为JSON报告和Prometheus textfile
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+logger = logging.getLogger(__name__)
+
+
+# Prometheus 指标名前缀
+METRIC_PREFIX = 'email_digest'
+# 各阶段的输出顺序，未列出的阶段排在后面
+STAGES = ('imap_connect', 'search', 'fetch', 'parse', 'body_extraction', 'prompt_build',
+          'llm_call', 'render', 'smtp_connect', 'send')
+
+
+def _label(value):
+    """Prometheus标签值转义"""
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RunMetrics:
+    """单次运行的阶段计时和计数器，多个线程可以同时记录（各线程的耗时累加）"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空所有指标，重新开始计时"""
+        with self.lock:
+            self.started = time.time()
+            self.timers = {}
+            self.counters = {}
+            self.accounts = {}
+
+    def observe(self, stage, seconds):
+        """记录某阶段的一次耗时"""
+        with self.lock:
+            total, calls = self.timers.get(stage, (0.0, 0))
+            self.timers[stage] = (total + seconds, calls + 1)
+
+    @contextmanager
+    def timer(self, stage):
+        """计时上下文：with metrics.timer('fetch'): ..."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def timed(self, stage):
+        """计时装饰器"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(stage):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, value=1):
+        """累加计数器"""
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def record_account(self, name, success, emails=0, seconds=0.0, error=None):
+        """多账户模式下记录单个账户的结果"""
+        with self.lock:
+            self.accounts[name] = {'success': success, 'emails': emails,
+                                   'seconds': round(seconds, 3), 'error': error}
+
+    def _ordered_stages(self):
+        order = {stage: i for i, stage in enumerate(STAGES)}
+        return sorted(self.timers, key=lambda stage: (order.get(stage, len(order)), stage))
+
+    def report(self, success=None):
+        """返回可序列化为JSON的运行报告"""
+        with self.lock:
+            report = {
+                'started': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+                'duration_seconds': round(time.time() - self.started, 3),
+                'success': success,
+                'stages': {stage: {'seconds': round(self.timers[stage][0], 4), 'calls': self.timers[stage][1]}
+                           for stage in self._ordered_stages()},
+                'counters': dict(sorted(self.counters.items())),
+            }
+            if self.accounts:
+                report['accounts'] = {name: dict(result) for name, result in self.accounts.items()}
+            return report
+
+    def prometheus_text(self, success=None):
+        """生成node_exporter textfile收集器格式的指标"""
+        report = self.report(success)
+        lines = [
+            f'# HELP {METRIC_PREFIX}_stage_seconds Time spent in each stage during the last run.',
+            f'# TYPE {METRIC_PREFIX}_stage_seconds gauge',
+        ]
+        lines += [f'{METRIC_PREFIX}_stage_seconds{{stage="{stage}"}} {values["seconds"]}'
+                  for stage, values in report['stages'].items()]
+        lines += [
+            f'# HELP {METRIC_PREFIX}_stage_calls Number of timed calls per stage during the last run.',
+            f'# TYPE {METRIC_PREFIX}_stage_calls gauge',
+        ]
+        lines += [f'{METRIC_PREFIX}_stage_calls{{stage="{stage}"}} {values["calls"]}'
+                  for stage, values in report['stages'].items()]
+        for name, value in report['counters'].items():
+            lines.append(f'# TYPE {METRIC_PREFIX}_{name} gauge')
+            lines.append(f'{METRIC_PREFIX}_{name} {value}')
+        accounts = report.get('accounts', {})
+        for field in ('success', 'emails', 'seconds') if accounts else ():
+            lines.append(f'# TYPE {METRIC_PREFIX}_account_{field} gauge')
+            lines += [f'{METRIC_PREFIX}_account_{field}{{account="{_label(name)}"}} {int(result[field]) if field == "success" else result[field]}'
+                      for name, result in accounts.items()]
+        lines += [
+            f'# TYPE {METRIC_PREFIX}_run_duration_seconds gauge',
+            f'{METRIC_PREFIX}_run_duration_seconds {report["duration_seconds"]}',
+            f'# TYPE {METRIC_PREFIX}_last_run_timestamp_seconds gauge',
+            f'{METRIC_PREFIX}_last_run_timestamp_seconds {int(self.started)}',
+        ]
+        if success is not None:
+            lines += [f'# TYPE {METRIC_PREFIX}_last_run_success gauge',
+                      f'{METRIC_PREFIX}_last_run_success {int(bool(success))}']
+        return '\n'.join(lines) + '\n'
+
+    def _write(self, path, text):
+        """先写临时文件再替换，避免收集器读到写了一半的文件"""
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(temp_path, path)
+
+    def export(self, json_path=None, prom_path=None, success=None):
+        """导出JSON报告和/或Prometheus textfile，失败时只输出警告"""
+        try:
+            if json_path:
+                self._write(json_path, json.dumps(self.report(success), ensure_ascii=False, indent=2) + '\n')
+                logger.info(f"✓ 运行报告已写入: {json_path}")
+            if prom_path:
+                self._write(prom_path, self.prometheus_text(success))
+                logger.info(f"✓ Prometheus指标已写入: {prom_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠ 导出运行指标失败: {str(e)}")
+            return False
+
+    def print_summary(self):
+        """输出各阶段耗时和主要计数"""
+        report = self.report()
+        if not report['stages']:
+            return
+        stages = ', '.join(f"{stage} {values['seconds']:.2f}s" for stage, values in report['stages'].items())
+        logger.info(f"  阶段耗时: {stages}")
+        if report['counters']:
+            counters = ', '.join(f"{name}={value}" for name, value in report['counters'].items())
+            logger.info(f"  计数: {counters}")
+
+
+# 进程内共享的指标，各模块直接记录，由main在运行结束时导出
+metrics = RunMetrics()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MIME部分工具
+解析IMAP BODYSTRUCTURE，挑选正文段落，并自行处理传输编码和字符集
+"""
+
+import base64
+import binascii
+from collections import namedtuple
+
+
+BodyPart = namedtuple('BodyPart', ['section', 'content_type', 'charset', 'encoding', 'size', 'disposition'])
+
+# 常见中文字符集统一到超集，避免生僻字解码失败
+_CHARSET_ALIASES = {
+    'utf': 'utf-8',
+    'utf8': 'utf-8',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+    'x-gbk': 'gb18030',
+}
+
+
+def _text(value):
+    """BODYSTRUCTURE中的字符串统一转为小写str"""
+    if value is None:
+        return ''
+    if isinstance(value, bytes):
+        value = value.decode('ascii', errors='ignore')
+    return str(value).lower()
+
+
+def _params(value):
+    """把 (key value key value) 参数列表转为字典"""
+    if not isinstance(value, list):
+        return {}
+    return {_text(value[i]): _text(value[i + 1]) for i in range(0, len(value) - 1, 2)}
+
+
+def _disposition(value):
+    if isinstance(value, list) and value:
+        return _text(value[0])
+    return ''
+
+
+def parse_bodystructure(structure, section=''):
+    """把BODYSTRUCTURE嵌套列表展开为叶子部分列表（不进入附带的message/rfc822）"""
+    if not isinstance(structure, list) or not structure:
+        return []
+
+    if isinstance(structure[0], list):
+        # multipart: 子部分列表后跟子类型
+        parts = []
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            child_section = f'{section}.{index}' if section else str(index)
+            parts.extend(parse_bodystructure(child, child_section))
+        return parts
+
+    maintype = _text(structure[0])
+    subtype = _text(structure[1]) if len(structure) > 1 else ''
+    params = _params(structure[2]) if len(structure) > 2 else {}
+    encoding = _text(structure[5]) if len(structure) > 5 else ''
+    try:
+        size = int(structure[6]) if len(structure) > 6 else 0
+    except (TypeError, ValueError):
+        size = 0
+
+    # 扩展字段位置：text多一个行数，message/rfc822多信封、结构和行数
+    if maintype == 'text':
+        disposition_index = 9
+    elif maintype == 'message' and subtype == 'rfc822':
+        disposition_index = 11
+    else:
+        disposition_index = 8
+    disposition = ''
+    if len(structure) > disposition_index:
+        disposition = _disposition(structure[disposition_index])
+
+    return [BodyPart(
+        section=section or '1',
+        content_type=f'{maintype}/{subtype}',
+        charset=params.get('charset', ''),
+        encoding=encoding,
+        size=size,
+        disposition=disposition,
+    )]
+
+
+def select_text_parts(parts):
+    """挑选正文部分：优先text/plain，没有时使用text/html，跳过附件"""
+    candidates = [part for part in parts if part.disposition != 'attachment']
+    plain = [part for part in candidates if part.content_type == 'text/plain']
+    if plain:
+        return plain
+    return [part for part in candidates if part.content_type == 'text/html']
+
+
+def decode_transfer(data, encoding):
+    """处理传输编码，兼容部分获取导致的截断内容"""
+    encoding = (encoding or '').lower()
+    if encoding == 'base64':
+        data = b''.join(data.split())
+        data = data[:len(data) - len(data) % 4]
+        try:
+            return base64.b64decode(data)
+        except (binascii.Error, ValueError):
+            return b''
+    if encoding == 'quoted-printable':
+        return binascii.a2b_qp(data)
+    return data
+
+
+def decode_text(payload, charset):
+    """按字符集解码正文，失败时回退到utf-8"""
+    charset = _CHARSET_ALIASES.get((charset or '').lower(), charset or 'utf-8')
+    try:
+        return payload.decode(charset, errors='ignore')
+    except LookupError:
+        return payload.decode('utf-8', errors='ignore')
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相似邮件聚类
+用SimHash给主题和规范化后的正文计算指纹，把CI告警、订单更新等几乎相同的邮件合并为一组
+"""
+
+import functools
+import hashlib
+import logging
+import re
+
+from email_record import body_prefix
+
+
+logger = logging.getLogger(__name__)
+
+
+_URL_RE = re.compile(r'https?://\S+', re.IGNORECASE)
+_DIGITS_RE = re.compile(r'\d+')
+_HEX_RE = re.compile(r'\b[0-9a-f]{7,40}\b')
+
+FINGERPRINT_BITS = 64
+
+
+def normalize_text(text):
+    """去掉链接、把数字和提交哈希统一替换，压缩空白并转小写"""
+    text = _URL_RE.sub(' ', text.lower())
+    text = _HEX_RE.sub('#', text)
+    text = _DIGITS_RE.sub('0', text)
+    return ' '.join(text.split())
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _shingle_hash(item):
+    """shingle的64位哈希；内置hash()每个进程随机加盐，指纹需要跨进程稳定，常见shingle在邮件之间大量重复"""
+    return int.from_bytes(hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text, shingle=3):
+    """计算文本的64位SimHash（字符shingle，不加权）"""
+    if len(text) <= shingle:
+        shingles = {text}
+    else:
+        shingles = {text[i:i + shingle] for i in range(len(text) - shingle + 1)}
+    # 按位统计：把每个哈希格式化为二进制串后按列计数，计数在C层完成
+    rows = [format(_shingle_hash(item), '064b') for item in shingles]
+    threshold = len(rows) / 2
+    fingerprint = 0
+    for column in zip(*rows):
+        fingerprint = (fingerprint << 1) | (column.count('1') > threshold)
+    return fingerprint
+
+
+def hamming_distance(a, b):
+    """两个指纹之间不同的位数"""
+    return bin(a ^ b).count('1')
+
+
+class Cluster:
+    """一组相似邮件：第一封作为代表，记录数量和时间范围"""
+
+    __slots__ = ('leader', 'fingerprint', 'count', 'first', 'last', 'index')
+
+    def __init__(self, leader, fingerprint, index):
+        self.leader = leader
+        self.fingerprint = fingerprint
+        self.count = 1
+        self.first = self.last = leader.get('parsed_date', '')
+        self.index = index
+
+    def add(self, email_info):
+        self.count += 1
+        date = email_info.get('parsed_date', '')
+        if date:
+            self.first = min(self.first, date) if self.first else date
+            self.last = max(self.last, date)
+
+    def annotate(self):
+        """把数量和时间范围写入代表邮件"""
+        if self.count > 1:
+            self.leader['cluster_size'] = self.count
+            self.leader['cluster_first'] = self.first
+            self.leader['cluster_last'] = self.last
+        return self.leader
+
+
+class NearDuplicateClusterer:
+    """
+    在线聚类：指纹与已有某组的代表相差不超过max_distance位时并入该组
+    按鸽巢原理把指纹切成 max_distance+1 段，只和至少一段完全相同的组比较
+    """
+
+    DEFAULT_MAX_DISTANCE = 3
+    # 参与指纹计算的正文字符数
+    BODY_CHARS = 1000
+
+    def __init__(self, max_distance=None):
+        self.max_distance = self.DEFAULT_MAX_DISTANCE if max_distance is None else max_distance
+        bands = self.max_distance + 1
+        self.band_bits = FINGERPRINT_BITS // bands
+        self.band_count = bands
+        self.reset()
+
+    def reset(self):
+        """清空已有的分组"""
+        self.clusters = []
+        self._bands = [{} for _ in range(self.band_count)]
+        self.emails = 0
+
+    def fingerprint(self, email_info):
+        """主题和正文开头的指纹"""
+        subject = normalize_text(email_info.get('subject') or '')
+        body = normalize_text(body_prefix(email_info, self.BODY_CHARS))
+        return simhash(f'{subject}\n{body}')
+
+    def _band_keys(self, fingerprint):
+        mask = (1 << self.band_bits) - 1
+        return [(fingerprint >> (band * self.band_bits)) & mask for band in range(self.band_count)]
+
+    def add(self, email_info):
+        """加入一封邮件，返回 (所属分组, 是否新建了分组)"""
+        self.emails += 1
+        fingerprint = self.fingerprint(email_info)
+        keys = self._band_keys(fingerprint)
+
+        seen = set()
+        for band, key in enumerate(keys):
+            for cluster in self._bands[band].get(key, ()):
+                if id(cluster) in seen:
+                    continue
+                seen.add(id(cluster))
+                if hamming_distance(cluster.fingerprint, fingerprint) <= self.max_distance:
+                    cluster.add(email_info)
+                    return cluster, False
+
+        cluster = Cluster(email_info, fingerprint, len(self.clusters))
+        self.clusters.append(cluster)
+        for band, key in enumerate(keys):
+            self._bands[band].setdefault(key, []).append(cluster)
+        return cluster, True
+
+    def collapse(self, emails):
+        """把一组邮件合并为各组的代表邮件（保持首次出现的顺序）"""
+        self.reset()
+        for email_info in emails:
+            self.add(email_info)
+        return [cluster.annotate() for cluster in self.clusters]
+
+    def print_stats(self):
+        """输出合并情况"""
+        merged = [cluster for cluster in self.clusters if cluster.count > 1]
+        if not merged:
+            return
+        logger.info(f"  相似邮件合并: {self.emails} 封 → {len(self.clusters)} 组"
+                    f"（{len(merged)} 组包含多封，共合并 {self.emails - len(self.clusters)} 封）")
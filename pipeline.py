@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式摘要流水线
+获取 → 正文解码（和压缩） → 相似邮件合并，各阶段在独立线程中运行，阶段之间使用有界队列
+全部邮件到齐后与普通模式共用同一个提示词构建和预算分配，生成的提示词完全相同
+"""
+
+import logging
+import queue
+import threading
+
+from email_record import body_prefix
+
+
+logger = logging.getLogger(__name__)
+
+
+_DONE = object()
+
+
+class _StageError:
+    """上游阶段的异常，沿队列传给下游"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+class DigestPipeline:
+    """把QQEmailFetcher和GeminiSummarizer串成流水线，内存占用由队列深度决定而不是邮箱大小"""
+
+    def __init__(self, fetcher, summarizer, queue_size=64, compactor=None, clusterer=None):
+        """
+        fetcher: 已连接的QQEmailFetcher
+        summarizer: GeminiSummarizer
+        queue_size: 每个阶段之间的队列长度
+        compactor: BodyCompactor，在解码阶段压缩正文
+        clusterer: NearDuplicateClusterer，相似邮件只保留代表邮件
+        """
+        self.fetcher = fetcher
+        self.summarizer = summarizer
+        self.queue_size = queue_size
+        self.compactor = compactor
+        self.clusterer = clusterer
+        self.emails = []
+        self.email_count = 0
+
+    def _stage(self, func, source, target):
+        """从source取数据，处理后放入target；source为None时func本身是生成器"""
+        try:
+            if source is None:
+                for item in func():
+                    target.put(item)
+            else:
+                while True:
+                    item = source.get()
+                    if item is _DONE or isinstance(item, _StageError):
+                        target.put(item)
+                        return
+                    target.put(func(item))
+        except Exception as e:
+            target.put(_StageError(e))
+            return
+        target.put(_DONE)
+
+    def _start(self, func, source):
+        target = queue.Queue(maxsize=self.queue_size)
+        thread = threading.Thread(target=self._stage, args=(func, source, target), daemon=True)
+        thread.start()
+        return target
+
+    def run(self, folder='INBOX'):
+        """
+        运行流水线，返回摘要报告HTML
+        self.emails 保存合并后的代表邮件（正文只保留提示词会读到的部分），self.email_count 是合并前的邮件数
+        """
+        # 提示词、路由和指纹最多读取的正文长度，之后的部分不再保留
+        body_chars = self.summarizer.prompt_body_chars()
+        if self.clusterer is not None:
+            body_chars = max(body_chars, self.clusterer.BODY_CHARS)
+
+        def parse(item):
+            # 正文解码和HTML转文本
+            folder_name, uidvalidity, uid, info, raw = item
+            email_info = self.fetcher.build_email(folder_name, uidvalidity, uid, info, raw)
+            if self.compactor is not None:
+                email_info = self.compactor.compact(email_info)
+            return email_info
+
+        def prepare(email_info):
+            trimmed = email_info.copy(body=body_prefix(email_info, body_chars))
+            if self.summarizer.summary_cache is not None:
+                # 摘要缓存键需要完整正文，在截断前计算
+                trimmed['summary_key'] = self.summarizer.summary_key(email_info)
+            if self.clusterer is not None:
+                _, is_new = self.clusterer.add(trimmed)
+                if not is_new:
+                    return None
+            return trimmed
+
+        if self.clusterer is not None:
+            self.clusterer.reset()
+        fetched = self._start(lambda: self.fetcher.iter_today_raw(folder), None)
+        parsed = self._start(parse, fetched)
+        prepared = self._start(prepare, parsed)
+
+        self.emails = []
+        self.email_count = 0
+        while True:
+            item = prepared.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _StageError):
+                raise item.error
+            self.email_count += 1
+            if item is not None:
+                self.emails.append(item)
+
+        self.fetcher.flush_cache()
+        logger.info(f"✓ 找到 {self.email_count} 封今天的邮件")
+        if self.clusterer is not None:
+            self.emails = [cluster.annotate() for cluster in self.clusterer.clusters]
+            self.clusterer.print_stats()
+        self.fetcher.print_stats()
+        if self.compactor is not None:
+            self.compactor.print_stats()
+        # 与普通模式相同：按全部邮件分配正文预算后构建提示词
+        return self.summarizer.summarize_emails(self.emails)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+提示词预算
+估算token数，按邮件重要性把提示词预算分配给各封邮件，并在句子或段落边界截断正文
+"""
+
+import logging
+import re
+
+from email_record import body_prefix
+
+
+logger = logging.getLogger(__name__)
+
+
+# 截断时优先在段落边界，其次在句子边界切开
+_PARAGRAPH_RE = re.compile(r'\n\s*\n|\n')
+_SENTENCE_RE = re.compile(r'[。！？；!?;]|\.(?=\s)')
+
+# 权重信号：发件人或主题中出现这些词时调整权重
+LOW_PRIORITY_SENDERS = ('noreply', 'no-reply', 'newsletter', 'marketing', 'promo', 'notice', 'edm', 'mailer')
+HIGH_PRIORITY_WORDS = ('账单', '欠费', '到期', '缴费', '验证码', '登录异常', '紧急', '会议', '截止', '面试', '合同',
+                       'bill', 'payment', 'urgent', 'deadline', 'invoice', 'security', 'meeting')
+LOW_PRIORITY_WORDS = ('优惠', '促销', '折扣', '限时', '特价', '秒杀', '福利', '推荐', '订阅',
+                      'sale', 'offer', 'discount', 'promotion', 'newsletter', 'digest')
+REPLY_PREFIXES = ('re:', 're：', '回复', '答复', 'fw:', 'fwd:', '转发')
+
+
+def estimate_tokens(text):
+    """粗略估算token数：中文等非ASCII字符约1个token，ASCII字符约4个一个token"""
+    ascii_chars = len(text.encode('ascii', errors='ignore'))
+    return len(text) - ascii_chars + ascii_chars // 4 + 1
+
+
+def truncate_to_tokens(text, max_tokens):
+    """把文本截断到max_tokens以内，尽量在段落或句子边界切开"""
+    if not text or estimate_tokens(text) <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return ""
+
+    # 二分查找不超过预算的最长前缀
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    prefix = text[:low]
+
+    # 边界不能太靠前，否则丢掉的内容比按字符截断还多
+    floor = int(len(prefix) * 0.6)
+    for pattern in (_PARAGRAPH_RE, _SENTENCE_RE):
+        cut = None
+        for match in pattern.finditer(prefix, floor):
+            cut = match.end()
+        if cut:
+            return prefix[:cut].rstrip()
+    return prefix.rstrip()
+
+
+def email_weight(email_info):
+    """根据发件人、主题和回复关系估算邮件的重要性权重"""
+    sender = (email_info.get('from') or '').lower()
+    subject = (email_info.get('subject') or '').lower()
+
+    weight = 1.0
+    if any(word in sender for word in LOW_PRIORITY_SENDERS):
+        weight *= 0.5
+    if any(word in subject or word in sender for word in HIGH_PRIORITY_WORDS):
+        weight *= 2.0
+    elif any(word in subject for word in LOW_PRIORITY_WORDS):
+        weight *= 0.5
+    if subject.startswith(REPLY_PREFIXES):
+        # 往来邮件通常需要回复
+        weight *= 1.5
+    return weight
+
+
+class BudgetAllocator:
+    """把正文的token预算按权重分给各封邮件，用不完的份额再分给还需要的邮件"""
+
+    DEFAULT_TOTAL_TOKENS = 30000
+    DEFAULT_MIN_TOKENS = 150
+    DEFAULT_MAX_TOKENS = 6000
+
+    def __init__(self, total_tokens=None, min_tokens=None, max_tokens=None):
+        """
+        total_tokens: 所有邮件正文的总预算
+        min_tokens: 每封邮件至少保留的token数（邮件很多时总量可能超过预算）
+        max_tokens: 单封邮件最多使用的token数
+        """
+        self.total_tokens = total_tokens or self.DEFAULT_TOTAL_TOKENS
+        self.min_tokens = min_tokens or self.DEFAULT_MIN_TOKENS
+        self.max_tokens = max_tokens or self.DEFAULT_MAX_TOKENS
+        self.last_report = None
+
+    def allocate(self, emails):
+        """返回每封邮件的正文token预算列表，并记录本次分配情况"""
+        # 每个token至少对应1/4个字符，超过 4*max_tokens 的部分不影响结果，不必解压
+        needs = [min(estimate_tokens(body_prefix(email_info, self.max_tokens * 4)), self.max_tokens)
+                 for email_info in emails]
+        weights = [email_weight(email_info) for email_info in emails]
+        budgets = [min(need, self.min_tokens) for need in needs]
+
+        # 按权重分配剩余预算，满足需求的邮件退出，多出的份额在下一轮重新分配
+        remaining = self.total_tokens - sum(budgets)
+        active = [i for i, need in enumerate(needs) if budgets[i] < need]
+        while remaining > 0 and active:
+            total_weight = sum(weights[i] for i in active)
+            spent = 0
+            for i in active:
+                share = int(remaining * weights[i] / total_weight)
+                grant = min(share, needs[i] - budgets[i])
+                budgets[i] += grant
+                spent += grant
+            if spent == 0:
+                break
+            remaining -= spent
+            active = [i for i in active if budgets[i] < needs[i]]
+
+        self.last_report = {
+            'emails': len(emails),
+            'total_tokens': self.total_tokens,
+            'needed': sum(needs),
+            'used': sum(budgets),
+            'truncated': sum(1 for budget, need in zip(budgets, needs) if budget < need),
+            'high_weight': sum(1 for weight in weights if weight > 1),
+            'low_weight': sum(1 for weight in weights if weight < 1),
+        }
+        return budgets
+
+    def print_report(self):
+        """输出本次预算的使用情况，用于权衡成本和延迟"""
+        report = self.last_report
+        if not report or not report['emails']:
+            return
+        usage = report['used'] / report['total_tokens'] * 100
+        logger.info(f"  提示词预算: 正文使用 {report['used']}/{report['total_tokens']} token ({usage:.0f}%), "
+                    f"原文约 {report['needed']} token, {report['truncated']}/{report['emails']} 封被截断, "
+                    f"高权重 {report['high_weight']} 封, 低权重 {report['low_weight']} 封")
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周报、月报
+每天的邮件先生成一份结构化的每日摘要（每天一次AI调用）并保存，报告由这些每日摘要合并生成（一次AI调用）；
+已保存每日摘要的日期不再获取邮件，也不再调用AI
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_date_range(period=None, since=None, until=None, today=None):
+    """
+    把 --period / --since / --until 转换为 (开始日期, 结束日期)，都没有指定时返回None
+    截止日期默认为昨天（今天的邮件还不完整）；week 为截止日期及之前共7天，month 为30天
+    """
+    if period is None and since is None:
+        if until is not None:
+            raise ValueError("--until 需要与 --since 或 --period 一起使用")
+        return None
+    if period is not None and since is not None:
+        raise ValueError("--period 和 --since 不能同时使用")
+    today = today or datetime.now().date()
+    end = until or today - timedelta(days=1)
+    start = since or end - timedelta(days=6 if period == 'week' else 29)
+    if start > end:
+        raise ValueError(f"开始日期 {start} 晚于截止日期 {end}")
+    return start, end
+
+
+def range_title(start, end):
+    """报告标题：7天为周报，28天以上为月报"""
+    days = (end - start).days + 1
+    if days == 7:
+        return '每周邮件摘要'
+    if days >= 28:
+        return '每月邮件摘要'
+    return f'{days}天邮件摘要'
+
+
+def day_runs(days):
+    """把日期列表合并为连续的区间 [(开始日期, 结束日期)]，每个区间只需要一次IMAP搜索"""
+    runs = []
+    for day in sorted(days):
+        if runs and day - runs[-1][1] == timedelta(days=1):
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return [tuple(run) for run in runs]
+
+
+def empty_day_summary():
+    """没有邮件的日期的摘要，不调用AI"""
+    return {'count': 0, 'overview': '没有收到邮件', 'highlights': []}
+
+
+class RangeDigest:
+    """分两级生成多日报告：邮件 → 每日摘要（保存在DailySummaryStore）→ 周报或月报"""
+
+    def __init__(self, summarizer, store=None, account='', use_llm=True, max_concurrency=4):
+        """
+        summarizer: GeminiSummarizer，提供每日摘要和合并报告的提示词
+        store: DailySummaryStore，None 表示不保存，每次都重新生成所有日期的摘要
+        account: 每日摘要按账号保存
+        use_llm: False 时按关键词生成每日摘要并在本地组装报告，不读写store
+        max_concurrency: 同时生成的每日摘要数
+        """
+        self.summarizer = summarizer
+        self.store = store
+        self.account = account
+        self.use_llm = use_llm
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.reset_stats()
+
+    def reset_stats(self):
+        """重置统计"""
+        self.saved = 0
+        self.generated = 0
+        self.failed = 0
+
+    def _store_key(self):
+        return self.summarizer.backend.model_name, self.summarizer.DAY_PROMPT_VERSION
+
+    def saved_summaries(self, days, today=None):
+        """读取已保存的每日摘要，返回 {日期: 每日摘要}；今天及之后的邮件还不完整，总是重新生成"""
+        if self.store is None or not self.use_llm:
+            return {}
+        today = today or datetime.now().date()
+        model, version = self._store_key()
+        found = self.store.get_many(self.account, [day for day in days if day < today], model, version)
+        self.saved += len(found)
+        return found
+
+    def summarize_days(self, emails_by_day, today=None):
+        """
+        为 {日期: 邮件列表} 中的每一天生成每日摘要，返回 {日期: 每日摘要}
+        每个有邮件的日期一次AI调用（并发进行）；AI失败的日期使用关键词摘要，不保存，下次重新生成
+        """
+        summaries = {}
+        prompts = {}
+        # 预算分配器有状态，提示词在当前线程中依次构建，只有AI调用并发进行
+        for day, emails in sorted(emails_by_day.items()):
+            if not emails:
+                summaries[day] = empty_day_summary()
+            elif self.use_llm:
+                prompts[day] = self.summarizer.build_day_prompt(day, emails)
+            else:
+                summaries[day] = self.summarizer.keyword_day_summary(emails)
+        fresh = dict(summaries)
+
+        if prompts:
+            logger.info(f"\n正在使用Gemini AI生成 {len(prompts)} 天的每日摘要...")
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(prompts))) as executor:
+                futures = {day: executor.submit(self.summarizer.backend.generate, prompt)
+                           for day, prompt in prompts.items()}
+                for day, future in futures.items():
+                    emails = emails_by_day[day]
+                    try:
+                        summaries[day] = fresh[day] = self.summarizer.parse_day_summary(future.result(), emails)
+                        self.generated += 1
+                    except Exception as e:
+                        logger.error(f"✗ {day} 的每日摘要失败（{len(emails)} 封），这一天使用关键词摘要: {str(e)}")
+                        summaries[day] = self.summarizer.keyword_day_summary(emails)
+                        self.failed += 1
+
+        if self.store is not None and self.use_llm:
+            today = today or datetime.now().date()
+            model, version = self._store_key()
+            self.store.put_many(self.account, {day: summary for day, summary in fresh.items() if day < today},
+                                model, version)
+        return summaries
+
+    def report(self, title, summaries):
+        """把 {日期: 每日摘要} 合并为报告（一次AI调用，不调用AI时在本地组装）"""
+        return self.summarizer.range_report(title, sorted(summaries.items()), use_llm=self.use_llm)
+
+    def print_stats(self):
+        """输出每日摘要的来源"""
+        line = f"  每日摘要: 已保存 {self.saved} 天, 新生成 {self.generated} 天"
+        if self.failed:
+            line += f", 失败 {self.failed} 天（使用关键词摘要）"
+        logger.info(line)
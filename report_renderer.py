@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告渲染
+模板在导入时编译一次：字面量和字段拆开后生成一个用 f-string 拼接的函数，渲染时只调用它并写入输出
+（list.append 或 io.StringIO.write），最后只拼接一次；
+字段默认做HTML转义，名称以 _html 结尾的字段是已渲染的片段，TRUSTED_FIELDS 中的字段由渲染函数生成，都原样插入。
+每份报告同时生成紧凑的纯文本版本，作为 multipart/alternative 的 text/plain 部分
+"""
+
+import re
+import string
+from datetime import datetime
+
+from html_text import html_to_text
+
+
+def escape_html(value):
+    """HTML转义，结果与 html.escape 相同；整数原样返回。直接串联 str.replace，省去一层函数调用"""
+    if type(value) is not str:
+        if type(value) is int:
+            return value
+        value = str(value)
+    return (value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+            .replace('"', '&quot;').replace('\'', '&#x27;'))
+
+
+# 由渲染函数生成的字段（颜色、日期、数量等）不含需要转义的字符，原样插入
+TRUSTED_FIELDS = frozenset(['color', 'date', 'time', 'weekday', 'total', 'count', 'days', 'start', 'end', 'average'])
+
+
+class Template:
+    """
+    str.format 风格的模板，构造时编译为两个函数：format(**字段) 返回渲染结果，render(write, **字段) 把结果交给write
+    和 collections.namedtuple 一样用 exec 生成代码：f-string 直接拼接字面量和字段，
+    渲染时不再解析格式串，也没有逐个字段的循环和方法调用，只有需要转义的字段调用一次转义函数
+    """
+
+    def __init__(self, text, escape=escape_html):
+        """escape: 字段转义函数，None 表示不转义（纯文本模板）"""
+        self.text = text
+        self.escape = escape
+        pieces = []
+        self.fields = []
+        for literal, name, spec, conversion in string.Formatter().parse(text):
+            pieces.append(literal.replace('{', '{{').replace('}', '}}'))
+            if name is None:
+                continue
+            if not name.isidentifier() or spec or conversion:
+                raise ValueError(f"模板字段只能是简单的名称: {name!r}")
+            if name not in self.fields:
+                self.fields.append(name)
+            escaped = escape is not None and not name.endswith('_html') and name not in TRUSTED_FIELDS
+            pieces.append('{_escape(' + name + ')}' if escaped else '{' + name + '}')
+        params = ', '.join(self.fields) or '_unused=None'
+        body = f"f{''.join(pieces)!r}"
+        source = (f"def format(*, {params}):\n    return {body}\n"
+                  f"def render(write, *, {params}):\n    write({body})\n")
+        namespace = {'_escape': escape}
+        exec(source, namespace)
+        self.format = namespace['format']
+        self.render = namespace['render']
+
+
+class Report(str):
+    """HTML报告；text 是对应的纯文本版本，None 表示发送时从HTML提取"""
+
+    def __new__(cls, html_report, text=None):
+        report = super().__new__(cls, html_report)
+        report.text = text
+        return report
+
+
+PRIORITY_SECTIONS = (
+    ('high', '🔴 高优先级', '#f44336'),
+    ('medium', '🟡 中优先级', '#FF9800'),
+    ('low', '🟢 低优先级', '#4CAF50'),
+)
+
+# ---- 逐封摘要报告 ----
+
+DIGEST_HEAD = Template("""
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; line-height: 1.6; padding: 20px; background: #f5f5f5; color: #333; }}
+        .container {{ max-width: 800px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
+        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 25px; border-radius: 8px; margin-bottom: 30px; }}
+        .header h1 {{ margin: 0 0 10px 0; font-size: 28px; }}
+        .summary {{ background: #e3f2fd; padding: 20px; border-radius: 8px; margin-bottom: 30px; border-left: 4px solid #2196F3; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>📧 每日邮件摘要报告</h1>
+            <p>📅 日期: {date}</p>
+        </div>
+
+        <div class="summary">
+            <h3>📊 今日概览</h3>
+            <p>今日共收到 <strong style="color: #2196F3; font-size: 20px;">{total}</strong> 封邮件</p>
+            <p style="color: #666;">{categories}</p>
+        </div>
+""")
+
+DIGEST_SECTION = Template("""
+        <h3 style="color: {color}; border-bottom: 2px solid {color}; padding-bottom: 10px;">{title} ({count} 封)</h3>
+""")
+
+DIGEST_CARD = Template("""
+            <div style="margin-bottom: 15px; padding: 15px; background: white; border-left: 4px solid {color}; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+                <h4 style="margin: 0 0 8px 0; color: #333;">📧 {subject}{similar_html}</h4>
+                <p style="margin: 4px 0; color: #666; font-size: 14px;">
+                    <strong>发件人:</strong> {sender} | {category}
+                </p>
+                <p style="margin: 8px 0 0 0; padding: 10px; background: #f9f9f9; border-radius: 3px; color: #555; font-size: 13px;">
+                    {gist}{action_html}
+                </p>
+            </div>
+""")
+
+SIMILAR = Template(' <small style="color: #999;">×{count}</small>')
+ACTION = Template('<br><strong>建议操作:</strong> {action}')
+TODO_ITEM = Template('<li>{action}（{subject}）</li>')
+
+DIGEST_TAIL = Template("""
+        <h3>✅ 待办事项</h3>
+        <ul>{todo_html}</ul>
+
+        <div style="margin-top: 20px; text-align: center; color: #999; font-size: 12px;">
+            <p>本报告由邮件自动摘要系统生成 | Powered by AI</p>
+        </div>
+    </div>
+</body>
+</html>
+""")
+
+# ---- 备用报告（AI不可用时） ----
+
+FALLBACK_HEAD = Template("""
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; line-height: 1.6; padding: 20px; background: #f5f5f5; color: #333; }}
+        .container {{ max-width: 800px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
+        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 25px; border-radius: 8px; margin-bottom: 30px; }}
+        .header h1 {{ margin: 0 0 10px 0; font-size: 28px; }}
+        .header p {{ margin: 5px 0; opacity: 0.9; }}
+        .summary {{ background: #e3f2fd; padding: 20px; border-radius: 8px; margin-bottom: 30px; border-left: 4px solid #2196F3; }}
+        .summary h3 {{ margin: 0 0 10px 0; color: #1976D2; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>📧 每日邮件摘要报告</h1>
+            <p>📅 日期: {date}</p>
+            <p>⏰ 生成时间: {time}</p>
+        </div>
+
+        <div class="summary">
+            <h3>📊 今日概览</h3>
+            <p style="margin: 5px 0; font-size: 16px;">
+                今日共收到 <strong style="color: #2196F3; font-size: 20px;">{total}</strong> 封邮件
+            </p>
+            <p style="margin: 5px 0; color: #666;">{categories}</p>
+        </div>
+""")
+
+FALLBACK_SECTION_OPEN = Template("""
+        <div style="margin-bottom: 30px;">
+            <h3 style="color: {color}; border-bottom: 2px solid {color}; padding-bottom: 10px;">
+                {title} ({count} 封)
+            </h3>
+""")
+
+FALLBACK_CARD = Template("""
+        <div style="margin-bottom: 20px; padding: 15px; background: white; border-left: 4px solid {color}; border-radius: 5px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+            <h4 style="margin: 0 0 10px 0; color: #333;">📧 {subject}</h4>
+            <p style="margin: 5px 0; color: #666; font-size: 14px;">
+                <strong>发件人:</strong> {sender}<br>
+                <strong>时间:</strong> {time}
+            </p>
+            <p style="margin: 10px 0 0 0; padding: 10px; background: #f9f9f9; border-radius: 3px; color: #555; font-size: 13px; line-height: 1.6;">
+                <strong>内容摘要:</strong> {preview}...
+            </p>
+        </div>
+""")
+
+FALLBACK_SECTION_CLOSE = '        </div>\n'
+
+FALLBACK_TAIL = """
+        <div style="margin-top: 20px; text-align: center; color: #999; font-size: 12px;">
+            <p>本报告由邮件自动摘要系统生成 | Powered by AI</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+# ---- 无邮件报告和营销邮件列表 ----
+
+NO_EMAIL = Template("""
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body {{ font-family: Arial, sans-serif; line-height: 1.6; padding: 20px; }}
+        .header {{ background: #4CAF50; color: white; padding: 15px; border-radius: 5px; }}
+        .content {{ margin-top: 20px; }}
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h2>📧 每日邮件摘要报告</h2>
+        <p>日期: {date}</p>
+    </div>
+    <div class="content">
+        <h3>📊 今日概览</h3>
+        <p>今天没有收到新邮件。</p>
+        <p>祝你有美好的一天！</p>
+    </div>
+</body>
+</html>
+""")
+
+ROUTED_SECTION = Template("""
+<div style="margin: 20px auto; max-width: 800px; padding: 15px; border-left: 4px solid #4CAF50; background: #f9f9f9; font-size: 13px;">
+    <h3 style="color: #4CAF50; margin: 0 0 10px 0;">🟢 低优先级 - 营销推广（未经AI分析，{count} 封）</h3>
+    <ul style="margin: 0; padding-left: 20px; color: #555;">{rows_html}</ul>
+</div>
+""")
+
+ROUTED_ROW = Template('<li>{subject} <span style="color: #999;">— {sender}</span></li>')
+
+# ---- 周报、月报（由每日摘要在本地组装） ----
+
+RANGE_HEAD = Template("""
+<html>
+<head>
+    <meta charset="utf-8">
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, "Helvetica Neue", Arial, sans-serif; line-height: 1.6; padding: 20px; background: #f5f5f5; color: #333; }}
+        .container {{ max-width: 800px; margin: 0 auto; background: white; padding: 30px; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.1); }}
+        .header {{ background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; padding: 25px; border-radius: 8px; margin-bottom: 30px; }}
+        .header h1 {{ margin: 0 0 10px 0; font-size: 28px; }}
+        .summary {{ background: #e3f2fd; padding: 20px; border-radius: 8px; margin-bottom: 30px; border-left: 4px solid #2196F3; }}
+    </style>
+</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>📧 {title}</h1>
+            <p>📅 {start} ~ {end}（{days} 天）</p>
+        </div>
+
+        <div class="summary">
+            <h3>📊 期间概览</h3>
+            <p>共收到 <strong style="color: #2196F3; font-size: 20px;">{total}</strong> 封邮件，日均 {average} 封</p>
+            <p style="color: #666;">{daily}</p>
+        </div>
+""")
+
+RANGE_DAY = Template("""
+        <h3 style="border-bottom: 2px solid #2196F3; padding-bottom: 10px;">📅 {date} {weekday}（{count} 封）</h3>
+        <p style="color: #555;">{overview}</p>
+""")
+
+RANGE_TODO_ITEM = Template('<li>{date} {action}（{subject}）</li>')
+
+TEXT_RANGE_HEAD = Template('📧 {title} - {start} ~ {end}\n共收到 {total} 封邮件，日均 {average} 封（{daily}）\n', escape=None)
+TEXT_RANGE_DAY = Template('\n{date} {weekday}（{count} 封）\n{overview}\n', escape=None)
+
+WEEKDAYS = ('周一', '周二', '周三', '周四', '周五', '周六', '周日')
+
+# ---- 纯文本版本 ----
+
+TEXT_HEAD = Template('📧 每日邮件摘要报告 - {date}\n今日共收到 {total} 封邮件（{categories}）\n', escape=None)
+TEXT_SECTION = Template('\n{title} ({count} 封)\n', escape=None)
+TEXT_ITEM = Template('- {subject}{similar} — {sender} [{category}]\n  {gist}\n', escape=None)
+TEXT_ACTION = Template('  → 建议操作: {action}\n', escape=None)
+TEXT_FALLBACK_ITEM = Template('- {subject} — {sender} ({time})\n  {preview}\n', escape=None)
+
+
+def _one_line(text, limit=None):
+    """压缩空白，纯文本版本每个字段只占一行"""
+    text = ' '.join(str(text).split())
+    if limit is not None and len(text) > limit:
+        text = text[:limit].rstrip() + '…'
+    return text
+
+
+def render_digest(items, categories, now=None):
+    """根据 [(邮件信息, 摘要字典)] 渲染报告，categories 为概览中类别的显示顺序"""
+    now = now or datetime.now()
+    counts = {}
+    for _, summary in items:
+        counts[summary['category']] = counts.get(summary['category'], 0) + 1
+    category_line = ' | '.join(f"{category}: {counts[category]} 封" for category in categories if category in counts)
+
+    parts, text = [], []
+    write, write_text = parts.append, text.append
+    date = now.strftime('%Y年%m月%d日')
+    DIGEST_HEAD.render(write, date=date, total=len(items), categories=category_line)
+    TEXT_HEAD.render(write_text, date=date, total=len(items), categories=category_line)
+
+    for priority, title, color in PRIORITY_SECTIONS:
+        group = [(email_info, summary) for email_info, summary in items if summary['priority'] == priority]
+        if not group:
+            continue
+        DIGEST_SECTION.render(write, color=color, title=title, count=len(group))
+        TEXT_SECTION.render(write_text, title=title, count=len(group))
+        for email_info, summary in group:
+            size = email_info.get('cluster_size', 1)
+            DIGEST_CARD.render(write, color=color, subject=email_info['subject'],
+                               similar_html=SIMILAR.format(count=size) if size > 1 else '',
+                               sender=email_info['from'], category=summary['category'], gist=summary['gist'],
+                               action_html=ACTION.format(action=summary['action']) if summary['action'] else '')
+            TEXT_ITEM.render(write_text, subject=_one_line(email_info['subject']),
+                             similar=f" ×{size}" if size > 1 else '', sender=_one_line(email_info['from']),
+                             category=summary['category'], gist=_one_line(summary['gist']))
+            if summary['action']:
+                TEXT_ACTION.render(write_text, action=_one_line(summary['action']))
+
+    todo = []
+    for email_info, summary in items:
+        if summary['action']:
+            TODO_ITEM.render(todo.append, action=summary['action'], subject=email_info['subject'])
+    DIGEST_TAIL.render(write, todo_html=''.join(todo) or '<li>暂无需要处理的事项</li>')
+    return Report(''.join(parts), ''.join(text))
+
+
+def render_fallback(sections, total, now=None):
+    """
+    渲染AI不可用时的备用报告
+    sections: [(概览中的类别名, 标题, 颜色, [{'subject', 'from', 'time', 'preview'}])]，按显示顺序排列，空分组不显示
+    """
+    now = now or datetime.now()
+    category_line = ' | '.join(f"{label}: {len(emails)} 封" for label, _, _, emails in sections)
+
+    parts, text = [], []
+    write, write_text = parts.append, text.append
+    date = now.strftime('%Y年%m月%d日')
+    FALLBACK_HEAD.render(write, date=date, time=now.strftime('%H:%M:%S'), total=total, categories=category_line)
+    TEXT_HEAD.render(write_text, date=date, total=total, categories=category_line)
+
+    for _, title, color, emails in sections:
+        if not emails:
+            continue
+        FALLBACK_SECTION_OPEN.render(write, color=color, title=title, count=len(emails))
+        TEXT_SECTION.render(write_text, title=title, count=len(emails))
+        for email in emails:
+            FALLBACK_CARD.render(write, color=color, subject=email['subject'], sender=email['from'],
+                                 time=email['time'], preview=email['preview'])
+            TEXT_FALLBACK_ITEM.render(write_text, subject=_one_line(email['subject']), sender=_one_line(email['from']),
+                                      time=email['time'], preview=_one_line(email['preview'], 120))
+        write(FALLBACK_SECTION_CLOSE)
+    write(FALLBACK_TAIL)
+    return Report(''.join(parts), ''.join(text))
+
+
+def render_range_digest(title, days):
+    """根据 [(日期, 每日摘要)] 渲染周报或月报，每日摘要为 {count, overview, highlights}"""
+    total = sum(summary['count'] for _, summary in days)
+    daily = ' | '.join(f"{day.strftime('%m-%d')}: {summary['count']}" for day, summary in days)
+    fields = {'title': title, 'start': days[0][0].isoformat(), 'end': days[-1][0].isoformat(), 'total': total,
+              'average': f"{total / len(days):.1f}", 'daily': daily}
+
+    parts, text = [], []
+    write, write_text = parts.append, text.append
+    RANGE_HEAD.render(write, days=len(days), **fields)
+    TEXT_RANGE_HEAD.render(write_text, **fields)
+
+    colors = {priority: color for priority, _, color in PRIORITY_SECTIONS}
+    todo = []
+    for day, summary in days:
+        date, weekday = day.strftime('%m月%d日'), WEEKDAYS[day.weekday()]
+        RANGE_DAY.render(write, date=date, weekday=weekday, count=summary['count'], overview=summary['overview'])
+        TEXT_RANGE_DAY.render(write_text, date=date, weekday=weekday, count=summary['count'],
+                              overview=_one_line(summary['overview']))
+        for item in summary['highlights']:
+            size = item.get('similar', 1)
+            if item['action']:
+                RANGE_TODO_ITEM.render(todo.append, date=date, action=item['action'], subject=item['subject'])
+            DIGEST_CARD.render(write, color=colors.get(item['priority'], '#FF9800'), subject=item['subject'],
+                               similar_html=SIMILAR.format(count=size) if size > 1 else '', sender=item['from'],
+                               category=item['category'], gist=item['gist'],
+                               action_html=ACTION.format(action=item['action']) if item['action'] else '')
+            TEXT_ITEM.render(write_text, subject=_one_line(item['subject']), similar=f" ×{size}" if size > 1 else '',
+                             sender=_one_line(item['from']), category=item['category'], gist=_one_line(item['gist']))
+            if item['action']:
+                TEXT_ACTION.render(write_text, action=_one_line(item['action']))
+
+    DIGEST_TAIL.render(write, todo_html=''.join(todo) or '<li>暂无需要处理的事项</li>')
+    return Report(''.join(parts), ''.join(text))
+
+
+def render_no_email(now=None):
+    """渲染没有邮件时的报告"""
+    now = now or datetime.now()
+    return Report(NO_EMAIL.format(date=now.strftime('%Y-%m-%d')), f"📧 每日邮件摘要报告 - {now.strftime('%Y-%m-%d')}\n今天没有收到新邮件。\n")
+
+
+def append_routed_section(report, routed_emails):
+    """把未经AI分析的营销邮件作为紧凑列表插入到HTML报告的 </body> 之前"""
+    if not routed_emails:
+        return report
+    rows = []
+    for email_info in routed_emails:
+        ROUTED_ROW.render(rows.append, subject=email_info['subject'], sender=email_info['from'])
+    section = ROUTED_SECTION.format(count=len(routed_emails), rows_html=''.join(rows))
+
+    position = report.lower().rfind('</body>')
+    if position == -1:
+        return report + section
+    return report[:position] + section + report[position:]
+
+
+# 块级元素的结束处换行，其余标签由 html_to_text 去掉
+_BLOCK_BREAK_RE = re.compile(r'<br\s*/?>|</(?:p|div|li|tr|h[1-6]|ul|ol|table)\s*>', re.IGNORECASE)
+
+
+def report_text(report):
+    """报告的纯文本版本；AI生成的HTML报告没有现成的纯文本版本，按块级元素逐行提取"""
+    text = getattr(report, 'text', None)
+    if text is not None:
+        return text
+    lines = (html_to_text(chunk) for chunk in _BLOCK_BREAK_RE.split(report))
+    return '\n'.join(line for line in lines if line) + '\n'
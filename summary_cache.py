@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+邮件摘要缓存
+按邮件内容哈希保存每封邮件的结构化摘要，重复运行时只为新邮件调用AI，带过期时间和条数上限
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def content_key(email_info, model_name, prompt_version):
+    """根据规范化后的主题、发件人、完整正文以及模型名和提示词版本计算缓存键"""
+    def normalize(value):
+        return ' '.join((value or '').split()).lower()
+
+    parts = [
+        model_name,
+        str(prompt_version),
+        normalize(email_info.get('subject')),
+        normalize(email_info.get('from')),
+        # 预算分配器可能把很长的正文放进提示词（EMAIL_MAX_TOKENS），正文任何位置的差异都会影响摘要
+        normalize(email_info.get('body')),
+    ]
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """基于SQLite的摘要缓存，值为 {priority, category, gist, action} 字典"""
+
+    DEFAULT_TTL_DAYS = 7
+    DEFAULT_MAX_ENTRIES = 5000
+    # SQLite单条语句的参数数量有限，按批查询
+    QUERY_CHUNK = 500
+
+    def __init__(self, db_path, ttl_days=None, max_entries=None):
+        """打开或创建缓存数据库，ttl_days为条目有效天数，max_entries为最多保存的条数"""
+        self.db_path = db_path
+        self.ttl = (ttl_days or self.DEFAULT_TTL_DAYS) * 86400
+        self.max_entries = max_entries or self.DEFAULT_MAX_ENTRIES
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                key TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_summaries_last_access ON summaries (last_access);
+        """)
+        self.conn.commit()
+        self.reset_stats()
+
+    def get_many(self, keys):
+        """批量读取未过期的摘要，返回 {key: 摘要字典}"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self.lock:
+            for start in range(0, len(keys), self.QUERY_CHUNK):
+                chunk = keys[start:start + self.QUERY_CHUNK]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self.conn.execute(
+                    f'SELECT key, summary FROM summaries WHERE key IN ({placeholders}) AND created >= ?',
+                    (*chunk, now - self.ttl)
+                ).fetchall()
+                for key, summary in rows:
+                    found[key] = json.loads(summary)
+
+            if found:
+                self.conn.executemany(
+                    'UPDATE summaries SET last_access = ? WHERE key = ?',
+                    [(now, key) for key in found]
+                )
+                self.conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, summaries):
+        """在一个事务中写入 {key: 摘要字典}，然后执行淘汰"""
+        now = time.time()
+        rows = [(key, json.dumps(summary, ensure_ascii=False), now, now)
+                for key, summary in summaries.items()]
+        if not rows:
+            return
+        with self.lock:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO summaries (key, summary, created, last_access) VALUES (?, ?, ?, ?)',
+                rows
+            )
+            self.conn.commit()
+            self._evict_locked()
+
+    def evict(self):
+        """删除过期条目，超过条数上限时按最近访问时间淘汰最旧的条目"""
+        with self.lock:
+            return self._evict_locked()
+
+    def _evict_locked(self):
+        """淘汰逻辑，调用方需持有锁"""
+        removed = self.conn.execute(
+            'DELETE FROM summaries WHERE created < ?', (time.time() - self.ttl,)
+        ).rowcount
+        total = self.conn.execute('SELECT COUNT(*) FROM summaries').fetchone()[0]
+        if total > self.max_entries:
+            removed += self.conn.execute(
+                """
+                DELETE FROM summaries WHERE key IN (
+                    SELECT key FROM summaries ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (total - self.max_entries,)
+            ).rowcount
+        self.conn.commit()
+        return removed
+
+    def reset_stats(self):
+        """重置命中统计"""
+        self.hits = 0
+        self.misses = 0
+
+    def print_stats(self):
+        """输出缓存命中情况"""
+        logger.info(f"  摘要缓存: 命中 {self.hits} 封, 需要AI分析 {self.misses} 封")
+
+    def close(self):
+        """关闭数据库"""
+        self.conn.close()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量同步状态存储
+使用SQLite记录每个文件夹的UIDVALIDITY和最后处理的UID
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+
+
+class SyncStateStore:
+    """IMAP增量同步状态（按 账号 + 文件夹 记录）"""
+
+    def __init__(self, db_path):
+        """打开或创建状态数据库"""
+        self.db_path = db_path
+        # 连接池的工作线程共享同一个实例，用锁串行化访问
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS sync_state (
+                account TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                uidvalidity INTEGER NOT NULL,
+                last_uid INTEGER NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (account, folder)
+            )
+        """)
+        self.conn.commit()
+
+    def get(self, account, folder):
+        """返回 (uidvalidity, last_uid)，没有记录时返回 None"""
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT uidvalidity, last_uid FROM sync_state WHERE account = ? AND folder = ?',
+                (account, folder)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def update(self, account, folder, uidvalidity, last_uid):
+        """记录文件夹的同步进度"""
+        with self.lock:
+            self.conn.execute(
+                """
+                INSERT INTO sync_state (account, folder, uidvalidity, last_uid, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (account, folder) DO UPDATE SET
+                    uidvalidity = excluded.uidvalidity,
+                    last_uid = excluded.last_uid,
+                    updated_at = excluded.updated_at
+                """,
+                (account, folder, uidvalidity, last_uid, datetime.now().isoformat(timespec='seconds'))
+            )
+            self.conn.commit()
+
+    def reset(self, account, folder):
+        """删除文件夹记录，下次运行完整同步"""
+        with self.lock:
+            self.conn.execute('DELETE FROM sync_state WHERE account = ? AND folder = ?', (account, folder))
+            self.conn.commit()
+
+    def close(self):
+        """关闭数据库"""
+        self.conn.close()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+IMAP响应解析：数据按imaplib返回的形状构造，字面量以 (前缀, 内容) 元组出现
+"""
+
+import unittest
+
+from imap_response import build_uid_sets, find_item, parse_fetch_response
+
+
+# QQ邮箱对 UID FETCH (UID BODY.PEEK[HEADER.FIELDS (...)] BODYSTRUCTURE) 的响应，
+# 一次返回两封邮件；第二封附件文件名以字面量形式出现在参数列表中
+QQ_HEADER_FETCH = [
+    (b'1 (UID 1201 BODY[HEADER.FIELDS (FROM SUBJECT DATE)] {130}',
+     b'From: =?gb18030?B?0KHD9w==?= <xiaoming@qq.com>\r\n'
+     b'Subject: =?gb18030?B?1tzA/bvhzOHQ0Q==?=\r\n'
+     b'Date: Fri, 16 Oct 2026 09:12:03 +0800\r\n\r\n'),
+    b' BODYSTRUCTURE (("TEXT" "PLAIN" ("charset" "gb18030") NIL NIL "base64" 1268 17 NIL NIL NIL)'
+    b'("TEXT" "HTML" ("charset" "gb18030") NIL NIL "base64" 5822 75 NIL NIL NIL)'
+    b' "ALTERNATIVE" ("BOUNDARY" "----=_NextPart_6530E2B3_0A1C5F28_41C2D9B7") NIL NIL))',
+    (b'2 (UID 1202 BODY[HEADER.FIELDS (FROM SUBJECT DATE)] {46}',
+     b'From: noreply@example.com\r\nSubject: report\r\n\r\n'),
+    (b' BODYSTRUCTURE (("TEXT" "HTML" ("charset" "utf-8") NIL NIL "quoted-printable" 3120 48 NIL NIL NIL)'
+     b'("APPLICATION" "PDF" ("name" {26}',
+     b'=?gbk?B?1MK2yLGose0ucGRm?='),
+    b') NIL NIL "base64" 88214 NIL ("attachment" ("filename" "report.pdf")) NIL)'
+    b' "MIXED" ("boundary" "b1_3d1f") NIL NIL))',
+]
+
+
+class BuildUidSetsTest(unittest.TestCase):
+
+    def test_compresses_runs_within_batches(self):
+        uids = [b'7', b'1', b'2', b'3', b'5', b'6', b'3', b'10']
+        self.assertEqual(build_uid_sets(uids, 100), ['1:3,5:7,10'])
+        self.assertEqual(build_uid_sets(uids, 3), ['1:3', '5:7', '10'])
+
+    def test_empty_and_invalid_batch_size(self):
+        self.assertEqual(build_uid_sets([], 50), [])
+        self.assertEqual(build_uid_sets(['4', '5'], 0), ['4', '5'])
+
+
+class ParseFetchResponseTest(unittest.TestCase):
+
+    def test_qq_mail_header_and_structure(self):
+        results = parse_fetch_response(QQ_HEADER_FETCH)
+        self.assertEqual([seq for seq, _ in results], [1, 2])
+
+        items = results[0][1]
+        self.assertEqual(items['UID'], '1201')
+        header = find_item(items, 'BODY.PEEK[HEADER')
+        self.assertTrue(header.startswith(b'From: =?gb18030?B?'))
+        self.assertTrue(header.endswith(b'\r\n\r\n'))
+        plain, html, subtype, params, disposition, language = items['BODYSTRUCTURE']
+        self.assertEqual(plain[:6], [b'TEXT', b'PLAIN', [b'charset', b'gb18030'], None, None, b'base64'])
+        self.assertEqual(html[1], b'HTML')
+        self.assertEqual(subtype, b'ALTERNATIVE')
+        self.assertEqual(params, [b'BOUNDARY', b'----=_NextPart_6530E2B3_0A1C5F28_41C2D9B7'])
+        self.assertIsNone(disposition)
+        self.assertIsNone(language)
+
+    def test_literal_inside_parameter_list(self):
+        items = parse_fetch_response(QQ_HEADER_FETCH)[1][1]
+        self.assertEqual(items['UID'], '1202')
+        attachment = items['BODYSTRUCTURE'][1]
+        self.assertEqual(attachment[2], [b'name', b'=?gbk?B?1MK2yLGose0ucGRm?='])
+        self.assertEqual(attachment[5:7], [b'base64', '88214'])
+        self.assertIsNone(attachment[7])
+        self.assertEqual(attachment[8], [b'attachment', [b'filename', b'report.pdf']])
+        self.assertEqual(items['BODYSTRUCTURE'][2], b'MIXED')
+
+    def test_partial_sections_and_literal_bytes_kept_verbatim(self):
+        # 正文里的括号、引号和 NIL 都在字面量中，不能被当作语法
+        data = [
+            (b'3 (UID 1310 BODY[1]<0> {23}', b'(quoted "NIL") {5}\r\n)))'),
+            (b' BODY[2]<0> {4}', b'\xd6\xd0\xce\xc4'),
+            b')',
+        ]
+        (seq, items), = parse_fetch_response(data)
+        self.assertEqual(seq, 3)
+        self.assertEqual(find_item(items, 'BODY[1]'), b'(quoted "NIL") {5}\r\n)))')
+        self.assertEqual(items['BODY[2]'], b'\xd6\xd0\xce\xc4')
+
+    def test_nil_body_and_escaped_string(self):
+        data = [b'4 (UID 1311 FLAGS (\\Seen) BODY[TEXT] NIL X-NOTE "say \\"hi\\"")']
+        (seq, items), = parse_fetch_response(data)
+        self.assertEqual(items['FLAGS'], ['\\Seen'])
+        self.assertIsNone(items['BODY[TEXT]'])
+        self.assertIsNone(find_item(items, 'BODY[TEXT]'))
+        self.assertEqual(items['X-NOTE'], b'say "hi"')
+
+    def test_skips_none_and_untagged_noise(self):
+        self.assertEqual(parse_fetch_response(None), [])
+        self.assertEqual(parse_fetch_response([None]), [])
+        data = [b'OK', None, b'5 (UID 1400)']
+        self.assertEqual(parse_fetch_response(data), [(5, {'UID': '1400'})])
+
+
+if __name__ == '__main__':
+    unittest.main()
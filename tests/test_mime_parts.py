@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BODYSTRUCTURE展开、正文段落挑选，以及传输编码和字符集解码
+"""
+
+import base64
+import unittest
+
+from imap_response import parse_fetch_response
+from mime_parts import decode_text, decode_transfer, parse_bodystructure, select_text_parts
+
+
+def structure_of(response):
+    """从一行FETCH响应中取出BODYSTRUCTURE"""
+    (_, items), = parse_fetch_response([response])
+    return items['BODYSTRUCTURE']
+
+
+# QQ邮箱：带内嵌图片的HTML邮件外面再包一层附件，multipart嵌套三层
+QQ_NESTED = (
+    b'7 (UID 2051 BODYSTRUCTURE ('
+    b'(("TEXT" "PLAIN" ("charset" "gb18030") NIL NIL "base64" 412 6 NIL NIL NIL)'
+    b'(("TEXT" "HTML" ("charset" "gb18030") NIL NIL "base64" 2880 37 NIL NIL NIL)'
+    b'("IMAGE" "PNG" ("name" "logo.png") "<7E2A@qq.com>" NIL "base64" 10450 NIL ("inline" ("filename" "logo.png")) NIL)'
+    b' "RELATED" ("boundary" "----=_NextPart_rel") NIL NIL)'
+    b' "ALTERNATIVE" ("boundary" "----=_NextPart_alt") NIL NIL)'
+    b'("APPLICATION" "OCTET-STREAM" ("name" "notes.txt") NIL NIL "base64" 2048 NIL ("attachment" ("filename" "notes.txt")) NIL)'
+    b' "MIXED" ("boundary" "----=_NextPart_mix") NIL NIL))'
+)
+
+# 单部分邮件：BODYSTRUCTURE本身就是叶子，参数和编码等字段为NIL
+SINGLE_NIL = b'8 (UID 2052 BODYSTRUCTURE ("TEXT" "HTML" NIL NIL NIL NIL 1534 20 NIL NIL NIL))'
+
+# 只有HTML正文和一个标成附件的text/plain
+HTML_WITH_TEXT_ATTACHMENT = (
+    b'9 (UID 2053 BODYSTRUCTURE (("TEXT" "HTML" ("charset" "utf-8") NIL NIL "quoted-printable" 900 12 NIL NIL NIL)'
+    b'("TEXT" "PLAIN" ("charset" "us-ascii" "name" "log.txt") NIL NIL "7bit" 300 9 NIL ("attachment" ("filename" "log.txt")) NIL)'
+    b' "MIXED" ("boundary" "xyz") NIL NIL))'
+)
+
+# 转发的邮件作为message/rfc822附带，内部结构不展开
+FORWARDED = (
+    b'10 (UID 2054 BODYSTRUCTURE (("TEXT" "PLAIN" ("charset" "utf-8") NIL NIL "7bit" 120 3 NIL NIL NIL)'
+    b'("MESSAGE" "RFC822" NIL NIL NIL "7bit" 2210 (NIL "fwd" NIL NIL NIL NIL NIL NIL NIL NIL)'
+    b' ("TEXT" "PLAIN" ("charset" "utf-8") NIL NIL "7bit" 80 2 NIL NIL NIL) 40 NIL ("attachment" NIL) NIL)'
+    b' "MIXED" ("boundary" "fw") NIL NIL))'
+)
+
+
+class ParseBodystructureTest(unittest.TestCase):
+
+    def test_nested_multipart_sections(self):
+        parts = parse_bodystructure(structure_of(QQ_NESTED))
+        self.assertEqual(
+            [(part.section, part.content_type, part.disposition) for part in parts],
+            [('1.1', 'text/plain', ''),
+             ('1.2.1', 'text/html', ''),
+             ('1.2.2', 'image/png', 'inline'),
+             ('2', 'application/octet-stream', 'attachment')])
+        self.assertEqual(parts[0].charset, 'gb18030')
+        self.assertEqual(parts[0].encoding, 'base64')
+        self.assertEqual(parts[0].size, 412)
+
+    def test_single_part_with_nil_fields(self):
+        part, = parse_bodystructure(structure_of(SINGLE_NIL))
+        self.assertEqual(part.section, '1')
+        self.assertEqual(part.content_type, 'text/html')
+        self.assertEqual(part.charset, '')
+        self.assertEqual(part.encoding, '')
+        self.assertEqual(part.size, 1534)
+        self.assertEqual(part.disposition, '')
+
+    def test_forwarded_message_is_a_leaf(self):
+        parts = parse_bodystructure(structure_of(FORWARDED))
+        self.assertEqual([(part.section, part.content_type) for part in parts],
+                         [('1', 'text/plain'), ('2', 'message/rfc822')])
+        self.assertEqual(parts[1].disposition, 'attachment')
+
+    def test_malformed_structure(self):
+        self.assertEqual(parse_bodystructure(None), [])
+        self.assertEqual(parse_bodystructure([]), [])
+        part, = parse_bodystructure([b'TEXT', b'PLAIN', None, None, None, b'7BIT', None])
+        self.assertEqual(part.size, 0)
+
+
+class SelectTextPartsTest(unittest.TestCase):
+
+    def test_prefers_plain(self):
+        parts = select_text_parts(parse_bodystructure(structure_of(QQ_NESTED)))
+        self.assertEqual([part.section for part in parts], ['1.1'])
+
+    def test_html_when_plain_is_attachment(self):
+        parts = select_text_parts(parse_bodystructure(structure_of(HTML_WITH_TEXT_ATTACHMENT)))
+        self.assertEqual([part.section for part in parts], ['1'])
+
+    def test_no_text_parts(self):
+        parts = parse_bodystructure([b'IMAGE', b'JPEG', None, None, None, b'base64', '100'])
+        self.assertEqual(select_text_parts(parts), [])
+
+
+class DecodeTest(unittest.TestCase):
+
+    TEXT = '周例会改到周五下午三点，请大家准时参加。'
+
+    def test_truncated_base64_keeps_complete_groups(self):
+        encoded = base64.encodebytes(self.TEXT.encode('gb18030'))
+        # 部分获取（BODY.PEEK[1]<0.N>）可能在任意字节处截断，包括换行中间
+        for cut in range(len(encoded) - 1, 0, -1):
+            payload = decode_transfer(encoded[:cut], 'BASE64')
+            text = decode_text(payload, 'gb18030')
+            self.assertTrue(self.TEXT.startswith(text), cut)
+        self.assertEqual(decode_text(decode_transfer(encoded, 'base64'), 'gb18030'), self.TEXT)
+
+    def test_invalid_base64(self):
+        self.assertEqual(decode_transfer(b'@@@@', 'base64'), b'')
+
+    def test_quoted_printable_and_identity(self):
+        encoded = b'=E5=91=A8=E6=8A=A5=\r\n ok'
+        self.assertEqual(decode_transfer(encoded, 'quoted-printable').decode('utf-8'), '周报 ok')
+        self.assertEqual(decode_transfer(b'plain', '8bit'), b'plain')
+        self.assertEqual(decode_transfer(b'plain', None), b'plain')
+
+    def test_gbk_family_decoded_as_gb18030(self):
+        # 镕、珺不在GB2312里，邮件常声明gb2312却用GBK/GB18030编码
+        text = '朱镕基、王珺 €'
+        payload = text.encode('gb18030')
+        for charset in ('gb2312', 'GBK', 'x-gbk', 'gb18030'):
+            self.assertEqual(decode_text(payload, charset), text, charset)
+
+    def test_unknown_or_missing_charset_falls_back_to_utf8(self):
+        payload = self.TEXT.encode('utf-8')
+        self.assertEqual(decode_text(payload, 'x-unknown-charset'), self.TEXT)
+        self.assertEqual(decode_text(payload, ''), self.TEXT)
+        self.assertEqual(decode_text(payload, None), self.TEXT)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+流式流水线与普通模式的一致性：同一个邮箱两条路径发给AI的提示词必须逐字节相同
+"""
+
+import unittest
+
+from ai_summarizer import GeminiSummarizer
+from compaction import BodyCompactor
+from llm_backends import StubBackend, stub_reply
+from near_duplicates import NearDuplicateClusterer
+from pipeline import DigestPipeline
+from benchmarks.local_imap import LocalIMAPServer, local_fetcher_class
+from benchmarks.mailbox_gen import populate
+
+
+class PromptRecorder:
+    """模拟模型输出，并记录收到的提示词"""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return stub_reply(prompt)
+
+
+class PipelineParityTest(unittest.TestCase):
+
+    COUNT = 80
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalIMAPServer(latency=0).start()
+        populate(cls.server.mailbox, cls.COUNT)
+        cls.fetcher_class = local_fetcher_class(cls.server)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def _summarizer(self):
+        recorder = PromptRecorder()
+        backend = StubBackend(latency=0, jitter=0, seed=1, responder=recorder)
+        return GeminiSummarizer(backend=backend), recorder
+
+    def _list_path(self, compact, dedup):
+        summarizer, recorder = self._summarizer()
+        fetcher = self.fetcher_class('test@qq.com', 'x')
+        self.assertTrue(fetcher.connect())
+        try:
+            emails = fetcher.fetch_today_emails()
+        finally:
+            fetcher.disconnect()
+        if compact:
+            BodyCompactor().compact_emails(emails)
+        summary_emails = NearDuplicateClusterer(dedup).collapse(emails) if dedup else emails
+        report = summarizer.summarize_emails(summary_emails)
+        return report, recorder.prompts, len(emails)
+
+    def _streaming_path(self, compact, dedup):
+        summarizer, recorder = self._summarizer()
+        fetcher = self.fetcher_class('test@qq.com', 'x')
+        self.assertTrue(fetcher.connect())
+        try:
+            pipeline = DigestPipeline(fetcher, summarizer, queue_size=4,
+                                      compactor=BodyCompactor() if compact else None,
+                                      clusterer=NearDuplicateClusterer(dedup) if dedup else None)
+            report = pipeline.run()
+        finally:
+            fetcher.disconnect()
+        return report, recorder.prompts, pipeline.email_count
+
+    def assert_same_prompts(self, compact=False, dedup=0):
+        list_report, list_prompts, list_count = self._list_path(compact, dedup)
+        stream_report, stream_prompts, stream_count = self._streaming_path(compact, dedup)
+        self.assertEqual(list_count, self.COUNT)
+        self.assertEqual(stream_count, self.COUNT)
+        self.assertTrue(list_prompts)
+        self.assertEqual([p.encode('utf-8') for p in stream_prompts], [p.encode('utf-8') for p in list_prompts])
+        self.assertEqual(stream_report, list_report)
+
+    def test_plain(self):
+        self.assert_same_prompts()
+
+    def test_compaction_and_dedup(self):
+        self.assert_same_prompts(compact=True, dedup=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
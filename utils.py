@@ -5,12 +5,18 @@
 提供环境变量加载等通用功能
 """
 
+import json
 import os
+from datetime import datetime
 from dotenv import load_dotenv
 
 
-def load_env_config():
-    """从.env文件加载配置"""
+def load_env_config(no_llm=False, dry_run=False, dry_run_output='.', date_range=None):
+    """
+    从.env文件加载配置
+    no_llm / dry_run / dry_run_output 来自命令行的 --no-llm、--dry-run、--output；NO_LLM=1 也可以关闭AI
+    date_range: (开始日期, 结束日期)，来自 --period / --since / --until，None 表示只处理今天的邮件
+    """
     load_dotenv()
 
     config = {
@@ -20,9 +26,138 @@ def load_env_config():
         'gemini_api_key': os.getenv('GEMINI_API_KEY')
     }
 
-    # 验证配置
-    missing = [k for k, v in config.items() if not v]
+    # 验证配置（不使用AI或使用其他LLM后端时不需要Gemini API Key，多账户模式下邮箱信息来自账户文件）
+    llm_backend = (os.getenv('LLM_BACKEND') or 'gemini').strip().lower()
+    no_llm = no_llm or dry_run or (os.getenv('NO_LLM') or '').lower() in ('1', 'true', 'yes')
+    accounts_file = os.getenv('ACCOUNTS_FILE')
+    optional = set()
+    if no_llm or llm_backend != 'gemini':
+        optional.add('gemini_api_key')
+    if accounts_file:
+        optional.update(('qq_email', 'qq_auth_code', 'recipient_email'))
+    missing = [k for k, v in config.items() if not v and k not in optional]
     if missing:
         raise ValueError(f"缺少环境变量: {', '.join(missing)}")
 
+    # 可选配置
+    config['accounts_file'] = accounts_file
+    config['account_workers'] = int(os.getenv('ACCOUNT_WORKERS') or 4)
+    # 不调用AI，按关键词分类生成报告
+    config['no_llm'] = no_llm
+    # 试运行：不发送、不保存同步进度，报告写入 dry_run_output 目录
+    config['dry_run'] = dry_run
+    config['dry_run_output'] = dry_run_output
+    # 周报、月报：日期区间和保存每日摘要的数据库
+    config['date_range'] = date_range
+    config['daily_summary_db'] = os.getenv('DAILY_SUMMARY_DB')
+    config['llm_backend'] = llm_backend
+    config['llm_model'] = os.getenv('LLM_MODEL')
+    config['llm_base_url'] = os.getenv('LLM_BASE_URL')
+    config['llm_api_key'] = os.getenv('LLM_API_KEY') or config['gemini_api_key']
+    config['llm_timeout'] = float(os.getenv('LLM_TIMEOUT') or 60)
+    config['llm_max_retries'] = int(os.getenv('LLM_MAX_RETRIES') or 3)
+    llm_rate = os.getenv('LLM_RATE_PER_MINUTE')
+    config['llm_rate_per_minute'] = float(llm_rate) if llm_rate else None
+    config['sync_state_db'] = os.getenv('SYNC_STATE_DB')
+    config['message_cache_db'] = os.getenv('MESSAGE_CACHE_DB')
+    config['message_cache_max_mb'] = int(os.getenv('MESSAGE_CACHE_MAX_MB') or 200)
+    config['imap_connections'] = int(os.getenv('IMAP_CONNECTIONS') or 1)
+    config['streaming_pipeline'] = (os.getenv('STREAMING_PIPELINE') or '').lower() in ('1', 'true', 'yes')
+    config['pipeline_queue_size'] = int(os.getenv('PIPELINE_QUEUE_SIZE') or 64)
+    config['summary_cache_db'] = os.getenv('SUMMARY_CACHE_DB')
+    # 本地邮件归档（SQLite FTS5），用 python mail_archive.py search 查询
+    config['archive_db'] = os.getenv('ARCHIVE_DB')
+    config['summary_cache_ttl_days'] = int(os.getenv('SUMMARY_CACHE_TTL_DAYS') or 7)
+    config['summary_cache_max_entries'] = int(os.getenv('SUMMARY_CACHE_MAX_ENTRIES') or 5000)
+    # auto：提示词较大时自动启用；1 / 0 强制开启或关闭
+    map_reduce = (os.getenv('MAP_REDUCE') or 'auto').strip().lower()
+    config['map_reduce'] = 'auto' if map_reduce == 'auto' else map_reduce in ('1', 'true', 'yes')
+    config['map_batch_tokens'] = int(os.getenv('MAP_BATCH_TOKENS') or 8000)
+    config['llm_concurrency'] = int(os.getenv('LLM_CONCURRENCY') or 4)
+    config['prompt_token_budget'] = int(os.getenv('PROMPT_TOKEN_BUDGET') or 30000)
+    config['email_min_tokens'] = int(os.getenv('EMAIL_MIN_TOKENS') or 150)
+    config['email_max_tokens'] = int(os.getenv('EMAIL_MAX_TOKENS') or 6000)
+    config['prompt_compaction'] = (os.getenv('PROMPT_COMPACTION') or '0').lower() in ('1', 'true', 'yes')
+    config['route_marketing'] = (os.getenv('ROUTE_MARKETING') or '').lower() in ('1', 'true', 'yes')
+    config['route_min_hits'] = int(os.getenv('ROUTE_MIN_HITS') or 2)
+    # 相似邮件聚类的SimHash最大汉明距离，-1 表示关闭
+    config['dedup_max_distance'] = int(os.getenv('DEDUP_MAX_DISTANCE') or 0)
+    # 日志级别：DEBUG 输出逐封的日期筛选信息，WARNING 只输出警告和错误
+    config['log_level'] = (os.getenv('LOG_LEVEL') or 'INFO').strip().upper()
+    config['metrics_json'] = os.getenv('METRICS_JSON')
+    config['metrics_prom'] = os.getenv('METRICS_PROM')
+    html_budget = os.getenv('HTML_TEXT_BUDGET')
+    config['html_budget'] = int(html_budget) if html_budget else None
+    # 逗号分隔的文件夹列表，all 表示扫描LIST返回的所有文件夹
+    folders = (os.getenv('IMAP_FOLDERS') or 'INBOX').strip()
+    config['imap_folders'] = 'all' if folders.lower() == 'all' else [f.strip() for f in folders.split(',') if f.strip()]
+    # 报告投递：RECIPIENT_EMAIL 可以是逗号分隔的多个地址；配置DELIVERY_QUEUE_DB后发送失败的投递稍后重发
+    config['delivery_queue_db'] = os.getenv('DELIVERY_QUEUE_DB')
+    config['delivery_max_attempts'] = int(os.getenv('DELIVERY_MAX_ATTEMPTS') or 5)
+    config['delivery_retry_seconds'] = int(os.getenv('DELIVERY_RETRY_SECONDS') or 300)
+    # 守护模式：用IMAP IDLE监听新邮件并预先摘要，每天在DIGEST_SEND_TIME发送报告
+    config['daemon_mode'] = (os.getenv('DAEMON_MODE') or '').lower() in ('1', 'true', 'yes')
+    config['digest_send_time'] = (os.getenv('DIGEST_SEND_TIME') or '23:50').strip()
+    config['idle_timeout'] = int(os.getenv('IDLE_TIMEOUT') or 1500)
+    config['poll_interval'] = int(os.getenv('POLL_INTERVAL') or 60)
+    if config['daemon_mode']:
+        if accounts_file:
+            raise ValueError("守护模式只支持单个账户，不能与 ACCOUNTS_FILE 同时使用")
+        if no_llm:
+            raise ValueError("守护模式需要AI逐封摘要，不能与 NO_LLM / --no-llm 同时使用")
+        if date_range:
+            raise ValueError("守护模式只发送每日报告，不能与 --period / --since 同时使用")
+        try:
+            datetime.strptime(config['digest_send_time'], '%H:%M')
+        except ValueError:
+            raise ValueError(f"DIGEST_SEND_TIME 格式应为 HH:MM: {config['digest_send_time']}")
+
     return config
+
+
+def parse_recipients(value):
+    """把逗号或分号分隔的收件人（或收件人列表）转换为去重后的地址列表"""
+    if isinstance(value, str):
+        value = value.replace(';', ',').split(',')
+    recipients = []
+    for address in value or []:
+        address = address.strip()
+        if address and address not in recipients:
+            recipients.append(address)
+    return recipients
+
+
+def load_accounts(path):
+    """
+    从JSON文件加载多账户配置，格式为 {"accounts": [...]} 或账户列表，每个账户包含：
+    name（可选）、qq_email、qq_auth_code、recipient_email（地址、逗号分隔的地址或地址列表）、imap_folders（可选）
+    任何字段都可以写成 字段名_env 从环境变量读取，例如 "qq_auth_code_env": "TEAM_A_AUTH_CODE"
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    entries = data.get('accounts', []) if isinstance(data, dict) else data
+    if not entries:
+        raise ValueError(f"账户文件中没有账户: {path}")
+
+    accounts = []
+    for number, entry in enumerate(entries, 1):
+        account = {}
+        for key, value in entry.items():
+            if key.endswith('_env'):
+                account[key[:-4]] = os.getenv(value)
+            else:
+                account[key] = value
+        missing = [k for k in ('qq_email', 'qq_auth_code', 'recipient_email') if not account.get(k)]
+        if missing:
+            raise ValueError(f"第 {number} 个账户缺少字段: {', '.join(missing)}")
+        account.setdefault('name', account['qq_email'])
+        folders = account.get('imap_folders')
+        if isinstance(folders, str):
+            account['imap_folders'] = 'all' if folders.lower() == 'all' else [f.strip() for f in folders.split(',') if f.strip()]
+        accounts.append(account)
+
+    names = [account['name'] for account in accounts]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"账户名称重复: {', '.join(duplicates)}")
+    return accounts